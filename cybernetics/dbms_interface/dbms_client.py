@@ -1,4 +1,8 @@
+import threading
+import time
+
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 
 
 class DBClient(ABC):
@@ -13,6 +17,10 @@ class DBClient(ABC):
     def close_connection(self):
         pass
 
+    @abstractmethod
+    def is_alive(self) -> bool:
+        pass
+
     @abstractmethod
     def execute_and_fetch_results(self, sql, json=True):
         pass
@@ -20,3 +28,124 @@ class DBClient(ABC):
     @abstractmethod
     def execute(self, sql):
         pass
+
+
+class DBClientPool:
+    """Pool of DB clients so that consecutive calls reuse live connections
+    instead of paying a full connection handshake every time.
+
+    Clients are validated with `DBClient.is_alive` before being handed out,
+    so connections killed by a DBMS restart are detected and rebuilt.
+    """
+
+    def __init__(self, client_factory, max_idle: int = 1, logger=None):
+        """
+        Args:
+            client_factory (callable): Creates a new connected DBClient.
+            max_idle (int): Maximum number of idle clients kept in the pool.
+            logger (logging.Logger): Optional logger.
+        """
+
+        self.client_factory = client_factory
+        self.max_idle = max_idle
+        self.logger = logger
+
+        self._idle_clients = []
+        self._lock = threading.Lock()
+
+        self.n_hits = 0  # reused a live pooled client
+        self.n_misses = 0  # had to open a new connection
+        self.n_stale = 0  # pooled client found dead and discarded
+        self.n_connects = 0
+        self.total_connect_time = 0
+        self.max_connect_time = 0
+
+    def _connect(self) -> DBClient:
+        beg_time = time.time()
+        client = self.client_factory()
+        connect_time = time.time() - beg_time
+
+        with self._lock:
+            self.n_connects += 1
+            self.total_connect_time += connect_time
+            self.max_connect_time = max(self.max_connect_time, connect_time)
+
+        return client
+
+    def acquire(self) -> DBClient:
+        while True:
+            with self._lock:
+                client = (
+                    self._idle_clients.pop() if self._idle_clients else None
+                )
+
+            if client is None:
+                with self._lock:
+                    self.n_misses += 1
+                return self._connect()
+
+            if client.is_alive():
+                with self._lock:
+                    self.n_hits += 1
+                return client
+
+            with self._lock:
+                self.n_stale += 1
+            if self.logger:
+                self.logger.info("Discarded a dead pooled connection.")
+            self._close_quietly(client)
+
+    def release(self, client: DBClient) -> None:
+        with self._lock:
+            if len(self._idle_clients) < self.max_idle:
+                self._idle_clients.append(client)
+                return
+
+        self._close_quietly(client)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a client from the pool for the duration of a with-block."""
+
+        client = self.acquire()
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def invalidate(self) -> None:
+        """Close all idle clients, e.g., after the DBMS has been restarted."""
+
+        with self._lock:
+            idle_clients, self._idle_clients = self._idle_clients, []
+
+        for client in idle_clients:
+            self._close_quietly(client)
+
+    def close(self) -> None:
+        self.invalidate()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            n_requests = self.n_hits + self.n_misses
+            return {
+                "hits": self.n_hits,
+                "misses": self.n_misses,
+                "stale": self.n_stale,
+                "hit_rate": self.n_hits / n_requests if n_requests else 0,
+                "connects": self.n_connects,
+                "total_connect_time": self.total_connect_time,
+                "avg_connect_time": (
+                    self.total_connect_time / self.n_connects
+                    if self.n_connects
+                    else 0
+                ),
+                "max_connect_time": self.max_connect_time,
+            }
+
+    @staticmethod
+    def _close_quietly(client: DBClient) -> None:
+        try:
+            client.close_connection()
+        except Exception:
+            pass
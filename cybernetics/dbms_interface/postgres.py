@@ -6,19 +6,64 @@ https://github.com/PKU-DAIR/DBTune/blob/main/autotune/database/postgresqldb.py
 
 import json
 import glob
+import math
 import os
-import subprocess
+import time
 from typing import Union
 
 import numpy as np
 import psycopg2
 
 from ConfigSpace import Configuration
-from cybernetics.dbms_interface.dbms_client import DBClient
+from cybernetics.dbms_interface.dbms_client import DBClient, DBClientPool
+from cybernetics.dbms_interface.restart_manager import (
+    RESTART_TIMEOUT,
+    PostgresRestartManager,
+)
+from cybernetics.dbms_interface.snapshot import PostgresSnapshotManager
 from cybernetics.utils.custom_logging import CUSTOM_LOGGING_INSTANCE
 
 
-RESTART_TIMEOUT = 60  # 60 seconds
+RELOAD_TIMEOUT = 10  # 10 seconds
+RELOAD_POLL_INTERVAL = 0.1  # 100 milliseconds
+
+# Knobs in these contexts are picked up by existing sessions on reload; knobs
+#   in "backend" contexts only affect new sessions and "postmaster" knobs
+#   require a restart
+RELOAD_VISIBLE_CONTEXTS = ["sighup", "superuser", "user"]
+
+# Slack on the restart timeout relative to the duration of the pre-restart
+#   checkpoint, which measures how slow the I/O of the DBMS is
+RESTART_TIMEOUT_CHECKPOINT_FACTOR = 2
+
+# Checkpointer statistics reach the statistics collector asynchronously and
+#   backends accept statistics up to 500 ms old
+CHECKPOINT_STATS_TIMEOUT = 1  # 1 second
+CHECKPOINT_STATS_POLL_INTERVAL = 0.1  # 100 milliseconds
+
+
+def get_restart_timeout(checkpoint_stats: dict) -> float:
+    """Get the timeout of each restart phase after a pre-restart checkpoint.
+
+    The checkpoint already flushed the dirty buffers, so the shutdown
+    checkpoint has little left to write, but a slow checkpoint means slow
+    I/O, which slows down every phase of the restart as well.
+
+    Args:
+        checkpoint_stats (dict): Statistics from PostgresWrapper.checkpoint().
+
+    Returns:
+        (float): The timeout in seconds.
+    """
+
+    if not checkpoint_stats["success"]:
+        return RESTART_TIMEOUT
+
+    return max(
+        RESTART_TIMEOUT,
+        RESTART_TIMEOUT_CHECKPOINT_FACTOR
+        * checkpoint_stats["checkpoint_time"],
+    )
 
 
 class PostgresClient(DBClient):
@@ -57,6 +102,10 @@ class PostgresClient(DBClient):
             raise error
 
     def close_connection(self):
+        # Failed statements already close the connection
+        if self.conn and self.conn.closed:
+            return
+
         if self.cursor:
             self.cursor.close()
 
@@ -66,6 +115,19 @@ class PostgresClient(DBClient):
         if self.logger:
             self.logger.info("Closed connection to Postgres.")
 
+    def is_alive(self) -> bool:
+        # A server restart does not flip conn.closed until the next query
+        #   fails, so probe the connection with a trivial statement
+        if not self.conn or self.conn.closed:
+            return False
+
+        try:
+            self.cursor.execute("SELECT 1;")
+            self.cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
     def execute_and_fetch_results(self, sql, json=True) -> list:
         try:
             self.cursor.execute(sql)
@@ -105,10 +167,34 @@ class PostgresWrapper:
         self.db_cluster = dbms_info["db_cluster"]
         self.db_log_filepath = dbms_info["db_log_filepath"]
         self.db_name = dbms_info["db_name"]
+        self.checkpoint_before_restart = (
+            str(dbms_info.get("checkpoint_before_restart", "false")).lower()
+            == "true"
+        )
+        self.use_snapshot = (
+            str(dbms_info.get("use_snapshot", "false")).lower() == "true"
+        )
         self.logger = CUSTOM_LOGGING_INSTANCE.get_logger()
 
         self.workload_wrapper = workload_wrapper
         self.results_dir = results_dir
+        self.client_pool = DBClientPool(
+            self._create_client, logger=self.logger
+        )
+        self.last_apply_report = None
+        self.restart_manager = PostgresRestartManager(
+            self.db_cluster,
+            self.db_log_filepath,
+            self.host,
+            self.port,
+            self.logger,
+            connect_probe=self._probe_connection,
+        )
+        self.snapshot_manager = PostgresSnapshotManager(
+            self.db_name,
+            lambda: self._create_client(db_name="postgres"),
+            logger=self.logger,
+        )
         # TODO: Add support for remote mode
 
         # DB-wide internal metrics
@@ -144,6 +230,26 @@ class PostgresWrapper:
             "blk_write_time",
         ]
 
+    def _create_client(self, db_name: str = None) -> PostgresClient:
+        return PostgresClient(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            db_name=db_name or self.db_name,
+            logger=self.logger,
+        )
+
+    def get_connection_stats(self) -> dict:
+        return self.client_pool.get_stats()
+
+    def _probe_connection(self) -> bool:
+        try:
+            self.client_pool.release(self.client_pool.acquire())
+            return True
+        except Exception:
+            return False
+
     def _start_postgres(self) -> bool:
         # This function is only used when failing to restart Postgres due to
         #   invalid DBMS configuration (e.g., request too many resources)
@@ -154,71 +260,123 @@ class PostgresWrapper:
         with open(postgres_auto_config_path, "w") as f:
             f.write("# Overwritten invalid configuration.\n")
 
-        payload = [
-            "pg_ctl",
-            "-D",
-            self.db_cluster,
-            "-l",
-            self.db_log_filepath,
-            "start",
-        ]
-        p = subprocess.Popen(
-            payload,
-            stderr=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            close_fds=True,
-        )
-        try:
-            # communicate() will block the program until the subprocess finishes
-            stdout, stderr = p.communicate(timeout=RESTART_TIMEOUT)
-            if p.returncode == 0:
-                self.logger.info(
-                    "Overwritten invalid configuration and started Postgres "
-                    "with default configuration."
-                )
-                self.logger.info(f"Subprocess output: \n{stdout.decode()}")
-                return True
-            else:
-                self.logger.info(
-                    "Failed to overwrite invalid configuration and start "
-                    "Postgres with default configuration."
-                )
-                self.logger.info(f"Subprocess output: \n{stderr.decode()}")
-                return False
-        except subprocess.TimeoutExpired:
-            self.logger.info("Timeout when starting Postgres.")
+        self.client_pool.invalidate()
+
+        if self.restart_manager.start():
+            self.logger.info(
+                "Overwritten invalid configuration and started Postgres "
+                "with default configuration."
+            )
+            return True
+        else:
+            self.logger.info(
+                "Failed to overwrite invalid configuration and start "
+                "Postgres with default configuration."
+            )
             return False
 
-    def _restart_postgres(self) -> bool:
-        payload = [
-            "pg_ctl",
-            "-D",
-            self.db_cluster,
-            "-l",
-            self.db_log_filepath,
-            "restart",
-        ]
-        p = subprocess.Popen(
-            payload,
-            stderr=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            close_fds=True,
+    def _get_checkpoint_buffers(self, pg_client) -> int:
+        results = pg_client.execute_and_fetch_results(
+            "SELECT buffers_checkpoint FROM pg_stat_bgwriter;"
         )
-        try:
-            # communicate() will block the program until the subprocess finishes
-            stdout, stderr = p.communicate(timeout=RESTART_TIMEOUT)
-            if p.returncode == 0:
-                self.logger.info("Restarted Postgres.")
-                self.logger.info(f"Subprocess output: \n{stdout.decode()}")
-                return True
-            else:
-                self.logger.info("Failed to restart Postgres.")
-                self.logger.info(f"Subprocess output: \n{stderr.decode()}")
-                return False
-        except subprocess.TimeoutExpired:
-            self.logger.info("Timeout when restarting Postgres.")
+        return results[0]["buffers_checkpoint"] if results else 0
+
+    def checkpoint(self) -> dict:
+        """Flush dirty buffers with a CHECKPOINT so that the shutdown
+        checkpoint of a subsequent restart has little left to write.
+
+        Returns:
+            (dict): Whether the checkpoint succeeded, its duration, and the
+                number of dirty buffers it flushed according to
+                pg_stat_bgwriter.
+        """
+
+        with self.client_pool.connection() as pg_client:
+            beg_buffers = self._get_checkpoint_buffers(pg_client)
+
+            beg_time = time.time()
+            success = pg_client.execute("CHECKPOINT;")
+            checkpoint_time = time.time() - beg_time
+
+            # Re-read the statistics until they include the checkpoint,
+            #   which flushed nothing if they do not change in time
+            deadline = time.time() + CHECKPOINT_STATS_TIMEOUT
+            while True:
+                pg_client.execute("SELECT pg_stat_clear_snapshot();")
+                end_buffers = self._get_checkpoint_buffers(pg_client)
+                if (
+                    not success
+                    or end_buffers != beg_buffers
+                    or time.time() >= deadline
+                ):
+                    break
+                time.sleep(CHECKPOINT_STATS_POLL_INTERVAL)
+
+        checkpoint_stats = {
+            "success": success,
+            "checkpoint_time": checkpoint_time,
+            "dirty_buffers": max(end_buffers - beg_buffers, 0),
+        }
+        self.logger.info(
+            f"Checkpoint flushed {checkpoint_stats['dirty_buffers']} dirty "
+            f"buffers in {checkpoint_time:.2f} s."
+        )
+
+        return checkpoint_stats
+
+    def _restart_postgres(self) -> bool:
+        restart_timeout = None
+        checkpoint_stats = None
+        if self.checkpoint_before_restart:
+            try:
+                checkpoint_stats = self.checkpoint()
+                restart_timeout = get_restart_timeout(checkpoint_stats)
+            except Exception as error:
+                self.logger.info("Failed to checkpoint before restarting.")
+                self.logger.info(error)
+
+        # Pooled connections do not survive a restart
+        self.client_pool.invalidate()
+
+        restart_predicate = self.restart_manager.restart(restart_timeout)
+        if checkpoint_stats:
+            self.restart_manager.last_profile.update(checkpoint_stats)
+
+        if restart_predicate:
+            self.logger.info("Restarted Postgres.")
+            return True
+        else:
+            self.logger.info("Failed to restart Postgres.")
             return False
 
+    def _reload_postgres(self, changed_knobs: dict) -> bool:
+        with self.client_pool.connection() as pg_client:
+            if not pg_client.execute("SELECT pg_reload_conf();"):
+                self.logger.info("Failed to reload Postgres configuration.")
+                return False
+
+            # pg_reload_conf() only signals the postmaster, so wait until the
+            #   new values are visible
+            deadline = time.time() + RELOAD_TIMEOUT
+            while True:
+                knob_settings = self.get_knob_settings(pg_client)
+                if all(
+                    k in knob_settings
+                    and self._is_same_setting(knob_settings[k], info["new"])
+                    for k, info in changed_knobs.items()
+                    if info["context"] in RELOAD_VISIBLE_CONTEXTS
+                ):
+                    self.logger.info("Reloaded Postgres configuration.")
+                    return True
+
+                if time.time() > deadline:
+                    self.logger.info(
+                        "Timeout when reloading Postgres configuration."
+                    )
+                    return False
+
+                time.sleep(RELOAD_POLL_INTERVAL)
+
     def _check_applied(self, db_conn, k, default_val):
         sql = f"SHOW {k};"
         cur_val = db_conn.execute_and_fetch_results(sql)[0][0]
@@ -230,20 +388,11 @@ class PostgresWrapper:
 
     def get_knob_value(self, k) -> str:
         try:
-            pg_client = PostgresClient(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                db_name=self.db_name,
-                logger=self.logger,
-            )
-
-            get_val_sql = f"SHOW {k};"
-            val = pg_client.execute_and_fetch_results(get_val_sql, json=False)[
-                0
-            ][0]
-            pg_client.close_connection()
+            with self.client_pool.connection() as pg_client:
+                get_val_sql = f"SHOW {k};"
+                val = pg_client.execute_and_fetch_results(
+                    get_val_sql, json=False
+                )[0][0]
 
             return val
         except Exception as error:
@@ -277,52 +426,137 @@ class PostgresWrapper:
 
                 return False
 
+    def get_knob_settings(self, db_client) -> dict:
+        """Read the current settings of all knobs in a single query.
+
+        Returns:
+            (dict): Knob name -> pg_settings row (setting, unit, vartype and
+                context).
+        """
+
+        sql = "SELECT name, setting, unit, vartype, context FROM pg_settings;"
+        results = db_client.execute_and_fetch_results(sql)
+
+        return {row["name"]: row for row in results}
+
+    @staticmethod
+    def _is_same_setting(knob_setting: dict, v) -> bool:
+        cur_val = knob_setting["setting"]
+
+        try:
+            if knob_setting["vartype"] == "integer":
+                return int(cur_val) == int(v)
+            elif knob_setting["vartype"] == "real":
+                return math.isclose(float(cur_val), float(v), rel_tol=1e-9)
+        except (TypeError, ValueError):
+            return False
+
+        return str(cur_val) == str(v)
+
+    def set_knob_values(self, knobs: dict) -> dict:
+        """Set multiple knobs with one read of pg_settings and one
+        ALTER SYSTEM statement per knob whose value actually changes.
+
+        Args:
+            knobs (dict): Knob name -> target value.
+
+        Returns:
+            (dict): Report with keys "changed" (knob -> {"old", "new",
+                "context"}), "unchanged" (list of knobs) and "failed"
+                (knob -> target value).
+        """
+
+        report = {"changed": {}, "unchanged": [], "failed": {}}
+
+        pg_client = self.client_pool.acquire()
+        try:
+            knob_settings = self.get_knob_settings(pg_client)
+
+            for k, v in knobs.items():
+                if k not in knob_settings:
+                    self.logger.info(f"Unknown knob {k}.")
+                    report["failed"][k] = v
+                    continue
+
+                if self._is_same_setting(knob_settings[k], v):
+                    report["unchanged"].append(k)
+                    continue
+
+                if isinstance(v, str):
+                    set_sql = f"ALTER SYSTEM SET {k}='{v}';"
+                else:
+                    set_sql = f"ALTER SYSTEM SET {k}={v};"
+
+                if pg_client.execute(set_sql):
+                    report["changed"][k] = {
+                        "old": knob_settings[k]["setting"],
+                        "new": v,
+                        "context": knob_settings[k]["context"],
+                    }
+                else:
+                    self.logger.info(f"Failed to set knob {k} to {v}.")
+                    report["failed"][k] = v
+
+                    # PostgresClient drops the connection on errors
+                    self.client_pool.release(pg_client)
+                    pg_client = self.client_pool.acquire()
+        finally:
+            self.client_pool.release(pg_client)
+
+        self.logger.info(
+            f"Changed {len(report['changed'])} knob(s), "
+            f"{len(report['unchanged'])} unchanged, "
+            f"{len(report['failed'])} failed."
+        )
+
+        return report
+
     def apply_knobs(self, knobs: Union[dict, Configuration]) -> bool:
         if isinstance(knobs, Configuration):
             knobs = dict(knobs)
 
         try:
-            pg_client = PostgresClient(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                db_name=self.db_name,
-                logger=self.logger,
-            )
-
-            for key in knobs.keys():
-                self.set_knob_value(pg_client, key, knobs[key])
-
-            pg_client.close_connection()
+            self.last_apply_report = self.set_knob_values(knobs)
         except Exception as error:
             self.logger.info("Failed to alter knobs.")
             self.logger.info(error)
 
             return False
 
+        # Only restart if a knob that needs a restart has changed
+        changed_knobs = self.last_apply_report["changed"]
+        if not changed_knobs:
+            self.logger.info("No knob changed. Skipped restarting Postgres.")
+            self.last_apply_report["action"] = "none"
+            return True
+
+        changed_contexts = {info["context"] for info in changed_knobs.values()}
+        if "postmaster" not in changed_contexts:
+            if self._reload_postgres(changed_knobs):
+                self.logger.info(
+                    "Reloaded Postgres to make the DBMS config take effect."
+                )
+                self.last_apply_report["action"] = "reload"
+                return True
+
+            self.logger.info("Falling back to restarting Postgres.")
+
         restart_predicate = self._restart_postgres()
         if restart_predicate:
             self.logger.info(
                 "Restarted Postgres to make the DBMS config take effect."
             )
+            self.last_apply_report["action"] = "restart"
             return True
         else:
+            self.last_apply_report["action"] = "start"
             return self._start_postgres()
 
     def reset_knobs_by_restarting_db(self) -> bool:
         try:
-            pg_client = PostgresClient(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                db_name=self.db_name,
-                logger=self.logger,
-            )
-            reset_sql = "ALTER SYSTEM RESET ALL;"
-            _ = pg_client.execute(reset_sql)
-            pg_client.close_connection()
+            with self.client_pool.connection() as pg_client:
+                reset_sql = "ALTER SYSTEM RESET ALL;"
+                _ = pg_client.execute(reset_sql)
 
             self._restart_postgres()
             self.logger.info("Reset knobs with Postgres restarted.")
@@ -334,11 +568,41 @@ class PostgresWrapper:
 
             return False
 
+    def _get_data_identity(self) -> str:
+        # Snapshots of another workload or scale are recaptured
+        if hasattr(self.workload_wrapper, "get_data_identity"):
+            return self.workload_wrapper.get_data_identity()
+
+        return None
+
+    def has_snapshot(self) -> bool:
+        return self.snapshot_manager.has_snapshot(self._get_data_identity())
+
+    def capture_snapshot(self) -> bool:
+        # Pooled connections to the database would block the clone
+        self.client_pool.invalidate()
+        return self.snapshot_manager.capture(self._get_data_identity())
+
+    def restore_snapshot(self) -> bool:
+        self.client_pool.invalidate()
+        return self.snapshot_manager.restore()
+
     def get_benchbase_metrics(self):
-        metrics_files = glob.glob(f"{self.results_dir}/*.summary.json")
-        latest_metrics_file = max(metrics_files, key=os.path.getctime)
+        # Look up the summary of the latest run in the workload run index
+        result_files = getattr(
+            self.workload_wrapper, "last_result_files", None
+        )
+        if result_files is not None:
+            metrics_file = result_files["summary"]
+            if metrics_file is None:
+                raise FileNotFoundError(
+                    "No BenchBase summary for the latest workload run."
+                )
+        else:
+            metrics_files = glob.glob(f"{self.results_dir}/*.summary.json")
+            metrics_file = max(metrics_files, key=os.path.getctime)
 
-        with open(latest_metrics_file, "r") as f:
+        with open(metrics_file, "r") as f:
             metrics = json.load(f)
 
         return metrics
@@ -368,68 +632,51 @@ class PostgresWrapper:
         return predicate
 
     def reset_cumulative_stats(self):
-        pg_client = PostgresClient(
-            host=self.host,
-            port=self.port,
-            user=self.user,
-            password=self.password,
-            db_name=self.db_name,
-            logger=self.logger,
-        )
         predicate = True
 
-        # reset database statistics
-        db_stats_reset_predicate = self._reset_db_stats(pg_client)
-        predicate = predicate and db_stats_reset_predicate
+        with self.client_pool.connection() as pg_client:
+            # reset database statistics
+            db_stats_reset_predicate = self._reset_db_stats(pg_client)
+            predicate = predicate and db_stats_reset_predicate
 
-        for view in self.CLUSTER_STATS_VIEWS:
-            target = view.split("_")[-1]
-            reset_predicate = self._reset_cluster_stats(pg_client, target)
-            predicate = predicate and reset_predicate
+            for view in self.CLUSTER_STATS_VIEWS:
+                target = view.split("_")[-1]
+                reset_predicate = self._reset_cluster_stats(pg_client, target)
+                predicate = predicate and reset_predicate
 
-        pg_client.close_connection()
         return predicate
 
     def get_dbms_stats(self):
         try:
-            pg_client = PostgresClient(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                db_name=self.db_name,
-                logger=self.logger,
-            )
-
             all_dbms_stats = {}
             numeric_stats = []
 
-            for view in self.CLUSTER_STATS_VIEWS:  # single row per view
-                sql = f"SELECT * FROM {view};"
-                results = pg_client.execute_and_fetch_results(sql)
-                all_dbms_stats[view] = results[0]
+            with self.client_pool.connection() as pg_client:
+                for view in self.CLUSTER_STATS_VIEWS:  # single row per view
+                    sql = f"SELECT * FROM {view};"
+                    results = pg_client.execute_and_fetch_results(sql)
+                    all_dbms_stats[view] = results[0]
 
-                for key in results[0]:
-                    if key in self.NUMERIC_STATS:
-                        numeric_stats.append(results[0][key])
+                    for key in results[0]:
+                        if key in self.NUMERIC_STATS:
+                            numeric_stats.append(results[0][key])
 
-            for view in self.DB_STATS_VIEWS:  # row per database per view
-                sql = f"SELECT * FROM {view};"
-                results = pg_client.execute_and_fetch_results(sql)
+                for view in self.DB_STATS_VIEWS:  # row per database per view
+                    sql = f"SELECT * FROM {view};"
+                    results = pg_client.execute_and_fetch_results(sql)
 
-                for res in results:
-                    if res["datname"] != self.db_name:
-                        continue
-                    else:
-                        all_dbms_stats[view] = res
+                    for res in results:
+                        if res["datname"] != self.db_name:
+                            continue
+                        else:
+                            all_dbms_stats[view] = res
 
-                        for key in res:
-                            if key in self.NUMERIC_STATS:
-                                numeric_stats.append(res[key])
-                        break
+                            for key in res:
+                                if key in self.NUMERIC_STATS:
+                                    numeric_stats.append(res[key])
+                            break
 
             numeric_stats = np.array(numeric_stats)
-            pg_client.close_connection()
 
             return numeric_stats, all_dbms_stats
         except Exception as error:
@@ -0,0 +1,250 @@
+"""Restarting Postgres with explicit shutdown/startup phases and readiness
+polling instead of a single blocking `pg_ctl restart`.
+"""
+
+import os
+import shutil
+import subprocess
+import time
+
+
+RESTART_TIMEOUT = 60  # 60 seconds
+INITIAL_POLL_INTERVAL = 0.05  # 50 milliseconds
+MAX_POLL_INTERVAL = 1  # 1 second
+# Time for a starting postmaster to write its pid file, e.g., it exits
+#   before writing it if its configuration is invalid
+POSTMASTER_PID_TIMEOUT = 2  # 2 seconds
+
+
+class PostgresRestartManager:
+    def __init__(
+        self,
+        db_cluster: str,
+        db_log_filepath: str,
+        host: str,
+        port: int,
+        logger,
+        connect_probe=None,
+        timeout: float = RESTART_TIMEOUT,
+    ) -> None:
+        """
+        Args:
+            db_cluster (str): The Postgres data directory.
+            db_log_filepath (str): The Postgres server log file.
+            host (str): Host to probe for readiness.
+            port (int): Port to probe for readiness.
+            logger (logging.Logger): Logger.
+            connect_probe (callable): Returns True if a connection can be
+                made. Only used if `pg_isready` is not available.
+            timeout (float): Timeout in seconds of each phase.
+        """
+
+        self.db_cluster = db_cluster
+        self.db_log_filepath = db_log_filepath
+        self.host = host
+        self.port = port
+        self.logger = logger
+        self.connect_probe = connect_probe
+        self.timeout = timeout
+
+        self.pg_isready_path = shutil.which("pg_isready")
+
+        # Latency profile of every restart / start
+        self.profiles = []
+        self.last_profile = None
+
+    def _run_pg_ctl(self, args: list, timeout: float) -> bool:
+        payload = ["pg_ctl", "-D", self.db_cluster] + args
+        p = subprocess.Popen(
+            payload,
+            stderr=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            close_fds=True,
+        )
+        try:
+            stdout, stderr = p.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.communicate()
+            self.logger.info(f"Timeout when running pg_ctl {args[-1]}.")
+            return False
+
+        if p.returncode == 0:
+            self.logger.info(f"Subprocess output: \n{stdout.decode()}")
+            return True
+        else:
+            self.logger.info(f"Failed to run pg_ctl {args[-1]}.")
+            self.logger.info(f"Subprocess output: \n{stderr.decode()}")
+            return False
+
+    def _is_ready(self) -> bool:
+        if self.pg_isready_path:
+            p = subprocess.run(
+                [
+                    self.pg_isready_path,
+                    "-h",
+                    str(self.host),
+                    "-p",
+                    str(self.port),
+                    "-t",
+                    "1",
+                ],
+                stderr=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+            )
+            # 0: accepting connections, 1: rejecting (e.g., in recovery),
+            #   2: no response
+            return p.returncode == 0
+        elif self.connect_probe:
+            return self.connect_probe()
+        else:
+            return True
+
+    def is_postmaster_running(self, start_time: float = None) -> bool:
+        """Check the pid file of the postmaster of the data directory.
+
+        Args:
+            start_time (float): When the postmaster was started. A missing
+                pid file only means that it is not running once it had time
+                to write it.
+
+        Returns:
+            (bool): Whether the postmaster may be running.
+        """
+
+        pid_filepath = os.path.join(self.db_cluster, "postmaster.pid")
+        try:
+            with open(pid_filepath) as f:
+                pid = int(f.readline())
+        except (OSError, ValueError):
+            return (
+                start_time is not None
+                and time.time() - start_time < POSTMASTER_PID_TIMEOUT
+            )
+
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # Running as another user
+            pass
+
+        return True
+
+    def wait_until_ready(
+        self, timeout: float = None, start_time: float = None
+    ) -> bool:
+        """Poll the server with exponential backoff until it accepts
+        connections or the timeout expires.
+
+        Args:
+            timeout (float): Timeout in seconds. Defaults to `self.timeout`.
+            start_time (float): When the postmaster was started, if it was.
+                Polling then stops as soon as the postmaster exits, e.g.,
+                because of an invalid configuration.
+        """
+
+        deadline = time.time() + (timeout or self.timeout)
+        interval = INITIAL_POLL_INTERVAL
+
+        while True:
+            if self._is_ready():
+                return True
+
+            if start_time is not None and not self.is_postmaster_running(
+                start_time
+            ):
+                self.logger.info("Postgres exited while starting up.")
+                return False
+
+            if time.time() + interval > deadline:
+                self.logger.info("Timeout when waiting for Postgres.")
+                return False
+
+            time.sleep(interval)
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+    def stop(self, timeout: float = None) -> bool:
+        timeout = timeout or self.timeout
+
+        # Fast shutdown aborts open sessions instead of waiting for them
+        return self._run_pg_ctl(
+            ["-m", "fast", "-w", "-t", str(int(timeout)), "stop"],
+            # Leave pg_ctl some slack to report its own timeout
+            timeout + 5,
+        )
+
+    def start(self, timeout: float = None) -> bool:
+        started, startup_time, recovery_time = self._start(timeout)
+        self._record_profile(started, 0, startup_time, recovery_time)
+
+        return started
+
+    def _start(self, timeout: float = None) -> tuple:
+        timeout = timeout or self.timeout
+
+        beg_time = time.time()
+        # Do not let pg_ctl wait; readiness is polled separately so that
+        #   recovery time can be told apart from process startup
+        started = self._run_pg_ctl(
+            ["-l", self.db_log_filepath, "-W", "start"], timeout
+        )
+        startup_time = time.time() - beg_time
+
+        if not started:
+            return False, startup_time, 0
+
+        start_time = beg_time
+        beg_time = time.time()
+        ready = self.wait_until_ready(timeout, start_time=start_time)
+        recovery_time = time.time() - beg_time
+
+        return ready, startup_time, recovery_time
+
+    def restart(self, timeout: float = None) -> bool:
+        """Restart Postgres.
+
+        Args:
+            timeout (float): Timeout in seconds of each phase. Defaults to
+                `self.timeout`.
+
+        Returns:
+            (bool): Whether Postgres is ready to accept connections.
+        """
+
+        beg_time = time.time()
+        stopped = self.stop(timeout)
+        shutdown_time = time.time() - beg_time
+
+        if not stopped:
+            self.logger.info("Trying to start Postgres anyway.")
+
+        started, startup_time, recovery_time = self._start(timeout)
+        self._record_profile(
+            started, shutdown_time, startup_time, recovery_time
+        )
+
+        return started
+
+    def _record_profile(
+        self,
+        success: bool,
+        shutdown_time: float,
+        startup_time: float,
+        recovery_time: float,
+    ) -> None:
+        self.last_profile = {
+            "success": success,
+            "shutdown_time": shutdown_time,
+            "startup_time": startup_time,
+            "recovery_time": recovery_time,
+            "restart_time": shutdown_time + startup_time + recovery_time,
+        }
+        self.profiles.append(self.last_profile)
+
+        self.logger.info(
+            f"Restart profile -- shutdown: {shutdown_time:.2f} s, "
+            f"startup: {startup_time:.2f} s, "
+            f"recovery: {recovery_time:.2f} s."
+        )
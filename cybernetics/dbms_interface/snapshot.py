@@ -0,0 +1,140 @@
+"""Snapshotting the benchmark database so that it can be reset between
+trials without reloading the data.
+
+A snapshot is a template database cloned from the freshly loaded database
+with `CREATE DATABASE ... TEMPLATE`. Restoring drops the mutated database and
+clones it again from the snapshot.
+
+The identity of the loaded data, e.g., the workload and its scale factor, is
+recorded as the comment of the snapshot, so a snapshot of other data is not
+reused.
+"""
+
+import time
+
+
+class PostgresSnapshotManager:
+    def __init__(self, db_name: str, client_factory, logger=None) -> None:
+        """
+        Args:
+            db_name (str): The database to snapshot and restore.
+            client_factory (callable): Creates a DBClient connected to a
+                different database (e.g., postgres) than `db_name`, since a
+                database cannot be dropped or cloned while connected to it.
+            logger (logging.Logger): Optional logger.
+        """
+
+        self.db_name = db_name
+        self.client_factory = client_factory
+        self.logger = logger
+
+        self.snapshot_name = f"{db_name}_snapshot"
+        self.last_capture_time = None
+        self.last_restore_time = None
+
+    @staticmethod
+    def _terminate_connections(pg_client, db_name: str):
+        # Neither the source of a clone nor a dropped database may have
+        #   open connections
+        sql = (
+            "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+            f"WHERE datname = '{db_name}' AND pid <> pg_backend_pid();"
+        )
+        return pg_client.execute(sql)
+
+    def _clone(self, source: str, target: str) -> bool:
+        pg_client = self.client_factory()
+
+        try:
+            predicate = self._terminate_connections(pg_client, source)
+            predicate = predicate and self._terminate_connections(
+                pg_client, target
+            )
+            predicate = predicate and pg_client.execute(
+                f"DROP DATABASE IF EXISTS {target};"
+            )
+            predicate = predicate and pg_client.execute(
+                f"CREATE DATABASE {target} TEMPLATE {source};"
+            )
+        finally:
+            pg_client.close_connection()
+
+        return predicate
+
+    def has_snapshot(self, identity: str = None) -> bool:
+        """Whether there is a snapshot of the data with the given identity.
+
+        Args:
+            identity (str): Identity of the loaded data, if any.
+        """
+
+        pg_client = self.client_factory()
+        sql = (
+            "SELECT shobj_description(oid, 'pg_database') FROM pg_database "
+            f"WHERE datname = '{self.snapshot_name}';"
+        )
+        results = pg_client.execute_and_fetch_results(sql, json=False)
+        pg_client.close_connection()
+
+        if len(results) == 0:
+            return False
+
+        if identity is not None and results[0][0] != identity:
+            if self.logger:
+                self.logger.info(
+                    f"Snapshot {self.snapshot_name} of {results[0][0]} does "
+                    f"not match {identity}."
+                )
+            return False
+
+        return True
+
+    def capture(self, identity: str = None) -> bool:
+        """Snapshot the database.
+
+        Args:
+            identity (str): Identity of the loaded data, if any.
+        """
+
+        beg_time = time.time()
+        predicate = self._clone(self.db_name, self.snapshot_name)
+        if predicate and identity is not None:
+            comment = identity.replace("'", "''")
+            pg_client = self.client_factory()
+            try:
+                predicate = pg_client.execute(
+                    f"COMMENT ON DATABASE {self.snapshot_name} IS "
+                    f"'{comment}';"
+                )
+            finally:
+                pg_client.close_connection()
+        self.last_capture_time = time.time() - beg_time
+
+        if self.logger:
+            if predicate:
+                self.logger.info(
+                    f"Captured snapshot {self.snapshot_name} in "
+                    f"{self.last_capture_time:.2f} s."
+                )
+            else:
+                self.logger.info(
+                    f"Failed to capture snapshot of {self.db_name}."
+                )
+
+        return predicate
+
+    def restore(self) -> bool:
+        beg_time = time.time()
+        predicate = self._clone(self.snapshot_name, self.db_name)
+        self.last_restore_time = time.time() - beg_time
+
+        if self.logger:
+            if predicate:
+                self.logger.info(
+                    f"Restored {self.db_name} from snapshot in "
+                    f"{self.last_restore_time:.2f} s."
+                )
+            else:
+                self.logger.info(f"Failed to restore {self.db_name}.")
+
+        return predicate
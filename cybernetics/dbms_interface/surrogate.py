@@ -0,0 +1,264 @@
+"""Surrogate ("digital twin") of a DBMS running a workload.
+
+A regression model trained on stored trials predicts the workload metrics
+and DBMS statistics of a configuration in milliseconds. The surrogate
+implements the interfaces of both the DBMS wrapper and the workload wrapper
+used by the tuning engine, so optimizers can be compared end to end without
+a database.
+"""
+
+import numpy as np
+
+from ConfigSpace import Configuration, ConfigurationSpace
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import Matern, WhiteKernel
+
+from cybernetics.utils.custom_logging import CUSTOM_LOGGING_INSTANCE
+from cybernetics.utils.trial_store import (
+    DEFAULT_CONFIG,
+    TrialStore,
+    get_target_perf,
+)
+
+
+def create_regressor(model: str, seed: int):
+    if model == "rf":
+        return RandomForestRegressor(n_estimators=100, random_state=seed)
+    elif model == "gp":
+        return GaussianProcessRegressor(
+            kernel=Matern(nu=2.5) + WhiteKernel(),
+            normalize_y=True,
+            random_state=seed,
+        )
+    else:
+        raise ValueError(f"Surrogate model {model} not supported.")
+
+
+class SurrogateModel:
+    def __init__(
+        self,
+        dbms_config_space: ConfigurationSpace,
+        target_metric: str,
+        model: str = "rf",
+        seed: int = 0,
+    ):
+        """
+        Args:
+            dbms_config_space (ConfigurationSpace): The knob space.
+            target_metric (str): The predicted metric.
+            model (str): rf (random forest) or gp (Gaussian process).
+            seed (int): Random seed of the regressors.
+        """
+
+        self.dbms_config_space = dbms_config_space
+        self.target_metric = target_metric
+        self.model = model
+        self.seed = seed
+
+        self.perf_regressor = None
+        # DBMS statistics are only predicted if the trials have them
+        self.stats_regressor = None
+        self.logger = CUSTOM_LOGGING_INSTANCE.get_logger()
+
+    def encode(self, dbms_config) -> np.ndarray:
+        """Encode a configuration as a vector in [0, 1], with the default
+        value of every knob missing from the configuration."""
+
+        values = dict(self.dbms_config_space.get_default_configuration())
+        for knob, value in dbms_config.items():
+            if knob in values:
+                values[knob] = value
+
+        x = Configuration(self.dbms_config_space, values=values).get_array()
+        return np.nan_to_num(x)
+
+    def fit(self, trials: list):
+        """Fit the surrogate on stored trials.
+
+        Args:
+            trials (list): Trials from the trial store. Trials predicted by
+                a surrogate are ignored.
+        """
+
+        trials = [
+            trial for trial in trials
+            if trial["target_metric"] == self.target_metric
+            and not trial["early_stopped"]
+            and not trial["predicted"]
+        ]
+        if not trials:
+            raise ValueError("No trials to fit the surrogate on.")
+
+        X = np.array([self.encode(trial["dbms_config"]) for trial in trials])
+        y = np.array([
+            get_target_perf(trial["performance"], self.target_metric)
+            for trial in trials
+        ])
+        self.perf_regressor = create_regressor(self.model, self.seed)
+        self.perf_regressor.fit(X, y)
+
+        stats_trials = [
+            i for i, trial in enumerate(trials)
+            if trial["numeric_stats"] is not None
+        ]
+        n_stats = {len(trials[i]["numeric_stats"]) for i in stats_trials}
+        if len(n_stats) == 1:
+            # The statistics are cumulative counters, so fit on a log scale
+            Y = np.log1p(np.maximum(np.array([
+                trials[i]["numeric_stats"] for i in stats_trials
+            ], dtype=float), 0))
+            # Only random forests predict several outputs natively
+            self.stats_regressor = create_regressor("rf", self.seed)
+            self.stats_regressor.fit(X[stats_trials], Y)
+
+        self.logger.info(
+            f"Fitted the {self.model} surrogate on {len(trials)} trials "
+            f"({len(stats_trials)} with DBMS statistics)."
+        )
+
+        return self
+
+    def predict(self, dbms_config) -> float:
+        """Predict the target metric of a configuration."""
+
+        x = self.encode(dbms_config)[None, :]
+
+        # Performance is never negative
+        return max(float(self.perf_regressor.predict(x)[0]), 0.0)
+
+    def predict_stats(self, dbms_config) -> np.ndarray:
+        """Predict the DBMS statistics after running the workload, or None
+        if the surrogate was fitted without statistics."""
+
+        if self.stats_regressor is None:
+            return None
+
+        x = self.encode(dbms_config)[None, :]
+        return np.expm1(self.stats_regressor.predict(x)[0])
+
+
+class SurrogateEvaluator:
+    """Stands in for both the DBMS wrapper and the workload wrapper."""
+
+    def __init__(self, surrogate_model: SurrogateModel):
+        self.surrogate_model = surrogate_model
+        self.target_metric = surrogate_model.target_metric
+        self.logger = CUSTOM_LOGGING_INSTANCE.get_logger()
+
+        # DBMS wrapper state read by the tuning engine
+        self.use_snapshot = False
+        self.last_apply_report = None
+        self.dbms_config = DEFAULT_CONFIG
+
+        # Workload wrapper state read by the tuning engine
+        self.first_run = True
+        self.duration = None
+        self.returncode = None
+        self.last_perf = None
+
+    # DBMS wrapper interface
+    def apply_knobs(self, knobs: dict) -> bool:
+        self.dbms_config = dict(knobs)
+        self.last_apply_report = {
+            "changed": {},
+            "unchanged": list(knobs),
+            "failed": {},
+            "action": "none",
+        }
+
+        return True
+
+    def reset_knobs_by_restarting_db(self) -> bool:
+        self.dbms_config = DEFAULT_CONFIG
+
+        return True
+
+    def has_snapshot(self) -> bool:
+        return True
+
+    def capture_snapshot(self) -> bool:
+        return True
+
+    def restore_snapshot(self) -> bool:
+        return True
+
+    def get_benchbase_metrics(self) -> dict:
+        if self.target_metric == "throughput":
+            return {"Throughput (requests/second)": self.last_perf}
+        else:
+            return {
+                "Latency Distribution": {
+                    "95th Percentile Latency (microseconds)": self.last_perf
+                }
+            }
+
+    def get_dbms_stats(self):
+        numeric_stats = self.surrogate_model.predict_stats(self.dbms_config)
+
+        return numeric_stats, {}
+
+    # Workload wrapper interface
+    def set_duration(self, duration: int = None) -> None:
+        self.duration = duration
+
+    def load(self) -> bool:
+        self.first_run = False
+
+        return True
+
+    def run(self, callback=None) -> bool:
+        self.last_perf = self.surrogate_model.predict(self.dbms_config)
+        self.first_run = False
+        self.returncode = 0
+
+        return True
+
+    def iter_run(self):
+        # No per-window samples are predicted
+        self.run()
+        yield from ()
+
+
+def get_surrogate_evaluator(config, dbms_config_space: ConfigurationSpace):
+    """Create the surrogate evaluator in the [surrogate] section of the
+    config, fitted on the given trial stores, e.g.:
+
+        [surrogate]
+        trial_stores=/exps/tpcc/bo_rf/trials.sqlite
+        model=rf
+    """
+
+    # The surrogate predicts full workload runs only, so the budgets of
+    #   multi-fidelity BO would all be the same fidelity
+    optimizer = config["config_optimizer"]["optimizer"]
+    if optimizer == "bo-mf":
+        raise ValueError("The surrogate does not support multi-fidelity BO.")
+
+    section = config["surrogate"]
+    trials = []
+    for trial_store_filepath in section["trial_stores"].split(","):
+        trial_store = TrialStore(trial_store_filepath.strip())
+        trials += trial_store.get_trials(
+            dbms_name=config["dbms_info"]["dbms_name"],
+            workload=config["workload_info"]["workload"],
+        )
+        trial_store.close()
+
+    surrogate_model = SurrogateModel(
+        dbms_config_space,
+        config["config_optimizer"]["target_metric"],
+        model=section.get("model", "rf"),
+        seed=int(config["knob_space"]["random_seed"]),
+    ).fit(trials)
+
+    # DDPG observes the DBMS statistics as its state
+    if (
+        optimizer.startswith("rl") or optimizer.startswith("liquid")
+    ) and surrogate_model.stats_regressor is None:
+        raise ValueError(
+            f"The {optimizer} optimizer needs DBMS statistics, but the "
+            "surrogate trials have none or of several sizes."
+        )
+
+    return SurrogateEvaluator(surrogate_model)
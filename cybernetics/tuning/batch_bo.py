@@ -0,0 +1,307 @@
+"""Batch (q-point) Bayesian optimization.
+
+SMAC proposes a single configuration per ask(), refitting its surrogate and
+re-optimizing the acquisition function for every trial. The batch proposer
+fits the surrogate model of the SMAC facade, i.e., its random forest or
+Gaussian process, on the SMAC run history once per round and proposes q
+diverse configurations, which are evaluated together, e.g., on a pool of
+workers, and then told to SMAC.
+"""
+
+import copy
+
+import numpy as np
+
+from ConfigSpace import Configuration, ConfigurationSpace
+from ConfigSpace.util import get_one_exchange_neighbourhood
+from scipy.stats import norm
+
+from cybernetics.utils.custom_logging import CUSTOM_LOGGING_INSTANCE
+
+
+BATCH_STRATEGIES = ["thompson", "constant_liar"]
+# Constant liar refits the surrogate for every proposal of a batch
+MAX_CONSTANT_LIAR_BATCH_SIZE = 8
+
+
+def encode_configs(dbms_configs: list) -> np.ndarray:
+    # Inactive knobs are encoded as nan
+    return np.nan_to_num(
+        np.array([dbms_config.get_array() for dbms_config in dbms_configs])
+    )
+
+
+def get_expected_improvement(mean, std, best_cost: float) -> np.ndarray:
+    """Expected improvement over the best cost when minimizing."""
+
+    improvement = best_cost - mean
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = improvement / std
+        ei = improvement * norm.cdf(z) + std * norm.pdf(z)
+
+    return np.where(std > 0, ei, np.maximum(improvement, 0))
+
+
+class BatchProposer:
+    def __init__(
+        self,
+        dbms_config_space: ConfigurationSpace,
+        batch_size: int,
+        strategy: str = "thompson",
+        n_initial_trials: int = 10,
+        n_candidates: int = 1000,
+        n_local_configs: int = 5,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            dbms_config_space (ConfigurationSpace): The optimized space.
+            batch_size (int): Number of configurations proposed per round.
+            strategy (str): thompson (one posterior sample per proposal) or
+                constant_liar (the pending proposals are assumed to have the
+                worst observed cost). Constant liar refits the surrogate
+                for every proposal, so its batches are at most
+                MAX_CONSTANT_LIAR_BATCH_SIZE configurations.
+            n_initial_trials (int): Number of trials before the surrogate
+                is used.
+            n_candidates (int): Number of random candidate configurations.
+            n_local_configs (int): Number of best configurations whose
+                neighbours are candidates as well.
+            seed (int): Random seed.
+        """
+
+        if strategy not in BATCH_STRATEGIES:
+            raise ValueError(f"Batch strategy {strategy} not supported.")
+        if (
+            strategy == "constant_liar"
+            and batch_size > MAX_CONSTANT_LIAR_BATCH_SIZE
+        ):
+            raise ValueError(
+                "Constant liar proposes at most "
+                f"{MAX_CONSTANT_LIAR_BATCH_SIZE} configurations per batch."
+            )
+
+        self.dbms_config_space = dbms_config_space
+        self.batch_size = batch_size
+        self.strategy = strategy
+        self.n_initial_trials = n_initial_trials
+        self.n_candidates = n_candidates
+        self.n_local_configs = n_local_configs
+        self.seed = seed
+        self.rng = np.random.RandomState(seed)
+        # Candidates are sampled from a private copy of the space, so the
+        #   random state of the space shared with SMAC is left alone
+        self.sampling_space = copy.deepcopy(dbms_config_space)
+        self.sampling_space.seed(seed)
+        self.logger = CUSTOM_LOGGING_INSTANCE.get_logger()
+
+    def get_candidates(self, dbms_configs: list, costs: list) -> list:
+        """Get random configurations and neighbours of the best evaluated
+        ones, without the evaluated configurations."""
+
+        candidates = [
+            Configuration(self.dbms_config_space, vector=candidate.get_array())
+            for candidate in self.sampling_space.sample_configuration(
+                self.n_candidates
+            )
+        ]
+        for i in np.argsort(costs)[: self.n_local_configs]:
+            candidates += list(
+                get_one_exchange_neighbourhood(
+                    dbms_configs[i], seed=self.rng.randint(2**31 - 1)
+                )
+            )
+
+        evaluated_configs = set(dbms_configs)
+        return list(dict.fromkeys(
+            candidate for candidate in candidates
+            if candidate not in evaluated_configs
+        ))
+
+    @staticmethod
+    def predict(model, X: np.ndarray):
+        """Predict the mean and standard deviation of the costs."""
+
+        mean, var = model.predict_marginalized(X)
+
+        return mean.ravel(), np.sqrt(np.maximum(var.ravel(), 0))
+
+    def sample_costs(self, model, X: np.ndarray, n_samples: int):
+        """Draw cost samples of the candidates from the surrogate.
+
+        Returns:
+            (np.ndarray): One row of candidate costs per sample.
+        """
+
+        # Gaussian processes sample whole cost functions
+        if hasattr(model, "sample_functions"):
+            return np.asarray(
+                model.sample_functions(X, n_funcs=n_samples)
+            ).reshape(len(X), n_samples).T
+
+        # Random forests only predict marginals, which are sampled
+        #   independently per candidate
+        mean, std = self.predict(model, X)
+        return mean + std * self.rng.standard_normal((n_samples, len(X)))
+
+    def propose(self, model, dbms_configs: list, costs: list,
+                batch_size: int = None) -> list:
+        """Propose a batch of configurations to evaluate.
+
+        Args:
+            model (AbstractModel): The surrogate model of the SMAC facade,
+                which is refitted on the evaluated configurations.
+            dbms_configs (list): Evaluated configurations.
+            costs (list): Their costs, which are minimized.
+            batch_size (int): Number of configurations to propose, by
+                default the batch size of the proposer.
+
+        Returns:
+            (list): Distinct configurations that were not evaluated yet.
+        """
+
+        batch_size = batch_size or self.batch_size
+        X = encode_configs(dbms_configs)
+        y = np.asarray(costs, dtype=float)
+
+        candidates = self.get_candidates(dbms_configs, costs)
+        X_candidates = encode_configs(candidates)
+        batch_size = min(batch_size, len(candidates))
+
+        chosen = []
+        if self.strategy == "thompson":
+            # The surrogate is fitted once for the whole batch
+            model.train(X, y[:, None])
+            for sample in self.sample_costs(model, X_candidates, batch_size):
+                sample[chosen] = np.inf
+                chosen.append(int(np.argmin(sample)))
+        else:
+            lie = y.max()
+            for _ in range(batch_size):
+                model.train(X, y[:, None])
+                mean, std = self.predict(model, X_candidates)
+                ei = get_expected_improvement(mean, std, y.min())
+                ei[chosen] = -np.inf
+                chosen.append(int(np.argmax(ei)))
+
+                # Pretend the chosen configuration was evaluated, which
+                #   steers the next proposals away from it
+                X = np.vstack([X, X_candidates[chosen[-1]]])
+                y = np.append(y, lie)
+
+        self.logger.info(
+            f"Proposed {len(chosen)} configurations by {self.strategy} out "
+            f"of {len(candidates)} candidates."
+        )
+
+        return [candidates[i] for i in chosen]
+
+
+def get_batch_proposer(config, dbms_config_space: ConfigurationSpace):
+    """Create the batch proposer of the [config_optimizer] section of the
+    config, or None if BO proposes one configuration at a time, e.g.:
+
+        [config_optimizer]
+        optimizer=bo-rf
+        batch_size=4
+        batch_strategy=thompson
+    """
+
+    section = config["config_optimizer"]
+    batch_size = int(section.get("batch_size", 1))
+    if batch_size <= 1:
+        return None
+
+    if section["optimizer"] == "bo-mf":
+        raise ValueError("Batch proposals do not support multi-fidelity BO.")
+
+    return BatchProposer(
+        dbms_config_space,
+        batch_size,
+        strategy=section.get("batch_strategy", "thompson"),
+        n_initial_trials=int(section.get("n_initial_configs", 10)),
+        seed=int(config["knob_space"]["random_seed"]),
+    )
+
+
+def get_observed_trials(runhistory):
+    """Get the successfully evaluated configurations of a SMAC run history
+    and their costs."""
+
+    from smac.runhistory.enumerations import StatusType
+
+    dbms_configs = []
+    costs = []
+    for trial_key, trial_value in runhistory.items():
+        if trial_value.status != StatusType.SUCCESS:
+            continue
+
+        dbms_configs.append(runhistory.get_config(trial_key.config_id))
+        costs.append(trial_value.cost)
+
+    return dbms_configs, costs
+
+
+def optimize_in_batches(optimizer, proposer: BatchProposer,
+                        evaluate_function, n_trials: int, seed: int,
+                        is_budget_exhausted=None):
+    """Drive a SMAC optimizer with batches of proposals.
+
+    SMAC's initial design is used until the run history has enough trials
+    to fit the surrogate model of the facade.
+
+    Args:
+        optimizer: SMAC facade.
+        proposer (BatchProposer): Proposes the batches.
+        evaluate_function (callable): Evaluates a batch of configurations
+            and returns their costs, with None for the failed trials.
+        n_trials (int): Number of trials to evaluate.
+        seed (int): Seed of the trials told to SMAC.
+        is_budget_exhausted (callable): Returns whether the tuning budget
+            is exhausted, after which no new batches are proposed.
+
+    Returns:
+        (Configuration): The incumbent configuration.
+    """
+
+    from smac.runhistory.dataclasses import TrialInfo, TrialValue
+    from smac.runhistory.enumerations import StatusType
+
+    logger = CUSTOM_LOGGING_INSTANCE.get_logger()
+
+    n_evaluated = 0
+    while n_evaluated < n_trials:
+        if is_budget_exhausted and is_budget_exhausted():
+            break
+
+        batch_size = min(proposer.batch_size, n_trials - n_evaluated)
+        dbms_configs, costs = get_observed_trials(optimizer.runhistory)
+        if len(dbms_configs) < proposer.n_initial_trials:
+            trial_infos = [optimizer.ask() for _ in range(batch_size)]
+        else:
+            trial_infos = [
+                TrialInfo(config=dbms_config, seed=seed)
+                for dbms_config in proposer.propose(
+                    optimizer._model, dbms_configs, costs, batch_size
+                )
+            ]
+            if not trial_infos:
+                logger.info("No configurations left to propose.")
+                break
+
+        logger.info(f"Evaluating a batch of {len(trial_infos)} trials.")
+        batch_costs = evaluate_function(
+            [trial_info.config for trial_info in trial_infos]
+        )
+        for trial_info, cost in zip(trial_infos, batch_costs):
+            if cost is None:
+                trial_value = TrialValue(
+                    cost=optimizer.scenario.crash_cost,
+                    status=StatusType.CRASHED,
+                )
+            else:
+                trial_value = TrialValue(cost=cost)
+            optimizer.tell(trial_info, trial_value)
+        n_evaluated += len(trial_infos)
+
+    return optimizer.intensifier.get_incumbent()
@@ -0,0 +1,82 @@
+"""Budget of a tuning session."""
+
+import numpy as np
+
+
+DEFAULT_N_TRIALS = 100
+
+
+class TuningBudget:
+    def __init__(
+        self,
+        n_trials: int = DEFAULT_N_TRIALS,
+        max_wall_time: float = None,
+        max_evaluation_time: float = None,
+    ):
+        """
+        Args:
+            n_trials (int): Maximum number of trials.
+            max_wall_time (float): Maximum wall-clock time in seconds of the
+                whole session.
+            max_evaluation_time (float): Maximum cumulative time in seconds
+                spent evaluating configurations.
+        """
+
+        self.n_trials = n_trials
+        self.max_wall_time = max_wall_time
+        self.max_evaluation_time = max_evaluation_time
+
+    def get_used_fraction(
+        self, n_trials: int, wall_time: float, evaluation_time: float
+    ) -> float:
+        """Get the fraction of the most used budget.
+
+        Returns:
+            (float): The used fraction in [0, 1].
+        """
+
+        used_fractions = [n_trials / self.n_trials]
+        if self.max_wall_time is not None:
+            used_fractions.append(wall_time / self.max_wall_time)
+        if self.max_evaluation_time is not None:
+            used_fractions.append(evaluation_time / self.max_evaluation_time)
+
+        return float(np.clip(max(used_fractions), 0, 1))
+
+    def is_exhausted(
+        self, n_trials: int, wall_time: float, evaluation_time: float
+    ) -> bool:
+        return self.get_used_fraction(n_trials, wall_time, evaluation_time) >= 1
+
+    def __str__(self) -> str:
+        return (
+            f"{self.n_trials} trials, {self.max_wall_time} s wall time, "
+            f"{self.max_evaluation_time} s evaluation time"
+        )
+
+
+def get_tuning_budget(config) -> TuningBudget:
+    """Read the tuning budget from the [config_optimizer] section of the
+    config, e.g.:
+
+        [config_optimizer]
+        n_trials=100
+        max_wall_time=86400
+        max_evaluation_time=72000
+    """
+
+    section = config["config_optimizer"]
+    # DDPG configs give the number of trials as n_total_configs
+    n_trials = section.get(
+        "n_trials", section.get("n_total_configs", DEFAULT_N_TRIALS)
+    )
+    max_wall_time = section.get("max_wall_time")
+    max_evaluation_time = section.get("max_evaluation_time")
+
+    return TuningBudget(
+        n_trials=int(n_trials),
+        max_wall_time=float(max_wall_time) if max_wall_time else None,
+        max_evaluation_time=(
+            float(max_evaluation_time) if max_evaluation_time else None
+        ),
+    )
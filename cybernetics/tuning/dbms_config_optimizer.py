@@ -11,35 +11,133 @@ import smac.initial_design as smac_init_design
 
 from ConfigSpace import ConfigurationSpace
 from smac import BlackBoxFacade as BBFacade
+from smac import Callback
 from smac import HyperparameterOptimizationFacade as HPOFacade
+from smac import MultiFidelityFacade as MFFacade
 from smac import Scenario
+from smac.random_design import ProbabilityRandomDesign
 
+from cybernetics.tuning.budget import get_tuning_budget
+from cybernetics.tuning.ddpg.offline_training import get_transition_arrays
+from cybernetics.tuning.ddpg.reward import get_ddpg_reward
+from cybernetics.tuning.warm_start import get_n_warm_start_trials
 from cybernetics.utils.custom_logging import CUSTOM_LOGGING_INSTANCE
 
 
+# Default probabilities of the facades to interleave random configurations
+RANDOM_DESIGN_PROBABILITIES = {
+    "bo-gp": 0.08447232371720552,
+    "bo-rf": 0.2,
+    "bo-mf": 0.2,
+}
+
+
+class BudgetAwareRandomDesign(ProbabilityRandomDesign):
+    """Interleave fewer random configurations as the tuning budget runs out,
+    so that the last trials exploit the surrogate model."""
+
+    def __init__(self, get_used_budget, probability: float, seed: int = 0):
+        """
+        Args:
+            get_used_budget (callable): Returns the used fraction of the
+                tuning budget.
+            probability (float): Probability of a random configuration at
+                the start of the session.
+        """
+
+        super().__init__(probability=probability, seed=seed)
+        self.get_used_budget = get_used_budget
+
+    def check(self, iteration: int) -> bool:
+        assert iteration >= 0
+
+        probability = self._probability * (1 - self.get_used_budget())
+        return self._rng.random() < probability
+
+
+class BudgetCallback(Callback):
+    """Stop the SMAC optimization loop once the tuning budget is
+    exhausted."""
+
+    def __init__(self, is_budget_exhausted):
+        super().__init__()
+        self.is_budget_exhausted = is_budget_exhausted
+
+    def on_tell_end(self, smbo, info, value):
+        if self.is_budget_exhausted():
+            return False
+
+        return None
+
+
 def get_bo_optimizer(config, dbms_config_space: ConfigurationSpace,
-                     target_function):
+                     target_function, get_used_budget=None,
+                     is_budget_exhausted=None):
+    # Multi-fidelity BO uses the workload execution time (in seconds) as
+    # budget
+    budget_kwargs = {}
+    if config["config_optimizer"]["optimizer"] == "bo-mf":
+        budget_kwargs = {
+            "min_budget": int(config["config_optimizer"]["min_budget"]),
+            "max_budget": int(config["config_optimizer"]["max_budget"]),
+        }
+
+    # SMAC counts the warm-start trials in its run history as trials, so
+    #   leave room for them. The tuning budget only counts evaluated trials
+    #   and stops SMAC through the budget callback.
     scenario = Scenario(
         configspace=dbms_config_space,
         output_directory=config["results"]["save_path"],
         deterministic=True,
         objectives="cost", # minimize the objective
-        n_trials=100,
-        seed=int(config["knob_space"]["random_seed"])
+        n_trials=(
+            get_tuning_budget(config).n_trials
+            + get_n_warm_start_trials(config)
+        ),
+        seed=int(config["knob_space"]["random_seed"]),
+        **budget_kwargs
     )
 
     target_function = partial(target_function,
                               seed=int(config["knob_space"]["random_seed"]))
 
+    # Shift to exploitation as the tuning budget runs out, and stop once it
+    #   is exhausted
+    facade_kwargs = {}
+    if get_used_budget:
+        facade_kwargs["random_design"] = BudgetAwareRandomDesign(
+            get_used_budget,
+            RANDOM_DESIGN_PROBABILITIES[
+                config["config_optimizer"]["optimizer"]
+            ],
+            seed=int(config["knob_space"]["random_seed"]),
+        )
+    if is_budget_exhausted:
+        facade_kwargs["callbacks"] = [BudgetCallback(is_budget_exhausted)]
+
     if config["config_optimizer"]["optimizer"] == "bo-gp":
         optimizer = BBFacade(
             scenario=scenario,
-            target_function=target_function
+            target_function=target_function,
+            **facade_kwargs
         )
     elif config["config_optimizer"]["optimizer"] == "bo-rf":
         optimizer = HPOFacade(
             scenario=scenario,
-            target_function=target_function
+            target_function=target_function,
+            **facade_kwargs
+        )
+    elif config["config_optimizer"]["optimizer"] == "bo-mf":
+        # Hyperband promotes only the most promising configs to longer runs
+        intensifier = MFFacade.get_intensifier(
+            scenario,
+            eta=int(config["config_optimizer"].get("eta", 3))
+        )
+        optimizer = MFFacade(
+            scenario=scenario,
+            target_function=target_function,
+            intensifier=intensifier,
+            **facade_kwargs
         )
     else:
         raise ValueError(f"Optimizer {optimizer} not supported.")
@@ -54,7 +152,7 @@ def get_ddpg_optimizer(config, dbms_config_space: ConfigurationSpace,
         output_directory=config["results"]["save_path"],
         deterministic=True,
         objectives="cost", # minimize the objective
-        n_trials=100, # 100 is the default value
+        n_trials=get_tuning_budget(config).n_trials,
         seed=int(config["knob_space"]["random_seed"])
     )
 
@@ -71,6 +169,9 @@ def get_ddpg_optimizer(config, dbms_config_space: ConfigurationSpace,
     n_states = int(config["dbms_info"]["n_numeric_stats"])
     n_actions = len(dbms_config_space)
     model = DDPG(n_states, n_actions, model_name="ddpg_model")
+    # Fine-tune a previously trained agent, e.g., on a new workload
+    if "pretrained_agent" in config["config_optimizer"]:
+        model.load(config["config_optimizer"]["pretrained_agent"])
 
     target_function = partial(target_function,
                               seed=int(config["knob_space"]["random_seed"]))
@@ -93,7 +194,7 @@ def get_liquid_ddpg_optimizer(config, dbms_config_space: ConfigurationSpace,
         output_directory=config["results"]["save_path"],
         deterministic=True,
         objectives="cost", # minimize the objective
-        n_trials=100, # 100 is the default value
+        n_trials=get_tuning_budget(config).n_trials,
         seed=int(config["knob_space"]["random_seed"])
     )
 
@@ -110,6 +211,9 @@ def get_liquid_ddpg_optimizer(config, dbms_config_space: ConfigurationSpace,
     n_states = int(config["dbms_info"]["n_numeric_stats"])
     n_actions = len(dbms_config_space)
     model = DDPG(n_states, n_actions, model_name="ddpg_model")
+    # Fine-tune a previously trained agent, e.g., on a new workload
+    if "pretrained_agent" in config["config_optimizer"]:
+        model.load(config["config_optimizer"]["pretrained_agent"])
 
     target_function = partial(target_function,
                               seed=int(config["knob_space"]["random_seed"]))
@@ -141,22 +245,137 @@ class DDPGOptimizer:
         self.n_epochs = n_epochs # CDBTune uses 2
         self.logger = CUSTOM_LOGGING_INSTANCE.get_logger()
         self.is_liquid = is_liquid
+        # Scheduler evaluating a batch of configurations in parallel, if any
+        self.scheduler = None
+        # Called after every completed round of the initial design and of
+        # the guided search, e.g., to checkpoint the tuning session
+        self.checkpoint_callback = None
+        # Configurations and results of the initial design evaluated so
+        # far, which is None once it is complete
+        self.initial_design_state = None
+        # Progress of the guided search, which is None until the initial
+        # design is evaluated
+        self.search_state = None
+        # Set by the tuning engine to explore less as the tuning budget runs
+        # out and to stop once it is exhausted
+        self.get_used_budget = None
+        self.is_budget_exhausted = None
+        self.noise_sigma = model.noise.sigma
+
+    def get_state(self) -> dict:
+        """Get the state of the search and of the DDPG model, e.g., for
+        checkpointing."""
+
+        return {
+            "initial_design_state": self.initial_design_state,
+            "search_state": self.search_state,
+            "model": self.model.get_state(),
+        }
+
+    def set_state(self, state: dict) -> None:
+        """Restore the search from get_state()."""
+
+        self.initial_design_state = state.get("initial_design_state")
+        self.search_state = state["search_state"]
+        self.model.set_state(state["model"])
+
+    def evaluate(self, dbms_configs: list) -> list:
+        """Evaluate a batch of configurations, in parallel if a scheduler
+        is set, and return their (performance, numeric stats), with None
+        for the failed trials."""
+
+        if self.scheduler:
+            return self.scheduler.map(dbms_configs)
+
+        results = []
+        for dbms_config in dbms_configs:
+            try:
+                results.append(self.target_function(dbms_config))
+            except Exception as error:
+                self.logger.info(f"Trial failed: {error!r}")
+                results.append(None)
+
+        return results
+
+    def warm_start(self, transitions: list) -> int:
+        """Pre-fill the replay memory with transitions of past sessions.
+
+        Args:
+            transitions (list): (state, dbms config, perf, prev perf, worst
+                perf, next state) with the performance scaled to the current
+                session.
+
+        Returns:
+            (int): Number of transitions added to the replay memory.
+        """
+
+        # Same reward as online, against the worst performance of the past
+        #   session
+        states, actions, rewards, next_states = get_transition_arrays(
+            transitions, self.input_space, self.model.n_states,
+            lambda perf, prev_perf, worst_perf: get_ddpg_reward(
+                perf, prev_perf, self.exp_state.default_perf, worst_perf
+            ),
+        )
+        self.model.add_samples(states, actions, rewards, next_states)
+
+        return len(rewards)
 
     def run(self):
+        if self.search_state is None:
+            self.run_initial_design()
+        else:
+            self.logger.info(
+                f"Resuming the guided search at iter "
+                f"{self.search_state['iter']}."
+            )
+
+        return self.run_guided_search()
+
+    def run_initial_design(self):
         # If using liquid model, initialized the hidden state
-        if self.is_liquid:
-            hidden = None
+        hidden = None
 
         prev_perf = self.exp_state.default_perf
         assert prev_perf >= 0 # TODO: Check why this is necessary
 
-        # Bootstrap with random samples
-        init_configurations = self.initial_design.select_configurations()
-
-        for i, dbms_config in enumerate(init_configurations):
+        # Bootstrap with random samples, resuming their evaluation if it
+        # was interrupted
+        if self.initial_design_state is None:
+            self.initial_design_state = {
+                "dbms_configs": self.initial_design.select_configurations(),
+                "results": [],
+            }
+        init_configurations = self.initial_design_state["dbms_configs"]
+        init_results = self.initial_design_state["results"]
+        if init_results:
+            self.logger.info(
+                f"Resuming the initial design at iter {len(init_results)}."
+            )
+
+        # Checkpoint after every round of one configuration per worker
+        batch_size = self.scheduler.n_workers if self.scheduler else 1
+        while len(init_results) < len(init_configurations):
+            n_results = len(init_results)
+            init_results.extend(self.evaluate(
+                init_configurations[n_results:n_results + batch_size]
+            ))
+            if self.checkpoint_callback:
+                self.checkpoint_callback()
+
+        # Transitions are added to the replay memory in one batch, chaining
+        # the trials that did not fail
+        states, actions, rewards, next_states = [], [], [], []
+        prev_numeric_stats = None
+        for i, (dbms_config, result) in enumerate(
+            zip(init_configurations, init_results)
+        ):
             self.logger.info(f"Iter {i} -- Sample from Initial Design:")
+            if result is None:
+                self.logger.info("Skipping the failed trial.")
+                continue
 
-            perf, numeric_stats = self.target_function(dbms_config)
+            perf, numeric_stats = result
             assert perf >= 0
 
             # Compute reward
@@ -166,80 +385,150 @@ class DDPGOptimizer:
             self.logger.info(f"DBMS numeric stats: {numeric_stats}")
             self.logger.info(f"Reward: {reward}")
 
-            if i > 0:
-                self.model.add_sample(prev_numeric_stats, prev_dbms_config,
-                                      prev_reward, numeric_stats)
+            if prev_numeric_stats is not None:
+                states.append(prev_numeric_stats)
+                actions.append(prev_dbms_config)
+                rewards.append(prev_reward)
+                next_states.append(numeric_stats)
 
             prev_numeric_stats = numeric_stats
             prev_dbms_config = dbms_config.get_array() # scale to [0, 1]
             prev_reward = reward
             prev_perf = perf
 
-        # Add last random sample
-        self.model.add_sample(prev_numeric_stats, prev_dbms_config,
-                              prev_reward, numeric_stats)
-
-        # Start guided search
-        for i in range(len(init_configurations), self.n_iters):
-            self.logger.info(f"Iter {i} -- Sample from DDPG:")
-
-            # Get next recommendation from DDPG
-            if self.is_liquid:
-                ddpg_action, hidden = self.model.choose_action(prev_numeric_stats, hidden)
-            else:
-                ddpg_action = self.model.choose_action(prev_numeric_stats)
-
-            dbms_config = self.convert_ddpg_action_to_dbms_config(ddpg_action)
-
-            perf, numeric_stats = self.target_function(dbms_config)
-            assert perf >= 0
-
-            # Compute reward
-            reward = self.get_reward(perf, prev_perf)
+        if prev_numeric_stats is None:
+            raise RuntimeError("Every trial of the initial design failed.")
 
-            self.logger.info(f"Performance: {perf}")
-            self.logger.info(f"DBMS numeric stats: {numeric_stats}")
-            self.logger.info(f"Reward: {reward}")
-
-            # register point to the optimizer
-            self.model.add_sample(prev_numeric_stats, prev_dbms_config,
-                                  prev_reward, numeric_stats)
-
-            prev_numeric_stats = numeric_stats
-            prev_dbms_config = ddpg_action
-            prev_reward = reward
-            prev_perf = perf
-
-            # update DDPG model
-            if len(self.model.replay_memory) >= self.model.batch_size:
-                for _ in range(self.n_epochs):
-                    self.model.update()
+        # Add last random sample
+        states.append(prev_numeric_stats)
+        actions.append(prev_dbms_config)
+        rewards.append(prev_reward)
+        next_states.append(numeric_stats)
+        self.model.add_samples(states, actions, rewards, next_states)
+
+        self.initial_design_state = None
+        self.save_search_state(len(init_configurations), prev_numeric_stats,
+                               prev_dbms_config, prev_reward, prev_perf,
+                               hidden)
+
+    def save_search_state(self, i, prev_numeric_stats, prev_dbms_config,
+                          prev_reward, prev_perf, hidden):
+        self.search_state = {
+            "iter": i,
+            "prev_numeric_stats": prev_numeric_stats,
+            "prev_dbms_config": prev_dbms_config,
+            "prev_reward": prev_reward,
+            "prev_perf": prev_perf,
+            # The hidden state of the liquid model, without its graph
+            "hidden": hidden.detach() if hidden is not None else None,
+        }
+
+        if self.checkpoint_callback:
+            self.checkpoint_callback()
+
+    def run_guided_search(self):
+        i = self.search_state["iter"]
+        prev_numeric_stats = self.search_state["prev_numeric_stats"]
+        prev_dbms_config = self.search_state["prev_dbms_config"]
+        prev_reward = self.search_state["prev_reward"]
+        prev_perf = self.search_state["prev_perf"]
+        hidden = self.search_state["hidden"]
+
+        # Start guided search, recommending one configuration per worker in
+        # every round
+        batch_size = self.scheduler.n_workers if self.scheduler else 1
+        while i < self.n_iters:
+            if self.is_budget_exhausted and self.is_budget_exhausted():
+                self.logger.info(
+                    f"Stopping the guided search at iter {i}: the tuning "
+                    "budget is exhausted."
+                )
+                break
+
+            if self.get_used_budget:
+                self.model.noise.sigma = (
+                    self.noise_sigma * (1 - self.get_used_budget())
+                )
+
+            # Get next recommendations from DDPG, which differ by the
+            # exploration noise
+            state_hidden = hidden
+            ddpg_actions = []
+            for _ in range(min(batch_size, self.n_iters - i)):
+                if self.is_liquid:
+                    ddpg_action, hidden = self.model.choose_action(
+                        prev_numeric_stats, hidden
+                    )
+                else:
+                    ddpg_action = self.model.choose_action(prev_numeric_stats)
+                ddpg_actions.append(ddpg_action)
+
+            dbms_configs = [
+                self.convert_ddpg_action_to_dbms_config(ddpg_action)
+                for ddpg_action in ddpg_actions
+            ]
+            results = self.evaluate(dbms_configs)
+
+            for ddpg_action, result in zip(ddpg_actions, results):
+                self.logger.info(f"Iter {i} -- Sample from DDPG:")
+                if result is None:
+                    # The search goes on from the last successful trial
+                    self.logger.info("Skipping the failed trial.")
+                    i += 1
+                    self.save_search_state(i, prev_numeric_stats,
+                                           prev_dbms_config, prev_reward,
+                                           prev_perf, hidden)
+                    continue
+
+                perf, numeric_stats = result
+                assert perf >= 0
+
+                # Compute reward
+                reward = self.get_reward(perf, prev_perf)
+
+                self.logger.info(f"Performance: {perf}")
+                self.logger.info(f"DBMS numeric stats: {numeric_stats}")
+                self.logger.info(f"Reward: {reward}")
+
+                # register point to the optimizer
+                if self.is_liquid:
+                    # The liquid actor is trained from the hidden state it
+                    # saw the state with
+                    self.model.add_sample(prev_numeric_stats,
+                                          prev_dbms_config, prev_reward,
+                                          numeric_stats, state_hidden)
+                else:
+                    self.model.add_sample(prev_numeric_stats,
+                                          prev_dbms_config, prev_reward,
+                                          numeric_stats)
+
+                prev_numeric_stats = numeric_stats
+                prev_dbms_config = ddpg_action
+                prev_reward = reward
+                prev_perf = perf
+                i += 1
+
+                # update DDPG model
+                if len(self.model.replay_memory) >= self.model.batch_size:
+                    for _ in range(self.n_epochs):
+                        self.model.update()
+                    self.logger.info(
+                        "Mean DDPG update time: "
+                        f"{self.model.update_time / self.model.n_updates:.4f}"
+                        f" s over {self.model.n_updates} updates"
+                    )
+
+                self.save_search_state(i, prev_numeric_stats,
+                                       prev_dbms_config, prev_reward,
+                                       prev_perf, hidden)
 
         return self.exp_state.best_config
 
     def get_reward(self, perf, prev_perf):
         """Reward calculation same as CDBTune paper -- Section 4.2
         """
-        def calculate_reward(delta_default, delta_prev):
-            if delta_default > 0:
-                reward =   ((1 + delta_default) ** 2 - 1) * np.abs(1 + delta_prev)
-            else:
-                reward = - ((1 - delta_default) ** 2 - 1) * np.abs(1 - delta_prev)
-
-            # no improvement over last evaluation -- 0 reward
-            if reward > 0 and delta_prev < 0:
-                reward = 0
-
-            return reward
-
-        if perf == self.exp_state.worst_perf:
-            return 0
-
-        # perf diff from default / prev evaluation
-        delta_default = (perf - self.exp_state.default_perf) / self.exp_state.default_perf
-        delta_prev = (perf - prev_perf) / prev_perf
-
-        return calculate_reward(delta_default, delta_prev)
+        return get_ddpg_reward(perf, prev_perf, self.exp_state.default_perf,
+                               self.exp_state.worst_perf)
 
     def convert_ddpg_action_to_dbms_config(self, ddpg_action) -> dict:
         dbms_config = {}
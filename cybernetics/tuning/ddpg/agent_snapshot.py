@@ -0,0 +1,164 @@
+"""Versioned snapshots of a DDPG agent.
+
+A snapshot is a directory with
+    - model.pt: the actor, critic, target networks, Adam states and OU noise
+      state, saved with torch.save,
+    - replay_<array>.npy: the filled part of the replay memory, which is
+      memory-mapped on load,
+    - metadata.json: the snapshot version, model sizes and replay memory
+      counters, written last, so a snapshot without it is incomplete.
+"""
+
+import json
+import os
+
+import numpy as np
+import torch
+
+from cybernetics.tuning.ddpg.prioritized_replay_memory import (
+    TRANSITION_ARRAYS,
+)
+
+
+AGENT_SNAPSHOT_VERSION = 1
+AGENT_DIRNAME = "ddpg_agent"
+MODEL_FILENAME = "model.pt"
+METADATA_FILENAME = "metadata.json"
+REPLAY_ARRAYS = TRANSITION_ARRAYS + ["priorities", "hiddens"]
+
+NETWORKS = [
+    "actor",
+    "target_actor",
+    "critic",
+    "target_critic",
+    "actor_optimizer",
+    "critic_optimizer",
+]
+
+
+def _get_replay_filepath(dirpath: str, name: str) -> str:
+    return os.path.join(dirpath, f"replay_{name}.npy")
+
+
+def save_agent(model, dirpath: str) -> None:
+    """Save a DDPG agent, overwriting any snapshot in the directory.
+
+    Args:
+        model (DDPG): The plain or liquid DDPG model.
+        dirpath (str): Directory of the snapshot.
+    """
+
+    os.makedirs(dirpath, exist_ok=True)
+    # The snapshot is incomplete until the metadata is rewritten
+    metadata_filepath = os.path.join(dirpath, METADATA_FILENAME)
+    if os.path.exists(metadata_filepath):
+        os.remove(metadata_filepath)
+
+    tensors = {
+        name: getattr(model, name).state_dict() for name in NETWORKS
+    }
+    tensors["noise"] = torch.from_numpy(
+        np.asarray(model.noise.current_value, dtype=np.float64)
+    )
+    torch.save(tensors, os.path.join(dirpath, MODEL_FILENAME))
+
+    replay_memory = model.replay_memory
+    replay_arrays = replay_memory.get_arrays()
+    for name in REPLAY_ARRAYS:
+        replay_filepath = _get_replay_filepath(dirpath, name)
+        if replay_arrays[name] is not None:
+            np.save(replay_filepath, replay_arrays[name])
+        elif os.path.exists(replay_filepath):
+            os.remove(replay_filepath)
+
+    metadata = {
+        "version": AGENT_SNAPSHOT_VERSION,
+        "model": type(model).__module__,
+        "n_states": model.n_states,
+        "n_actions": model.n_actions,
+        "noise": {
+            "mu": model.noise.mu,
+            "theta": model.noise.theta,
+            "sigma": model.noise.sigma,
+        },
+        "replay_memory": {
+            "capacity": replay_memory.capacity,
+            "write": replay_memory.write,
+            "num_entries": replay_memory.num_entries,
+            "beta": float(replay_memory.beta),
+            "has_transitions": replay_arrays["states"] is not None,
+        },
+    }
+    with open(metadata_filepath, "w") as f:
+        json.dump(metadata, f, indent=4)
+
+
+def load_agent(model, dirpath: str, mmap: bool = True) -> dict:
+    """Load a DDPG agent saved by save_agent() into a model of the same
+    kind and sizes.
+
+    Args:
+        model (DDPG): The plain or liquid DDPG model.
+        dirpath (str): Directory of the snapshot.
+        mmap (bool): Memory-map the replay arrays instead of reading them.
+
+    Returns:
+        (dict): The metadata of the snapshot.
+    """
+
+    metadata_filepath = os.path.join(dirpath, METADATA_FILENAME)
+    if not os.path.exists(metadata_filepath):
+        raise ValueError(f"No complete agent snapshot in {dirpath}.")
+
+    with open(metadata_filepath) as f:
+        metadata = json.load(f)
+
+    if metadata["version"] != AGENT_SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Unsupported agent snapshot version: {metadata['version']}"
+        )
+    if (
+        metadata["model"] != type(model).__module__
+        or metadata["n_states"] != model.n_states
+        or metadata["n_actions"] != model.n_actions
+    ):
+        raise ValueError(
+            f"The agent snapshot of a {metadata['model']} model with "
+            f"{metadata['n_states']} states and {metadata['n_actions']} "
+            "actions does not match the model."
+        )
+
+    tensors = torch.load(
+        os.path.join(dirpath, MODEL_FILENAME),
+        map_location="cpu",
+        weights_only=True,
+    )
+    for name in NETWORKS:
+        getattr(model, name).load_state_dict(tensors[name])
+    model.noise.current_value = tensors["noise"].numpy()
+    model.noise.mu = metadata["noise"]["mu"]
+    model.noise.theta = metadata["noise"]["theta"]
+    model.noise.sigma = metadata["noise"]["sigma"]
+    model.inference_actor = None
+
+    replay_metadata = metadata["replay_memory"]
+    replay_arrays = {name: None for name in REPLAY_ARRAYS}
+    if replay_metadata["has_transitions"]:
+        # Only the liquid model stores hidden states
+        replay_arrays = {
+            name: np.load(
+                _get_replay_filepath(dirpath, name),
+                mmap_mode="r" if mmap else None,
+            )
+            for name in REPLAY_ARRAYS
+            if os.path.exists(_get_replay_filepath(dirpath, name))
+        }
+    model.replay_memory.set_arrays(
+        replay_arrays,
+        capacity=replay_metadata["capacity"],
+        write=replay_metadata["write"],
+        num_entries=replay_metadata["num_entries"],
+        beta=replay_metadata["beta"],
+    )
+
+    return metadata
@@ -3,7 +3,9 @@
 From https://raw.githubusercontent.com/cmu-db/ottertune/master/server/analysis/ddpg/ddpg.py with additional comments.
 """
 
+import copy
 import pickle
+import time
 
 import numpy as np
 import torch
@@ -15,6 +17,7 @@ from ncps.wirings import AutoNCP
 
 from torch.autograd import Variable
 
+from cybernetics.tuning.ddpg.agent_snapshot import load_agent, save_agent
 from cybernetics.tuning.ddpg.prioritized_replay_memory import PrioritizedReplayMemory
 
 
@@ -71,12 +74,43 @@ class Actor(nn.Module):
 
     # add hidden input and output
     def forward(self, states, hidden = None): # pylint: disable=arguments-differ
-        states = states.view(1, 1, -1) # add an extra dimension to state
+        # Every state is a sequence of length one
+        states = states.view(-1, 1, states.shape[-1])
         ltc_output, hidden = self.ltc_layer(states,hidden)
         ltc_output = ltc_output.squeeze(1)
         actions = self.sigmoid(self.layers(ltc_output))
         return actions, hidden
 
+    def forward_sequences(self, states, hiddens=None, first_steps=None):
+        """Run the actor over a batch of state sequences.
+
+        Args:
+            states (torch.Tensor): (batch, time, features) states.
+            hiddens (torch.Tensor): Hidden states at the first steps, zeros
+                if None.
+            first_steps (torch.Tensor): First step of every sequence, whose
+                earlier steps are ignored. Sequences start at step 0 if None.
+
+        Returns:
+            (torch.Tensor, torch.Tensor): The actions at the last steps and
+                the last hidden states.
+        """
+        if hiddens is None:
+            hiddens = torch.zeros((states.shape[0],
+                                   self.ltc_layer.state_size))
+
+        hidden = hiddens
+        for t in range(states.shape[1]):
+            if first_steps is not None and t > 0:
+                # The sequences starting at this step start from their hidden
+                # state
+                hidden = torch.where((first_steps == t)[:, None], hiddens,
+                                     hidden)
+            ltc_output, hidden = self.ltc_layer(states[:, t:t + 1], hidden)
+
+        actions = self.sigmoid(self.layers(ltc_output[:, -1]))
+        return actions, hidden
+
 
 class Critic(nn.Module):
     """
@@ -173,7 +207,8 @@ class DDPG(object):
                  shift: float=0, memory_size: int=100000,
                  a_hidden_sizes: list=[128, 128, 64],
                  c_hidden_sizes: list=[128, 256, 64],
-                 use_default: bool=False):
+                 use_default: bool=False, alpha: float=0.6,
+                 use_is_weights: bool=True, seq_len: int=4):
         self.n_states = n_states
         self.n_actions = n_actions
         self.alr = alr
@@ -186,16 +221,42 @@ class DDPG(object):
         self.c_hidden_sizes = c_hidden_sizes
         self.shift = shift
         self.use_default = use_default
+        # Weight the critic loss by the importance-sampling weights of the
+        # prioritized replay
+        self.use_is_weights = use_is_weights
+        # Number of consecutive trials the actor is trained on, from the
+        # hidden state stored with the first one
+        self.seq_len = seq_len
 
         self._build_network()
 
-        self.replay_memory = PrioritizedReplayMemory(capacity=memory_size)
+        self.replay_memory = PrioritizedReplayMemory(
+            capacity=memory_size,
+            n_states=n_states,
+            n_actions=n_actions,
+            alpha=alpha,
+            n_hidden=self.actor.ltc_layer.state_size,
+        )
         self.noise = OUProcess(n_actions)
+        # Number of updates and their cumulative time in seconds
+        self.n_updates = 0
+        self.update_time = 0
+
+        # Actor snapshot serving recommendations, see freeze_actor(), and the
+        # input buffer of a single state
+        self.inference_actor = None
+        self.state_buffer = torch.zeros((1, n_states))
 
     @staticmethod
     def totensor(x):
         return torch.tensor(x, dtype=torch.float, requires_grad=True)
 
+    @staticmethod
+    def fromnumpy(x):
+        """Wrap a float32 array as a tensor without copying it. Inputs need
+        no gradients."""
+        return torch.from_numpy(np.ascontiguousarray(x, dtype=np.float32))
+
     def _build_network(self):
         self.actor = Actor(self.n_states, self.n_actions, self.a_hidden_sizes,
                            self.use_default)
@@ -231,57 +292,122 @@ class DDPG(object):
         self.noise.reset(sigma, theta)
 
     def _sample_batch(self):
-        batch, idx = self.replay_memory.sample(self.batch_size)
-        states = list(map(lambda x: x[0].tolist(), batch)) # pylint: disable=W0141
-        actions = list(map(lambda x: x[1].tolist(), batch)) # pylint: disable=W0141
-        rewards = list(map(lambda x: x[2], batch)) # pylint: disable=W0141
-        next_states = list(map(lambda x: x[3].tolist(), batch)) # pylint: disable=W0141
+        batch, idx, is_weights = self.replay_memory.sample(self.batch_size)
+        states, actions, rewards, next_states = batch
+
+        return idx, states, next_states, actions, rewards, is_weights
 
-        return idx, states, next_states, actions, rewards
+    @staticmethod
+    def _get_hiddens(hiddens):
+        if hiddens is None:
+            return None
+        if isinstance(hiddens, torch.Tensor):
+            hiddens = hiddens.detach().numpy()
+        return np.asarray(hiddens, dtype=np.float32).reshape(len(hiddens), -1)
+
+    def _get_td_errors(self, states, actions, rewards, next_states,
+                       hiddens=None):
+        """Compute the TD errors of a batch of transitions in one forward
+        pass without gradients."""
+
+        batch_states = self.fromnumpy(states)
+        batch_actions = self.fromnumpy(actions)
+        batch_rewards = self.fromnumpy(rewards)
+        batch_next_states = self.fromnumpy(next_states)
+        batch_hiddens = (
+            self.fromnumpy(hiddens) if hiddens is not None else None
+        )
 
-    def add_sample(self, state, action, reward, next_state):
         self.critic.eval()
         self.actor.eval()
         self.target_critic.eval()
         self.target_actor.eval()
 
-        batch_state = self.totensor(np.expand_dims(state, axis=0))
-        batch_next_state = self.totensor(np.expand_dims(next_state, axis=0))
-        current_value = self.critic(
-            batch_state,
-            self.totensor(np.expand_dims(action, axis=0))
-        )
-
-
-        target_action, hidden = self.target_actor(batch_next_state)
-        target_value = self.totensor([reward]) + \
-            self.target_critic(batch_next_state, target_action) * self.gamma
-        error = float(torch.abs(current_value - target_value).data.numpy()[0])
+        with torch.no_grad():
+            current_value = self.critic(batch_states, batch_actions)
+            # The next states continue the sequences of the states
+            target_actions, _ = self.target_actor.forward_sequences(
+                torch.stack([batch_states, batch_next_states], dim=1),
+                batch_hiddens,
+            )
+            target_value = batch_rewards[:, None] + \
+                self.target_critic(batch_next_states, target_actions) * \
+                self.gamma
+            errors = torch.abs(current_value - target_value).numpy()[:, 0]
 
         self.target_actor.train()
         self.actor.train()
         self.critic.train()
         self.target_critic.train()
-        self.replay_memory.add(error, (state, action, reward, next_state))
 
-    def update(self):
-        idxs, states, next_states, actions, rewards = self._sample_batch()
-        batch_states = self.totensor(states)
-        batch_next_states = self.totensor(next_states)
+        return errors
 
-        # TODO: because of inconsistent input shape in training model, set agents to evaluation mode first
-        batch_next_states = torch.mean(batch_next_states, dim=0).view(1,-1)
-        self.target_actor.eval()
-        self.target_critic.eval()
-        self.actor.eval()
+    def add_sample(self, state, action, reward, next_state, hidden=None):
+        """Add a transition to the replay memory.
 
+        Args:
+            hidden (torch.Tensor): Hidden state of the actor before it saw
+                the state, the initial one if None.
+        """
+        hiddens = self._get_hiddens(
+            hidden.reshape(1, -1) if hidden is not None else None
+        )
+        errors = self._get_td_errors([state], [action], [reward],
+                                     [next_state], hiddens)
+        self.replay_memory.add(errors[0], (state, action, reward, next_state),
+                               hiddens[0] if hiddens is not None else None)
+
+    def add_samples(self, states, actions, rewards, next_states,
+                    hiddens=None):
+        """Add a batch of transitions to the replay memory, e.g., the
+        initial design or the transitions of past sessions.
+
+        Args:
+            states (np.ndarray): States, one row per transition.
+            actions (np.ndarray): Actions scaled to [0, 1].
+            rewards (np.ndarray): Rewards.
+            next_states (np.ndarray): Next states.
+            hiddens (np.ndarray): Hidden states of the actor before it saw
+                the states, the initial ones if None.
+        """
+
+        if len(rewards) == 0:
+            return
+
+        hiddens = self._get_hiddens(hiddens)
+        errors = self._get_td_errors(states, actions, rewards, next_states,
+                                     hiddens)
+        self.replay_memory.add_batch(
+            errors, (states, actions, rewards, next_states), hiddens
+        )
 
-        batch_actions = self.totensor(actions)
-        batch_rewards = self.totensor(rewards)
-
-        target_next_actions, hidden = self.target_actor(batch_next_states)
-        target_next_actions = target_next_actions.detach()
-        target_next_value = self.target_critic(batch_next_states, target_next_actions).detach().squeeze(1)
+    def update(self):
+        beg_time = time.perf_counter()
+        # The actor snapshot becomes stale
+        self.inference_actor = None
+        idxs, states, next_states, actions, rewards, is_weights = \
+            self._sample_batch()
+        # The actor sees the trials leading to the sampled ones
+        state_seqs, first_steps, hiddens = \
+            self.replay_memory.get_sequences(idxs, self.seq_len)
+        batch_states = self.fromnumpy(states)
+        batch_next_states = self.fromnumpy(next_states)
+        batch_actions = self.fromnumpy(actions)
+        batch_rewards = self.fromnumpy(rewards)
+        batch_state_seqs = self.fromnumpy(state_seqs)
+        batch_first_steps = torch.from_numpy(first_steps)
+        batch_hiddens = self.fromnumpy(hiddens)
+
+        # The next states continue the sequences of the states
+        with torch.no_grad():
+            target_next_actions, _ = self.target_actor.forward_sequences(
+                torch.cat([batch_state_seqs, batch_next_states[:, None]],
+                          dim=1),
+                batch_hiddens,
+                batch_first_steps,
+            )
+            target_next_value = self.target_critic(batch_next_states,
+                                                   target_next_actions)
         current_value = self.critic(batch_states, batch_actions)
         batch_rewards = batch_rewards[:, None]
         next_value = batch_rewards + target_next_value * self.gamma + self.shift
@@ -289,23 +415,25 @@ class DDPG(object):
         # update prioritized memory
         if isinstance(self.replay_memory, PrioritizedReplayMemory):
             error = torch.abs(current_value - next_value).data.numpy()
-            for i in range(self.batch_size):
-                idx = idxs[i]
-                self.replay_memory.update(idx, error[i][0])
+            self.replay_memory.update(idxs, error[:, 0])
 
         # Update Critic
-        loss = self.loss_criterion(current_value, next_value)
+        if self.use_is_weights:
+            batch_is_weights = torch.from_numpy(is_weights)[:, None]
+            loss = torch.mean(
+                batch_is_weights * (current_value - next_value) ** 2
+            )
+        else:
+            loss = self.loss_criterion(current_value, next_value)
         self.critic_optimizer.zero_grad()
         loss.backward()
         self.critic_optimizer.step()
 
-        # TODO: may need to be changed later
-        batch_states = torch.mean(batch_states, dim=0).view(1,-1)
-
         # Update Actor
         self.critic.eval()
-        # TODO: think about what is the hidden input here
-        actor_output, hidden = self.actor(batch_states)
+        actor_output, _ = self.actor.forward_sequences(
+            batch_state_seqs, batch_hiddens, batch_first_steps
+        )
         policy_loss = -self.critic(batch_states, actor_output)
         policy_loss = policy_loss.mean()
         self.actor_optimizer.zero_grad()
@@ -317,17 +445,70 @@ class DDPG(object):
         self._update_target(self.target_critic, self.critic, tau=self.tau)
         self._update_target(self.target_actor, self.actor, tau=self.tau)
 
+        self.n_updates += 1
+        self.update_time += time.perf_counter() - beg_time
+
         return loss.data, policy_loss.data
 
+    def freeze_actor(self, script: bool=False):
+        """Snapshot the actor for serving recommendations, e.g., from a
+        trained model to many clusters. The snapshot is dropped by the next
+        update.
+
+        Args:
+            script (bool): Must be False. Only the plain DDPG actor can be
+                compiled, TorchScript cannot compile the LTC layer.
+        """
+        if script:
+            raise ValueError(
+                "The liquid actor cannot be frozen with script=True, "
+                "TorchScript cannot compile its LTC layer."
+            )
+
+        actor = copy.deepcopy(self.actor).eval()
+        for param in actor.parameters():
+            param.requires_grad_(False)
+
+        self.inference_actor = actor
+
+    def predict_action(self, states, hidden):
+        """Recommend the action of the actor without exploration noise.
+
+        Args:
+            states (np.ndarray): A state, or one state per row.
+            hidden (torch.Tensor): Hidden state of the LTC layer, if any.
+
+        Returns:
+            (np.ndarray, torch.Tensor): The float32 action, or one action
+                per row, and the next hidden state.
+        """
+        # The snapshot is always in eval mode
+        actor = self.inference_actor
+        is_training = False
+        if actor is None:
+            actor = self.actor
+            is_training = actor.training
+            actor.eval()
+
+        with torch.inference_mode():
+            if np.ndim(states) == 1:
+                self.state_buffer[0] = torch.from_numpy(
+                    np.asarray(states, dtype=np.float32)
+                )
+                actions, hidden = actor(self.state_buffer, hidden)
+                actions = actions[0]
+            else:
+                actions, hidden = actor(self.fromnumpy(states), hidden)
+
+        if is_training:
+            self.actor.train()
+
+        return actions.numpy(), hidden
+
     def choose_action(self, states, hidden):
-        self.actor.eval()
-        act, hidden = self.actor(self.totensor(
-            np.expand_dims(states, axis=0)),hidden)
-        act = act.squeeze(0)
-        self.actor.train()
-        action = act.data.numpy()
+        action, hidden = self.predict_action(states, hidden)
         action += self.noise.noise()
-        return action.clip(0, 1), hidden
+        return np.clip(action, 0, 1, out=action), hidden
 
     def set_model(self, actor_dict, critic_dict):
         self.actor.load_state_dict(pickle.loads(actor_dict))
@@ -335,3 +516,41 @@ class DDPG(object):
 
     def get_model(self):
         return pickle.dumps(self.actor.state_dict()), pickle.dumps(self.critic.state_dict())
+
+    def save(self, dirpath):
+        """Save the complete agent to a versioned snapshot directory."""
+        save_agent(self, dirpath)
+
+    def load(self, dirpath, mmap=True):
+        """Load the complete agent from a snapshot directory.
+
+        Args:
+            mmap (bool): Memory-map the replay arrays instead of reading
+                them.
+        """
+        return load_agent(self, dirpath, mmap=mmap)
+
+    def get_state(self):
+        """Get the full training state, e.g., to checkpoint a tuning session.
+        """
+        return {
+            "actor": self.actor.state_dict(),
+            "target_actor": self.target_actor.state_dict(),
+            "critic": self.critic.state_dict(),
+            "target_critic": self.target_critic.state_dict(),
+            "actor_optimizer": self.actor_optimizer.state_dict(),
+            "critic_optimizer": self.critic_optimizer.state_dict(),
+            "replay_memory": self.replay_memory.get(),
+            "noise": self.noise.current_value,
+        }
+
+    def set_state(self, state):
+        self.actor.load_state_dict(state["actor"])
+        self.target_actor.load_state_dict(state["target_actor"])
+        self.critic.load_state_dict(state["critic"])
+        self.target_critic.load_state_dict(state["target_critic"])
+        self.actor_optimizer.load_state_dict(state["actor_optimizer"])
+        self.critic_optimizer.load_state_dict(state["critic_optimizer"])
+        self.replay_memory.set(state["replay_memory"])
+        self.noise.current_value = state["noise"]
+        self.inference_actor = None
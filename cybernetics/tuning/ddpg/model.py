@@ -3,7 +3,9 @@
 From https://raw.githubusercontent.com/cmu-db/ottertune/master/server/analysis/ddpg/ddpg.py with additional comments.
 """
 
+import copy
 import pickle
+import time
 
 import numpy as np
 import torch
@@ -13,6 +15,7 @@ import torch.optim as optimizer
 
 from torch.autograd import Variable
 
+from cybernetics.tuning.ddpg.agent_snapshot import load_agent, save_agent
 from cybernetics.tuning.ddpg.prioritized_replay_memory import PrioritizedReplayMemory
 
 
@@ -162,7 +165,8 @@ class DDPG(object):
                  shift: float=0, memory_size: int=100000,
                  a_hidden_sizes: list=[128, 128, 64],
                  c_hidden_sizes: list=[128, 256, 64],
-                 use_default: bool=False):
+                 use_default: bool=False, alpha: float=0.6,
+                 use_is_weights: bool=True):
         self.n_states = n_states
         self.n_actions = n_actions
         self.alr = alr
@@ -175,16 +179,36 @@ class DDPG(object):
         self.c_hidden_sizes = c_hidden_sizes
         self.shift = shift
         self.use_default = use_default
+        # Weight the critic loss by the importance-sampling weights of the
+        # prioritized replay
+        self.use_is_weights = use_is_weights
 
         self._build_network()
 
-        self.replay_memory = PrioritizedReplayMemory(capacity=memory_size)
+        self.replay_memory = PrioritizedReplayMemory(capacity=memory_size,
+                                                     n_states=n_states,
+                                                     n_actions=n_actions,
+                                                     alpha=alpha)
         self.noise = OUProcess(n_actions)
+        # Number of updates and their cumulative time in seconds
+        self.n_updates = 0
+        self.update_time = 0
+
+        # Actor snapshot serving recommendations, see freeze_actor(), and the
+        # input buffer of a single state
+        self.inference_actor = None
+        self.state_buffer = torch.zeros((1, n_states))
 
     @staticmethod
     def totensor(x):
         return torch.tensor(x, dtype=torch.float, requires_grad=True)
 
+    @staticmethod
+    def fromnumpy(x):
+        """Wrap a float32 array as a tensor without copying it. Inputs need
+        no gradients."""
+        return torch.from_numpy(np.ascontiguousarray(x, dtype=np.float32))
+
     def _build_network(self):
         self.actor = Actor(self.n_states, self.n_actions, self.a_hidden_sizes,
                            self.use_default)
@@ -220,43 +244,74 @@ class DDPG(object):
         self.noise.reset(sigma, theta)
 
     def _sample_batch(self):
-        batch, idx = self.replay_memory.sample(self.batch_size)
-        states = list(map(lambda x: x[0].tolist(), batch)) # pylint: disable=W0141
-        actions = list(map(lambda x: x[1].tolist(), batch)) # pylint: disable=W0141
-        rewards = list(map(lambda x: x[2], batch)) # pylint: disable=W0141
-        next_states = list(map(lambda x: x[3].tolist(), batch)) # pylint: disable=W0141
+        batch, idx, is_weights = self.replay_memory.sample(self.batch_size)
+        states, actions, rewards, next_states = batch
 
-        return idx, states, next_states, actions, rewards
+        return idx, states, next_states, actions, rewards, is_weights
+
+    def _get_td_errors(self, states, actions, rewards, next_states):
+        """Compute the TD errors of a batch of transitions in one forward
+        pass without gradients."""
+
+        batch_states = self.fromnumpy(states)
+        batch_actions = self.fromnumpy(actions)
+        batch_rewards = self.fromnumpy(rewards)
+        batch_next_states = self.fromnumpy(next_states)
 
-    def add_sample(self, state, action, reward, next_state):
         self.critic.eval()
         self.actor.eval()
         self.target_critic.eval()
         self.target_actor.eval()
-        
-        batch_state = self.totensor(np.expand_dims(state, axis=0))
-        batch_next_state = self.totensor(np.expand_dims(next_state, axis=0))
-        current_value = self.critic(
-            batch_state,
-            self.totensor(np.expand_dims(action, axis=0))
-        )
-        target_action = self.target_actor(batch_next_state)
-        target_value = self.totensor([reward]) + \
-            self.target_critic(batch_next_state, target_action) * self.gamma
-        error = float(torch.abs(current_value - target_value).data.numpy()[0])
+
+        with torch.no_grad():
+            current_value = self.critic(batch_states, batch_actions)
+            target_actions = self.target_actor(batch_next_states)
+            target_value = batch_rewards[:, None] + \
+                self.target_critic(batch_next_states, target_actions) * \
+                self.gamma
+            errors = torch.abs(current_value - target_value).numpy()[:, 0]
 
         self.target_actor.train()
         self.actor.train()
         self.critic.train()
         self.target_critic.train()
-        self.replay_memory.add(error, (state, action, reward, next_state))
+
+        return errors
+
+    def add_sample(self, state, action, reward, next_state):
+        errors = self._get_td_errors([state], [action], [reward],
+                                     [next_state])
+        self.replay_memory.add(errors[0], (state, action, reward, next_state))
+
+    def add_samples(self, states, actions, rewards, next_states):
+        """Add a batch of transitions to the replay memory, e.g., the
+        initial design or the transitions of past sessions.
+
+        Args:
+            states (np.ndarray): States, one row per transition.
+            actions (np.ndarray): Actions scaled to [0, 1].
+            rewards (np.ndarray): Rewards.
+            next_states (np.ndarray): Next states.
+        """
+
+        if len(rewards) == 0:
+            return
+
+        errors = self._get_td_errors(states, actions, rewards, next_states)
+        self.replay_memory.add_batch(
+            errors, (states, actions, rewards, next_states)
+        )
 
     def update(self):
-        idxs, states, next_states, actions, rewards = self._sample_batch()
-        batch_states = self.totensor(states)
-        batch_next_states = self.totensor(next_states)
-        batch_actions = self.totensor(actions)
-        batch_rewards = self.totensor(rewards)
+        beg_time = time.perf_counter()
+        # The actor snapshot becomes stale
+        self.inference_actor = None
+        idxs, states, next_states, actions, rewards, is_weights = \
+            self._sample_batch()
+        batch_states = self.fromnumpy(states)
+        batch_next_states = self.fromnumpy(next_states)
+        batch_actions = self.fromnumpy(actions)
+        batch_rewards = self.fromnumpy(rewards)
 
         target_next_actions = self.target_actor(batch_next_states).detach()
         target_next_value = self.target_critic(batch_next_states, target_next_actions).detach()
@@ -267,12 +322,16 @@ class DDPG(object):
         # update prioritized memory
         if isinstance(self.replay_memory, PrioritizedReplayMemory):
             error = torch.abs(current_value - next_value).data.numpy()
-            for i in range(self.batch_size):
-                idx = idxs[i]
-                self.replay_memory.update(idx, error[i][0])
+            self.replay_memory.update(idxs, error[:, 0])
 
         # Update Critic
-        loss = self.loss_criterion(current_value, next_value)
+        if self.use_is_weights:
+            batch_is_weights = torch.from_numpy(is_weights)[:, None]
+            loss = torch.mean(
+                batch_is_weights * (current_value - next_value) ** 2
+            )
+        else:
+            loss = self.loss_criterion(current_value, next_value)
         self.critic_optimizer.zero_grad()
         loss.backward()
         self.critic_optimizer.step()
@@ -290,16 +349,63 @@ class DDPG(object):
         self._update_target(self.target_critic, self.critic, tau=self.tau)
         self._update_target(self.target_actor, self.actor, tau=self.tau)
 
+        self.n_updates += 1
+        self.update_time += time.perf_counter() - beg_time
+
         return loss.data, policy_loss.data
 
+    def freeze_actor(self, script: bool=False):
+        """Snapshot the actor for serving recommendations, e.g., from a
+        trained model to many clusters. The snapshot is dropped by the next
+        update.
+
+        Args:
+            script (bool): Compile the snapshot with TorchScript and freeze
+                it.
+        """
+        actor = copy.deepcopy(self.actor).eval()
+        for param in actor.parameters():
+            param.requires_grad_(False)
+        if script:
+            actor = torch.jit.freeze(torch.jit.script(actor))
+
+        self.inference_actor = actor
+
+    def predict_action(self, states):
+        """Recommend the action of the actor without exploration noise.
+
+        Args:
+            states (np.ndarray): A state, or one state per row.
+
+        Returns:
+            (np.ndarray): The float32 action, or one action per row.
+        """
+        # The snapshot is always in eval mode
+        actor = self.inference_actor
+        is_training = False
+        if actor is None:
+            actor = self.actor
+            is_training = actor.training
+            actor.eval()
+
+        with torch.inference_mode():
+            if np.ndim(states) == 1:
+                self.state_buffer[0] = torch.from_numpy(
+                    np.asarray(states, dtype=np.float32)
+                )
+                actions = actor(self.state_buffer)[0]
+            else:
+                actions = actor(self.fromnumpy(states))
+
+        if is_training:
+            self.actor.train()
+
+        return actions.numpy()
+
     def choose_action(self, states):
-        self.actor.eval()
-        act = self.actor(self.totensor(
-            np.expand_dims(states, axis=0))).squeeze(0)
-        self.actor.train()
-        action = act.data.numpy()
+        action = self.predict_action(states)
         action += self.noise.noise()
-        return action.clip(0, 1)
+        return np.clip(action, 0, 1, out=action)
 
     def set_model(self, actor_dict, critic_dict):
         self.actor.load_state_dict(pickle.loads(actor_dict))
@@ -307,3 +413,41 @@ class DDPG(object):
 
     def get_model(self):
         return pickle.dumps(self.actor.state_dict()), pickle.dumps(self.critic.state_dict())
+
+    def save(self, dirpath):
+        """Save the complete agent to a versioned snapshot directory."""
+        save_agent(self, dirpath)
+
+    def load(self, dirpath, mmap=True):
+        """Load the complete agent from a snapshot directory.
+
+        Args:
+            mmap (bool): Memory-map the replay arrays instead of reading
+                them.
+        """
+        return load_agent(self, dirpath, mmap=mmap)
+
+    def get_state(self):
+        """Get the full training state, e.g., to checkpoint a tuning session.
+        """
+        return {
+            "actor": self.actor.state_dict(),
+            "target_actor": self.target_actor.state_dict(),
+            "critic": self.critic.state_dict(),
+            "target_critic": self.target_critic.state_dict(),
+            "actor_optimizer": self.actor_optimizer.state_dict(),
+            "critic_optimizer": self.critic_optimizer.state_dict(),
+            "replay_memory": self.replay_memory.get(),
+            "noise": self.noise.current_value,
+        }
+
+    def set_state(self, state):
+        self.actor.load_state_dict(state["actor"])
+        self.target_actor.load_state_dict(state["target_actor"])
+        self.critic.load_state_dict(state["critic"])
+        self.target_critic.load_state_dict(state["target_critic"])
+        self.actor_optimizer.load_state_dict(state["actor_optimizer"])
+        self.critic_optimizer.load_state_dict(state["critic_optimizer"])
+        self.replay_memory.set(state["replay_memory"])
+        self.noise.current_value = state["noise"]
+        self.inference_actor = None
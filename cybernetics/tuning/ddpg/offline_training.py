@@ -0,0 +1,163 @@
+"""Offline pre-training of a DDPG agent on the trials of past sessions.
+
+The consecutive trials of every recorded session are chained into
+(numeric stats, action, reward, next numeric stats) transitions, which are
+bulk-loaded into the replay memory. The agent is then updated many times in
+a tight loop without evaluating any configuration, so that online tuning
+starts from the trained policy, e.g., with
+
+    [config_optimizer]
+    pretrained_agent=/exps/pretrained/ddpg_agent
+"""
+
+import time
+
+import numpy as np
+
+from ConfigSpace import Configuration, ConfigurationSpace
+
+from cybernetics.tuning.ddpg.reward import get_ddpg_reward
+from cybernetics.tuning.warm_start import WarmStarter
+from cybernetics.utils.custom_logging import CUSTOM_LOGGING_INSTANCE
+
+
+def get_transition_arrays(transitions: list,
+                          dbms_config_space: ConfigurationSpace,
+                          n_states: int, get_reward) -> tuple:
+    """Encode transitions for the replay memory of DDPG.
+
+    Transitions without states, e.g., of sessions that did not record DBMS
+    statistics, whose states have another size or whose configurations are
+    not in the configuration space are skipped.
+
+    Args:
+        transitions (list): (state, dbms config, perf, prev perf, worst
+            perf, next state).
+        dbms_config_space (ConfigurationSpace): The space of the actions.
+        n_states (int): Size of the states.
+        get_reward (callable): Reward of a performance given the previous
+            and the worst performance so far.
+
+    Returns:
+        (list, list, list, list): The states, actions, rewards and next
+            states.
+    """
+
+    states, actions, rewards, next_states = [], [], [], []
+    for (state, dbms_config, perf, prev_perf, worst_perf,
+         next_state) in transitions:
+        if state is None or next_state is None:
+            continue
+        if len(state) != n_states or len(next_state) != n_states:
+            continue
+
+        try:
+            action = Configuration(dbms_config_space,
+                                   values=dbms_config).get_array()
+        except (KeyError, TypeError, ValueError):
+            # The knob spaces of the sessions differ
+            continue
+
+        states.append(state)
+        actions.append(action)
+        rewards.append(get_reward(perf, prev_perf, worst_perf))
+        next_states.append(next_state)
+
+    return states, actions, rewards, next_states
+
+
+def load_offline_transitions(trial_store_filepaths: list, dbms_name: str,
+                             target_metric: str,
+                             dbms_config_space: ConfigurationSpace,
+                             n_states: int) -> tuple:
+    """Load the transitions of all the recorded sessions.
+
+    The rewards of a session are relative to its own default performance,
+    and computed like online.
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray, np.ndarray): The states,
+            actions, rewards and next states.
+    """
+
+    logger = CUSTOM_LOGGING_INSTANCE.get_logger()
+    warm_starter = WarmStarter(trial_store_filepaths, dbms_name,
+                               target_metric)
+
+    arrays = ([], [], [], [])
+    for trial_store_filepath in trial_store_filepaths:
+        session = warm_starter.load_session(trial_store_filepath)
+        if session is None:
+            continue
+
+        default_perf = session["default_perf"]
+        session_arrays = get_transition_arrays(
+            warm_starter.get_session_transitions(session, default_perf),
+            dbms_config_space,
+            n_states,
+            lambda perf, prev_perf, worst_perf: get_ddpg_reward(
+                perf, prev_perf, default_perf, worst_perf
+            ),
+        )
+        logger.info(
+            f"Loaded {len(session_arrays[0])} transitions from "
+            f"{trial_store_filepath}."
+        )
+        for array, session_array in zip(arrays, session_arrays):
+            array.extend(session_array)
+
+    states, actions, rewards, next_states = arrays
+    n_actions = len(dbms_config_space)
+    return (
+        np.array(states, dtype=np.float32).reshape(-1, n_states),
+        np.array(actions, dtype=np.float32).reshape(-1, n_actions),
+        np.array(rewards, dtype=np.float32),
+        np.array(next_states, dtype=np.float32).reshape(-1, n_states),
+    )
+
+
+def pretrain_agent(model, transitions: tuple, n_updates: int,
+                   log_interval: int = 1000) -> list:
+    """Bulk-load transitions into the replay memory of a DDPG agent and
+    update it on them.
+
+    Args:
+        model (DDPG): The plain or liquid DDPG model.
+        transitions (tuple): The states, actions, rewards and next states.
+        n_updates (int): Number of updates.
+        log_interval (int): Number of updates between logged losses.
+
+    Returns:
+        (list): The (critic loss, actor loss) of every update.
+    """
+
+    logger = CUSTOM_LOGGING_INSTANCE.get_logger()
+
+    model.add_samples(*transitions)
+    if len(model.replay_memory) < model.batch_size:
+        raise ValueError(
+            f"Pre-training needs at least {model.batch_size} transitions, "
+            f"got {len(model.replay_memory)}."
+        )
+
+    losses = []
+    start_time = time.time()
+    for i in range(1, n_updates + 1):
+        critic_loss, actor_loss = model.update()
+        losses.append((float(critic_loss), float(actor_loss)))
+
+        if i % log_interval == 0 or i == n_updates:
+            critic_losses, actor_losses = np.mean(
+                losses[-log_interval:], axis=0
+            )
+            logger.info(
+                f"Update {i}/{n_updates} -- critic loss: "
+                f"{critic_losses:.6f}, actor loss: {actor_losses:.6f}"
+            )
+
+    logger.info(
+        f"Pre-trained the agent on {len(model.replay_memory)} transitions "
+        f"with {n_updates} updates in {time.time() - start_time:.2f} s."
+    )
+
+    return losses
@@ -1,127 +1,362 @@
 """Prioritized replay memory for DDPG.
 
 From https://raw.githubusercontent.com/cmu-db/ottertune/master/server/analysis/ddpg/prioritized_replay_memory.py
+
+The sum tree is an array-backed binary tree whose leaves hold the
+priorities of the transitions. It is traversed level by level for a whole
+batch at once, and the transitions are kept in preallocated typed arrays, so
+sampling and updating priorities have no per-transition Python overhead.
+
+Transitions are stored in the order they are added, so the transitions
+preceding a sampled one form its state sequence as long as each next state
+is the state of the following transition, e.g., for the liquid actor, which
+also stores its hidden state with every transition.
 """
 
-import random
 import pickle
 import numpy as np
 
 
-class SumTree:
-    write = 0
+TRANSITION_ARRAYS = ["states", "actions", "rewards", "next_states"]
 
+
+class SumTree:
     def __init__(self, capacity):
         self.capacity = capacity
-        self.tree = np.zeros(2 * capacity - 1)
-        self.data = np.zeros(capacity, dtype=object)
-        self.num_entries = 0
+        # Leaves are padded to a power of two, so all of them are at depth
+        # self.depth
+        self.depth = max(int(np.ceil(np.log2(capacity))), 0)
+        self.n_leaves = 2 ** self.depth
+        self.tree = np.zeros(2 * self.n_leaves - 1)
 
-    def _propagate(self, idx, change):
-        parent = (idx - 1) // 2
-        self.tree[parent] += change
-        if parent != 0:
-            self._propagate(parent, change)
+    def total(self):
+        return self.tree[0]
 
-    def _retrieve(self, idx, s):
-        left = 2 * idx + 1
-        right = left + 1
+    def update(self, data_idxs, priorities):
+        """Set the priorities of a batch of transitions.
 
-        if left >= len(self.tree):
-            return idx
+        Args:
+            data_idxs (np.ndarray): Indexes of the transitions.
+            priorities (np.ndarray): Their new priorities.
+        """
 
-        if s <= self.tree[left]:
-            return self._retrieve(left, s)
-        else:
-            return self._retrieve(right, s - self.tree[left])
+        if np.ndim(data_idxs) == 0:
+            self._update_one(int(data_idxs), float(priorities))
+            return
 
-    def total(self):
-        return self.tree[0]
+        idxs = np.asarray(data_idxs) + self.n_leaves - 1
+        self.tree[idxs] = priorities
+
+        # Recompute the sums of the ancestors level by level, which is also
+        # correct if a transition appears several times in the batch
+        for _ in range(self.depth):
+            idxs = (idxs - 1) // 2
+            self.tree[idxs] = self.tree[2 * idxs + 1] + self.tree[2 * idxs + 2]
 
-    def add(self, p, data):
-        idx = self.write + self.capacity - 1
+    def _update_one(self, data_idx, priority):
+        # Adding transitions one by one is faster without numpy overhead
+        idx = data_idx + self.n_leaves - 1
+        change = priority - self.tree[idx]
+        self.tree[idx] = priority
+        while idx > 0:
+            idx = (idx - 1) // 2
+            self.tree[idx] += change
 
-        self.data[self.write] = data
-        self.update(idx, p)
+    def get(self, values):
+        """Find the transitions whose cumulative priority ranges contain a
+        batch of values in [0, total()].
 
-        self.write += 1
-        if self.write >= self.capacity:
-            self.write = 0
-        if self.num_entries < self.capacity:
-            self.num_entries += 1
+        Returns:
+            (np.ndarray, np.ndarray): The indexes of the transitions and
+                their priorities.
+        """
 
-    def update(self, idx, p):
-        change = p - self.tree[idx]
+        values = np.array(values, dtype=float)
+        idxs = np.zeros(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * idxs + 1
+            left_values = self.tree[left]
+            # Rounding errors must not lead to an empty subtree
+            go_right = (values > left_values) & (self.tree[left + 1] > 0)
+            values = np.where(go_right, values - left_values, values)
+            idxs = np.where(go_right, left + 1, left)
 
-        self.tree[idx] = p
-        self._propagate(idx, change)
+        return idxs - self.n_leaves + 1, self.tree[idxs]
 
-    def get(self, s):
-        idx = self._retrieve(0, s)
-        data_idx = idx - self.capacity + 1
-        return [idx, self.tree[idx], self.data[data_idx]]
+    def get_priorities(self, n_entries):
+        return self.tree[self.n_leaves - 1:self.n_leaves - 1 + n_entries]
 
 
 class PrioritizedReplayMemory:
-    def __init__(self, capacity):
+    def __init__(self, capacity, n_states=None, n_actions=None,
+                 alpha=0.6, beta=0.4, n_hidden=None):
+        """
+        Args:
+            capacity (int): Maximum number of transitions.
+            n_states (int): Size of the states, if known in advance.
+            n_actions (int): Size of the actions, if known in advance.
+            alpha (float): How much the priorities skew sampling, where 0 is
+                uniform sampling.
+            beta (float): Initial exponent of the importance-sampling
+                weights, which is annealed to 1.
+            n_hidden (int): Size of the hidden states stored with the
+                transitions, if any.
+        """
+
         self.tree = SumTree(capacity)
         self.capacity = capacity
         self.e = 0.01  # pylint: disable=invalid-name
-        self.a = 0.6  # pylint: disable=invalid-name
-        self.beta = 0.4
+        self.a = alpha  # pylint: disable=invalid-name
+        self.beta = beta
         self.beta_increment_per_sampling = 0.001
 
+        self.write = 0
+        self.num_entries = 0
+        # Transitions (s, a, r, s'), allocated on the first sample if their
+        # sizes are not given
+        self.states = None
+        self.actions = None
+        self.rewards = None
+        self.next_states = None
+        # Hidden states of a recurrent actor before it saw the states
+        self.n_hidden = n_hidden
+        self.hiddens = None
+        if n_states is not None and n_actions is not None:
+            self._allocate(n_states, n_actions)
+
+    def _allocate(self, n_states, n_actions):
+        self.states = np.zeros((self.capacity, n_states), dtype=np.float32)
+        self.actions = np.zeros((self.capacity, n_actions), dtype=np.float32)
+        self.rewards = np.zeros(self.capacity, dtype=np.float32)
+        self.next_states = np.zeros((self.capacity, n_states),
+                                    dtype=np.float32)
+        if self.n_hidden is not None:
+            self.hiddens = np.zeros((self.capacity, self.n_hidden),
+                                    dtype=np.float32)
+
+    def _copy_on_write(self):
+        # Restored arrays may be memory-mapped read-only and only hold the
+        # filled part of the memory, so they are copied on the first write
+        if self.states is None or (
+            len(self.states) == self.capacity and self.states.flags.writeable
+        ):
+            return
+
+        arrays = {
+            key: getattr(self, key) for key in TRANSITION_ARRAYS + ["hiddens"]
+        }
+        self._allocate(arrays["states"].shape[1], arrays["actions"].shape[1])
+        n = len(arrays["states"])
+        for key, array in arrays.items():
+            if array is not None:
+                getattr(self, key)[:n] = array
+
     def _get_priority(self, error):
-        return (error + self.e) ** self.a
+        return (np.abs(error) + self.e) ** self.a
+
+    def add(self, error, sample, hidden=None):
+        # (s, a, r, s')
+        state, action, reward, next_state = sample
+        if self.states is None:
+            self._allocate(len(state), len(action))
+        self._copy_on_write()
+
+        idx = self.write
+        self.states[idx] = state
+        self.actions[idx] = action
+        self.rewards[idx] = reward
+        self.next_states[idx] = next_state
+        if self.hiddens is not None:
+            # An unknown hidden state is the initial one
+            self.hiddens[idx] = hidden if hidden is not None else 0
+        self.tree.update(idx, self._get_priority(error))
+
+        self.write = (self.write + 1) % self.capacity
+        self.num_entries = min(self.num_entries + 1, self.capacity)
+
+    def add_batch(self, errors, samples, hiddens=None):
+        """Add a batch of transitions with one priority update.
+
+        Args:
+            errors (np.ndarray): TD errors of the transitions.
+            samples (tuple): States, actions, rewards and next states of the
+                transitions.
+            hiddens (np.ndarray): Hidden states of the transitions, if any.
+        """
+
+        states, actions, rewards, next_states = (
+            np.asarray(x, dtype=np.float32) for x in samples
+        )
+        errors = np.asarray(errors)
+        if self.states is None:
+            self._allocate(states.shape[1], actions.shape[1])
+        self._copy_on_write()
 
-    def add(self, error, sample):
-        # (s, a, r, s, t)
-        p = self._get_priority(error)
-        self.tree.add(p, sample)
+        # Only the last capacity transitions are kept
+        n_samples = len(rewards)
+        n = min(n_samples, self.capacity)
+        idxs = (self.write + n_samples - n + np.arange(n)) % self.capacity
+        self.states[idxs] = states[-n:]
+        self.actions[idxs] = actions[-n:]
+        self.rewards[idxs] = rewards[-n:]
+        self.next_states[idxs] = next_states[-n:]
+        if self.hiddens is not None:
+            self.hiddens[idxs] = (
+                np.asarray(hiddens, dtype=np.float32)[-n:]
+                if hiddens is not None else 0
+            )
+        self.tree.update(idxs, self._get_priority(errors[-n:]))
+
+        self.write = (self.write + n_samples) % self.capacity
+        self.num_entries = min(self.num_entries + n_samples, self.capacity)
 
     def __len__(self):
-        return self.tree.num_entries
+        return self.num_entries
 
     def sample(self, n):
-        batch = []
-        idxs = []
+        """Sample a batch of transitions, one from each of n segments of
+        equal total priority.
+
+        Returns:
+            (tuple, np.ndarray, np.ndarray): The states, actions, rewards and
+                next states of the batch, the indexes of its transitions and
+                their importance-sampling weights, which correct the bias of
+                prioritized sampling.
+        """
+
         segment = self.tree.total() / n
-        priorities = []
 
         self.beta = np.min([1., self.beta + self.beta_increment_per_sampling])
 
-        for i in range(n):
-            a = segment * i
-            b = segment * (i + 1)
+        lows = segment * np.arange(n)
+        values = np.random.uniform(lows, lows + segment)
+        idxs, priorities = self.tree.get(values)
+
+        batch = (
+            self.states[idxs],
+            self.actions[idxs],
+            self.rewards[idxs],
+            self.next_states[idxs],
+        )
+
+        sampling_probabilities = priorities / self.tree.total()
+        is_weights = np.power(self.num_entries * sampling_probabilities,
+                              -self.beta)
+        is_weights /= is_weights.max()
+
+        return batch, idxs, is_weights.astype(np.float32)
+
+    def get_sequences(self, idxs, seq_len):
+        """Get the state sequences ending at transitions.
+
+        A sequence starts at its earliest step from which every transition
+        leads to the following one, i.e., its next state is the state of
+        the following transition. Earlier steps belong to other sequences.
+
+        Args:
+            idxs (np.ndarray): Indexes of the last transitions.
+            seq_len (int): Maximum length of the sequences.
+
+        Returns:
+            (np.ndarray, np.ndarray, np.ndarray): The (batch, time, features)
+                states, the first step of every sequence and the hidden
+                states at the first steps, or None if none are stored.
+        """
+
+        idxs = np.asarray(idxs)
+        steps = np.arange(1 - seq_len, 1)
+        window = (idxs[:, None] + steps) % self.capacity
+        # Restored arrays may only hold the filled part of the memory, whose
+        # unfilled steps are invalid anyway
+        window = np.minimum(window, len(self.states) - 1)
+        states = self.states[window]
+
+        # Steps older than the oldest transition are not filled or were
+        # overwritten
+        ages = (self.write - 1 - idxs[:, None]) % self.capacity - steps
+        is_valid = ages < self.num_entries
+        is_valid[:, :-1] &= np.all(
+            self.next_states[window[:, :-1]] == states[:, 1:], axis=2
+        )
+        # A step is in the sequence if all the later steps are as well
+        is_valid = np.flip(np.cumprod(np.flip(is_valid, axis=1), axis=1),
+                           axis=1)
+        first_steps = seq_len - is_valid.sum(axis=1)
+
+        hiddens = None
+        if self.hiddens is not None:
+            hiddens = self.hiddens[window[np.arange(len(idxs)), first_steps]]
+
+        return states, first_steps, hiddens
+
+    def update(self, idxs, errors):
+        """Update the priorities of a batch of sampled transitions."""
+
+        self.tree.update(idxs, self._get_priority(np.asarray(errors)))
+
+    def get_arrays(self):
+        """Get the filled part of the memory, i.e., the transitions and their
+        priorities."""
+
+        n = self.num_entries
+        arrays = {"priorities": self.tree.get_priorities(n).copy()}
+        for key in TRANSITION_ARRAYS + ["hiddens"]:
+            array = getattr(self, key)
+            arrays[key] = array[:n].copy() if array is not None else None
+
+        return arrays
+
+    def set_arrays(self, arrays, capacity, write, num_entries, beta):
+        """Restore the memory from get_arrays() and its counters.
+
+        The arrays are used as they are, e.g., memory-mapped read-only, until
+        the first transition is added, which copies them into the memory.
+        """
+
+        self.capacity = capacity
+        self.tree = SumTree(capacity)
+        self.write = write
+        self.num_entries = num_entries
+        self.beta = beta
 
-            s = random.uniform(a, b)
-            (idx, p, data) = self.tree.get(s)
-            priorities.append(p)
-            batch.append(data)
-            idxs.append(idx)
-        return batch, idxs
+        for key in TRANSITION_ARRAYS + ["hiddens"]:
+            setattr(self, key, None)
+        if arrays["states"] is not None:
+            for key in TRANSITION_ARRAYS:
+                setattr(self, key, arrays[key])
+            hiddens = arrays.get("hiddens")
+            if hiddens is not None:
+                self.n_hidden = hiddens.shape[1]
+                self.hiddens = hiddens
+            elif self.n_hidden is not None:
+                self.hiddens = np.zeros((num_entries, self.n_hidden),
+                                        dtype=np.float32)
+            self.tree.update(np.arange(num_entries), arrays["priorities"])
 
-        # sampling_probabilities = priorities / self.tree.total()
-        # is_weight = np.power(self.tree.num_entries * sampling_probabilities, -self.beta)
-        # is_weight /= is_weight.max()
+    def _get_memory(self):
+        # Only the filled part of the memory is stored
+        return {
+            "capacity": self.capacity,
+            "write": self.write,
+            "num_entries": self.num_entries,
+            "beta": self.beta,
+            **self.get_arrays(),
+        }
 
-    def update(self, idx, error):
-        p = self._get_priority(error)
-        self.tree.update(idx, p)
+    def _set_memory(self, memory):
+        self.set_arrays(memory, memory["capacity"], memory["write"],
+                        memory["num_entries"], memory["beta"])
 
     def save(self, path):
-        f = open(path, "wb")
-        pickle.dump({"tree": self.tree}, f)
-        f.close()
+        with open(path, "wb") as f:
+            pickle.dump(self._get_memory(), f)
 
     def load_memory(self, path):
         with open(path, "rb") as f:
-            _memory = pickle.load(f)
-        self.tree = _memory["tree"]
+            self._set_memory(pickle.load(f))
 
     def get(self):
-        return pickle.dumps({"tree": self.tree})
+        return pickle.dumps(self._get_memory())
 
     def set(self, binary):
-        self.tree = pickle.loads(binary)["tree"]
-    
\ No newline at end of file
+        self._set_memory(pickle.loads(binary))
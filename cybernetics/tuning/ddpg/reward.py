@@ -0,0 +1,52 @@
+"""Reward of a DDPG tuning step."""
+
+
+def get_cdbtune_reward(perf: float, prev_perf: float,
+                       default_perf: float) -> float:
+    """Reward calculation same as CDBTune paper -- Section 4.2
+
+    Args:
+        perf (float): Performance of the evaluated configuration.
+        prev_perf (float): Performance of the previous evaluation.
+        default_perf (float): Performance of the default configuration.
+
+    Returns:
+        (float): The reward.
+    """
+
+    # perf diff from default / prev evaluation
+    delta_default = (perf - default_perf) / default_perf
+    delta_prev = (perf - prev_perf) / prev_perf
+
+    if delta_default > 0:
+        reward =   ((1 + delta_default) ** 2 - 1) * abs(1 + delta_prev)
+    else:
+        reward = - ((1 - delta_default) ** 2 - 1) * abs(1 - delta_prev)
+
+    # no improvement over last evaluation -- 0 reward
+    if reward > 0 and delta_prev < 0:
+        reward = 0
+
+    return reward
+
+
+def get_ddpg_reward(perf: float, prev_perf: float, default_perf: float,
+                    worst_perf: float) -> float:
+    """Reward of a DDPG tuning step, online as well as from the trials of
+    past sessions.
+
+    Args:
+        perf (float): Performance of the evaluated configuration.
+        prev_perf (float): Performance of the previous evaluation.
+        default_perf (float): Performance of the default configuration.
+        worst_perf (float): Worst performance of the session so far,
+            including this evaluation.
+
+    Returns:
+        (float): The reward, which is 0 for the worst evaluation so far.
+    """
+
+    if perf == worst_perf:
+        return 0
+
+    return get_cdbtune_reward(perf, prev_perf, default_perf)
@@ -6,15 +6,48 @@ https://github.com/PKU-DAIR/DBTune/blob/main/autotune/tuner.py
 https://github.com/uw-mad-dash/llamatune/blob/main/run-smac.py
 """
 
+import os
+import threading
 import time
+from contextlib import closing
 
+from cybernetics.tuning.batch_bo import (
+    get_batch_proposer,
+    optimize_in_batches,
+)
+from cybernetics.tuning.budget import get_tuning_budget
+from cybernetics.tuning.ddpg.agent_snapshot import AGENT_DIRNAME
 from cybernetics.tuning.dbms_config_optimizer import (
     get_bo_optimizer,
     get_ddpg_optimizer,
     get_liquid_ddpg_optimizer,
 )
+from cybernetics.tuning.scheduler import (
+    TrialScheduler,
+    TrialWorker,
+    optimize_in_parallel,
+)
+from cybernetics.tuning.warm_start import (
+    get_warm_starter,
+    seed_smac_runhistory,
+)
+from cybernetics.utils.checkpoint import (
+    CHECKPOINT_FILENAME,
+    load_checkpoint,
+    save_checkpoint,
+)
 from cybernetics.utils.custom_logging import CUSTOM_LOGGING_INSTANCE
 from cybernetics.utils.exp_tracker import ExperimentState
+from cybernetics.utils.trial_store import (
+    DEFAULT_CONFIG,
+    TRIAL_STORE_FILENAME,
+    TrialStore,
+)
+from cybernetics.utils.util import (
+    get_global_random_state,
+    set_global_random_state,
+)
+from cybernetics.workload.early_stopping import get_early_stopping_policy
 
 
 class TuningEngine:
@@ -25,6 +58,8 @@ class TuningEngine:
         dbms_config_space,
         workload_wrapper,
         adapter=None,
+        workers: list = None,
+        resume: bool = False,
     ) -> None:
         self.config = config
         self.dbms_wrapper = dbms_wrapper
@@ -32,153 +67,614 @@ class TuningEngine:
         self.workload_wrapper = workload_wrapper
         self.adapter = adapter
 
+        # Trials run on the given DBMS instance unless a pool of workers is
+        #   given for parallel evaluation
+        self.default_worker = TrialWorker(0, dbms_wrapper, workload_wrapper)
+        self.workers = workers or [self.default_worker]
+        # Guards the experiment state and timings shared by the workers
+        self.lock = threading.RLock()
+
         self.logger = CUSTOM_LOGGING_INSTANCE.get_logger()
         self.exp_state = ExperimentState(
             config["dbms_info"],
             config["workload_info"],
             config["config_optimizer"]["target_metric"],
             config["results"]["save_path"],
+            resume=resume,
         )
         self.target_metric = self.config["config_optimizer"]["target_metric"]
+
+        # Every trial is stored, and configurations proposed again reuse the
+        #   stored result unless the cache is disabled
+        self.trial_store = TrialStore(
+            os.path.join(config["results"]["save_path"], TRIAL_STORE_FILENAME)
+        )
+        self.use_trial_cache = (
+            str(
+                config["config_optimizer"].get("use_trial_cache", "true")
+            ).lower()
+            == "true"
+        )
+        # Trials of a surrogate session are stored as predicted, so they are
+        #   never mistaken for measured ones
+        self.predicted = "surrogate" in config
+
+        # Tuning stops once any of the trial, wall-clock or evaluation time
+        #   budgets is exhausted
+        self.budget = get_tuning_budget(config)
+        self.budget_exhausted = False
+        # Multi-fidelity BO also runs the workload for shorter times, whose
+        #   performance is not comparable to full runs
+        self.max_budget = None
+        if config["config_optimizer"]["optimizer"] == "bo-mf":
+            self.max_budget = float(config["config_optimizer"]["max_budget"])
+
         self.optimizer = self.init_optimizer()
+        self.scheduler = self.init_scheduler(workers)
+        # BO proposes a batch of configurations per round if configured
+        self.batch_proposer = None
+        if hasattr(self.optimizer, "optimize"):
+            self.batch_proposer = get_batch_proposer(
+                config, self.optimizer.scenario.configspace
+            )
+        self.warm_starter = get_warm_starter(config)
+
+        self.early_stopping = get_early_stopping_policy(config)
+        if self.early_stopping and self.target_metric != "throughput":
+            # The workload only reports throughput while running
+            self.logger.info("Early stopping requires throughput as target.")
+            self.early_stopping = None
 
         self.logger.info("DBMS config optimizer is ready.")
         self.start_time = time.time()
         self.evaluation_time = 0
+        self.restart_time = 0
+        self.restore_time = 0
+        self.trial_timings = []
 
-    def target_function(self, dbms_config, seed: int):
-        """Target function for BO-based optimizer."""
+        # Checkpoint the session every checkpoint_interval completed trials
+        self.checkpoint_filepath = os.path.join(
+            config["results"]["save_path"], CHECKPOINT_FILENAME
+        )
+        self.checkpoint_interval = int(
+            config["results"].get("checkpoint_interval", 1)
+        )
+        self.n_completed_trials = 0
+        self.n_checkpointed_trials = 0
+        # DDPG checkpoints once the model has learned from a trial
+        if hasattr(self.optimizer, "checkpoint_callback"):
+            self.optimizer.checkpoint_callback = self.maybe_save_checkpoint
+            self.optimizer.get_used_budget = self.get_used_budget
+            self.optimizer.is_budget_exhausted = self.is_budget_exhausted
+
+        if resume:
+            self.restore_checkpoint()
+
+    def get_used_budget(self) -> float:
+        """Get the used fraction of the most used tuning budget."""
+
+        with self.lock:
+            return self.budget.get_used_fraction(
+                self.n_completed_trials,
+                time.time() - self.start_time,
+                self.evaluation_time,
+            )
 
-        if self.adapter:
-            dbms_config = self.adapter.unproject_point(dbms_config)
+    def get_n_remaining_trials(self) -> int:
+        """Get the number of trials left in the tuning budget.
+
+        Warm-start trials are in the run history of SMAC but not evaluated,
+        so only the completed trials count.
+        """
+
+        with self.lock:
+            return max(self.budget.n_trials - self.n_completed_trials, 0)
+
+    def is_budget_exhausted(self) -> bool:
+        with self.lock:
+            if not self.budget_exhausted and self.get_used_budget() >= 1:
+                self.budget_exhausted = True
+                self.logger.info(
+                    f"Tuning budget ({self.budget}) exhausted after "
+                    f"{self.n_completed_trials} trials, "
+                    f"{time.time() - self.start_time:.0f} s wall time and "
+                    f"{self.evaluation_time:.0f} s evaluation time."
+                )
+
+            return self.budget_exhausted
+
+    def save_checkpoint(self) -> None:
+        """Atomically checkpoint the state of the tuning session."""
+
+        with self.lock:
+            state = {
+                "n_completed_trials": self.n_completed_trials,
+                "exp_state": self.exp_state.get_state(),
+                "elapsed_time": time.time() - self.start_time,
+                "evaluation_time": self.evaluation_time,
+                "restart_time": self.restart_time,
+                "restore_time": self.restore_time,
+                "trial_timings": self.trial_timings,
+                "first_runs": [
+                    worker.workload_wrapper.first_run
+                    for worker in self.workers
+                ],
+                # SMAC saves its run history to its output directory itself
+                "optimizer": (
+                    self.optimizer.get_state()
+                    if hasattr(self.optimizer, "get_state")
+                    else None
+                ),
+                "random_state": get_global_random_state(),
+            }
+
+            beg_time = time.time()
+            save_checkpoint(state, self.checkpoint_filepath)
+            self.n_checkpointed_trials = self.n_completed_trials
 
-        beg_time = time.time()
-        rtn_predicate = self.dbms_wrapper.apply_knobs(dbms_config)
-        assert rtn_predicate, "Failed to apply DBMS configuration."
+            self.logger.info(
+                f"Checkpointed {self.n_completed_trials} trials in "
+                f"{time.time() - beg_time:.2f} s."
+            )
 
-        self.workload_wrapper.run()
-        performance = self.dbms_wrapper.get_benchbase_metrics()
+    def maybe_save_checkpoint(self) -> None:
+        """Checkpoint the session if enough trials completed since the last
+        checkpoint."""
 
-        end_time = time.time()
-        self.evaluation_time += end_time - beg_time
+        with self.lock:
+            if (
+                self.n_completed_trials - self.n_checkpointed_trials
+                >= self.checkpoint_interval
+            ):
+                self.save_checkpoint()
+
+    def restore_checkpoint(self) -> bool:
+        """Restore the tuning session from its last checkpoint.
+
+        Returns:
+            (bool): Whether there was a checkpoint to resume from.
+        """
+
+        state = load_checkpoint(self.checkpoint_filepath)
+        if state is None:
+            self.logger.info("No checkpoint to resume from.")
+            return False
+
+        self.n_completed_trials = state["n_completed_trials"]
+        self.n_checkpointed_trials = state["n_completed_trials"]
+        self.exp_state.set_state(state["exp_state"])
+        self.start_time = time.time() - state["elapsed_time"]
+        self.evaluation_time = state["evaluation_time"]
+        self.restart_time = state["restart_time"]
+        self.restore_time = state["restore_time"]
+        self.trial_timings = state["trial_timings"]
+
+        for worker, first_run in zip(self.workers, state["first_runs"]):
+            worker.workload_wrapper.first_run = first_run
+
+        if state["optimizer"] is not None:
+            self.optimizer.set_state(state["optimizer"])
+        set_global_random_state(state["random_state"])
 
-        optimization_time = end_time - self.start_time - self.evaluation_time
         self.logger.info(
-            "TOTAL USED EVALUATION TIME: " + str(self.evaluation_time)
+            f"Resumed the tuning session after {self.n_completed_trials} "
+            "trials."
         )
+
+        return True
+
+    def init_scheduler(self, workers: list = None):
+        """Create the scheduler evaluating trials on the pool of workers, or
+        None if trials are evaluated one at a time."""
+
+        if not workers:
+            return None
+
+        seed = int(self.config["knob_space"]["random_seed"])
+
+        # SMAC
+        if hasattr(self.optimizer, "optimize"):
+            def evaluate_function(worker, dbms_config, budget):
+                return self.target_function(
+                    dbms_config, seed, budget, worker=worker
+                )
+        # RL-DDPG
+        else:
+            def evaluate_function(worker, dbms_config, budget):
+                return self.rl_target_function(
+                    dbms_config, seed, worker=worker
+                )
+
+        scheduler = TrialScheduler(workers, evaluate_function)
+        if not hasattr(self.optimizer, "optimize"):
+            self.optimizer.scheduler = scheduler
+
         self.logger.info(
-            "TOTAL USED OPTIMIZATION TIME: " + str(optimization_time)
+            f"Evaluating trials in parallel on {len(workers)} workers."
         )
 
-        if self.target_metric == "throughput":
-            throughput = performance["Throughput (requests/second)"]
-            self.logger.info(f"Throughput (requests/second): {throughput}")
+        return scheduler
 
-            if (
-                self.exp_state.best_perf is None
-                or throughput > self.exp_state.best_perf
-            ):
-                self.exp_state.best_perf = throughput
-                self.exp_state.best_config = dbms_config
+    def prepare_snapshot(self, worker: TrialWorker = None):
+        """Load the benchmark database once and snapshot it, or reuse an
+        existing snapshot."""
 
-            if (
-                self.exp_state.worst_perf is None
-                or throughput < self.exp_state.worst_perf
-            ):
-                self.exp_state.worst_perf = throughput
-                self.exp_state.worst_config = dbms_config
+        worker = worker or self.default_worker
+        if worker.dbms_wrapper.has_snapshot():
+            self.logger.info("Reusing the existing database snapshot.")
+            worker.workload_wrapper.first_run = False
+            self.restore_snapshot(worker)
+        else:
+            rtn_predicate = worker.workload_wrapper.load()
+            assert rtn_predicate, "Failed to load the benchmark database."
 
-            return -throughput
+            rtn_predicate = worker.dbms_wrapper.capture_snapshot()
+            assert rtn_predicate, "Failed to capture the database snapshot."
 
-        elif self.target_metric == "latency":
-            latency = performance["Latency Distribution"][
-                "95th Percentile Latency (microseconds)"
-            ]
+    def restore_snapshot(self, worker: TrialWorker = None) -> float:
+        """Reset the benchmark database to its freshly loaded state and
+        return the restore time."""
+
+        worker = worker or self.default_worker
+        beg_time = time.time()
+        rtn_predicate = worker.dbms_wrapper.restore_snapshot()
+        assert rtn_predicate, "Failed to restore the database snapshot."
+
+        restore_time = time.time() - beg_time
+        with self.lock:
+            self.restore_time += restore_time
             self.logger.info(
-                f"95th Percentile Latency (microseconds): {latency}"
+                "TOTAL USED RESTORE TIME: " + str(self.restore_time)
             )
 
-            if (
-                self.exp_state.best_perf is None
-                or latency < self.exp_state.best_perf
-            ):
-                self.exp_state.best_perf = latency
-                self.exp_state.best_config = dbms_config
+        return restore_time
 
-            if (
-                self.exp_state.worst_perf is None
-                or latency > self.exp_state.worst_perf
-            ):
-                self.exp_state.worst_perf = latency
-                self.exp_state.worst_config = dbms_config
+    def apply_dbms_config(
+        self, dbms_config, worker: TrialWorker = None
+    ) -> dict:
+        """Apply a DBMS configuration and start the timing record of the
+        current trial."""
 
-            return latency
+        worker = worker or self.default_worker
 
-    def rl_target_function(self, dbms_config, seed: int):
-        """Target function for RL-based optimizer."""
+        # Restoring is kept out of the evaluation time
+        restore_time = None
+        if worker.dbms_wrapper.use_snapshot:
+            restore_time = self.restore_snapshot(worker)
 
-        # Apply DBMS configuration
-        rtn_predicate = self.dbms_wrapper.apply_knobs(dbms_config)
+        beg_time = time.time()
+        rtn_predicate = worker.dbms_wrapper.apply_knobs(dbms_config)
         assert rtn_predicate, "Failed to apply DBMS configuration."
 
+        apply_report = worker.dbms_wrapper.last_apply_report or {}
+        timings = {
+            "worker_id": worker.worker_id,
+            "restore_time": restore_time,
+            "apply_action": apply_report.get("action"),
+            "apply_time": time.time() - beg_time,
+        }
+
+        # Break down the restart overhead included in the apply time
+        if timings["apply_action"] in ["restart", "start"]:
+            restart_profile = worker.dbms_wrapper.restart_manager.last_profile
+            timings.update(restart_profile)
+
+        with self.lock:
+            if timings["apply_action"] in ["restart", "start"]:
+                self.restart_time += timings["restart_time"]
+            self.trial_timings.append(timings)
+        self.logger.info(
+            f"Applied DBMS configuration ({timings['apply_action']}) in "
+            f"{timings['apply_time']:.2f} s."
+        )
+
+        return timings
+
+    def run_workload(
+        self, timings: dict, worker: TrialWorker = None
+    ) -> dict:
+        """Run the workload and return its performance metrics, stopping it
+        early if the early stopping policy says the current trial cannot
+        beat the incumbent."""
+
+        worker = worker or self.default_worker
+        timings["early_stopped"] = False
+        if self.early_stopping is None or self.exp_state.best_perf is None:
+            worker.workload_wrapper.run()
+            return worker.dbms_wrapper.get_benchbase_metrics()
+
+        samples = []
+        # Closing the stream kills the workload process right away instead
+        #   of whenever the generator is garbage-collected
+        with closing(worker.workload_wrapper.iter_run()) as stream:
+            for sample in stream:
+                samples.append(sample)
+
+                if self.early_stopping.should_stop(
+                    samples, self.exp_state.best_perf
+                ):
+                    timings["early_stopped"] = True
+                    break
+
+        if not timings["early_stopped"]:
+            return worker.dbms_wrapper.get_benchbase_metrics()
+
+        # No summary is written for a stopped run, so report the throughput
+        #   extrapolated from the samples observed so far
+        throughput = self.early_stopping.estimate(samples)
+        self.logger.info(
+            f"Stopped the workload early after {len(samples)} samples. "
+            f"Extrapolated throughput: {throughput}"
+        )
+
+        return {"Throughput (requests/second)": throughput}
+
+    def evaluate_config(
+        self,
+        dbms_config,
+        worker: TrialWorker = None,
+        budget: float = None,
+        with_stats: bool = False,
+    ) -> tuple:
+        """Evaluate a DBMS configuration and store the trial, or reuse the
+        stored result of the same canonical configuration.
+
+        Args:
+            dbms_config (dict): The DBMS configuration.
+            worker (TrialWorker): The worker to evaluate on.
+            budget (float): Workload execution time in seconds, if any.
+            with_stats (bool): Whether to collect DBMS statistics.
+
+        Returns:
+            (tuple): The performance metrics, the DBMS numeric statistics
+                (None unless with_stats) and the timing breakdown.
+        """
+
+        worker = worker or self.default_worker
+        dbms_name = self.config["dbms_info"]["dbms_name"]
+        workload = self.config["workload_info"]["workload"]
+
+        if self.use_trial_cache:
+            trial = self.trial_store.get_cached_trial(
+                dbms_config,
+                dbms_name,
+                workload,
+                budget,
+                with_stats,
+                predicted=self.predicted,
+            )
+            if trial is not None:
+                self.logger.info(
+                    f"Reusing the result of trial {trial['trial_id']} with "
+                    "the same configuration."
+                )
+                timings = {
+                    "cached_trial_id": trial["trial_id"],
+                    "budget": budget,
+                    "apply_time": 0,
+                    "workload_time": 0,
+                }
+                return trial["performance"], trial["numeric_stats"], timings
+
+        worker.workload_wrapper.set_duration(
+            int(budget) if budget is not None else None
+        )
+
+        timings = self.apply_dbms_config(dbms_config, worker)
+        timings["budget"] = budget
+
         # Reset DBMS statistics which are needed for DDPG-based tuning
         # reset_predicate = self.dbms_wrapper.reset_cumulative_stats()
         # assert reset_predicate, "Failed to reset DBMS cumulative statistics."
 
         # Run the workload
-        self.workload_wrapper.run()
-        performance = self.dbms_wrapper.get_benchbase_metrics()
-        numeric_stats, _ = self.dbms_wrapper.get_dbms_stats()
+        beg_time = time.time()
+        performance = self.run_workload(timings, worker)
+        numeric_stats = None
+        if with_stats:
+            numeric_stats, _ = worker.dbms_wrapper.get_dbms_stats()
+        timings["workload_time"] = time.time() - beg_time
+
+        # Link the trial to the result files of its workload run
+        run = None
+        if hasattr(worker.workload_wrapper, "get_last_run"):
+            run = worker.workload_wrapper.get_last_run()
+
+        self.trial_store.add_trial(
+            dbms_config,
+            dbms_name,
+            workload,
+            self.target_metric,
+            performance,
+            numeric_stats,
+            timings,
+            budget,
+            run=run,
+            predicted=self.predicted,
+        )
 
-        if self.target_metric == "throughput":
-            throughput = performance["Throughput (requests/second)"]
-            self.logger.info(f"Throughput (requests/second): {throughput}")
+        return performance, numeric_stats, timings
 
-            if (
-                self.exp_state.best_perf is None
-                or throughput > self.exp_state.best_perf
-            ):
-                self.exp_state.best_perf = throughput
-                self.exp_state.best_config = dbms_config
+    def target_function(
+        self,
+        dbms_config,
+        seed: int,
+        budget: float = None,
+        worker: TrialWorker = None,
+    ):
+        """Target function for BO-based optimizer.
 
-            if (
-                self.exp_state.worst_perf is None
-                or throughput < self.exp_state.worst_perf
-            ):
-                self.exp_state.worst_perf = throughput
-                self.exp_state.worst_config = dbms_config
+        The budget of multi-fidelity BO is the workload execution time in
+        seconds.
+        """
 
-            return throughput, numeric_stats
+        if self.adapter:
+            dbms_config = self.adapter.unproject_point(dbms_config)
 
-        elif self.target_metric == "latency":
-            latency = performance["Latency Distribution"][
-                "95th Percentile Latency (microseconds)"
-            ]
+        performance, _, timings = self.evaluate_config(
+            dbms_config, worker, budget
+        )
+        # Only full-budget trials may become the incumbent, which early
+        #   stopping compares against as well
+        is_full_budget = (
+            budget is None
+            or self.max_budget is None
+            or budget >= self.max_budget
+        )
+
+        end_time = time.time()
+        # The experiment state is shared by the workers
+        with self.lock:
+            self.n_completed_trials += 1
+            self.evaluation_time += (
+                timings["apply_time"] + timings["workload_time"]
+            )
+
+            optimization_time = (
+                end_time - self.start_time - self.evaluation_time
+            )
             self.logger.info(
-                f"95th Percentile Latency (microseconds): {latency}"
+                "TOTAL USED EVALUATION TIME: " + str(self.evaluation_time)
+            )
+            self.logger.info(
+                "TOTAL USED RESTART TIME: " + str(self.restart_time)
+            )
+            self.logger.info(
+                "TOTAL USED OPTIMIZATION TIME: " + str(optimization_time)
             )
 
-            if (
-                self.exp_state.best_perf is None
-                or latency < self.exp_state.best_perf
-            ):
-                self.exp_state.best_perf = latency
-                self.exp_state.best_config = dbms_config
-            if (
-                self.exp_state.worst_perf is None
-                or latency > self.exp_state.worst_perf
-            ):
-                self.exp_state.worst_perf = latency
-                self.exp_state.worst_config = dbms_config
+            if self.target_metric == "throughput":
+                throughput = performance["Throughput (requests/second)"]
+                self.logger.info(f"Throughput (requests/second): {throughput}")
+
+                if is_full_budget and (
+                    self.exp_state.best_perf is None
+                    or throughput > self.exp_state.best_perf
+                ):
+                    self.exp_state.best_perf = throughput
+                    self.exp_state.best_config = dbms_config
+
+                if is_full_budget and (
+                    self.exp_state.worst_perf is None
+                    or throughput < self.exp_state.worst_perf
+                ):
+                    self.exp_state.worst_perf = throughput
+                    self.exp_state.worst_config = dbms_config
+
+                self.maybe_save_checkpoint()
+                return -throughput
+
+            elif self.target_metric == "latency":
+                latency = performance["Latency Distribution"][
+                    "95th Percentile Latency (microseconds)"
+                ]
+                self.logger.info(
+                    f"95th Percentile Latency (microseconds): {latency}"
+                )
+
+                if is_full_budget and (
+                    self.exp_state.best_perf is None
+                    or latency < self.exp_state.best_perf
+                ):
+                    self.exp_state.best_perf = latency
+                    self.exp_state.best_config = dbms_config
+
+                if is_full_budget and (
+                    self.exp_state.worst_perf is None
+                    or latency > self.exp_state.worst_perf
+                ):
+                    self.exp_state.worst_perf = latency
+                    self.exp_state.worst_config = dbms_config
+
+                self.maybe_save_checkpoint()
+                return latency
+
+    def evaluate_batch(self, dbms_configs: list) -> list:
+        """Evaluate a batch of BO proposals, in parallel if a scheduler is
+        set, and return their costs, with None for the failed trials."""
+
+        if self.scheduler:
+            return self.scheduler.map(dbms_configs)
+
+        seed = int(self.config["knob_space"]["random_seed"])
+        costs = []
+        for dbms_config in dbms_configs:
+            try:
+                costs.append(self.target_function(dbms_config, seed))
+            except Exception as error:
+                self.logger.info(f"Trial failed: {error!r}")
+                costs.append(None)
+
+        return costs
+
+    def rl_target_function(
+        self, dbms_config, seed: int, worker: TrialWorker = None
+    ):
+        """Target function for RL-based optimizer."""
 
-            return latency, numeric_stats
+        performance, numeric_stats, timings = self.evaluate_config(
+            dbms_config, worker, with_stats=True
+        )
+
+        # The experiment state is shared by the workers
+        with self.lock:
+            self.n_completed_trials += 1
+            self.evaluation_time += (
+                timings["apply_time"] + timings["workload_time"]
+            )
+            if self.target_metric == "throughput":
+                throughput = performance["Throughput (requests/second)"]
+                self.logger.info(f"Throughput (requests/second): {throughput}")
+
+                if (
+                    self.exp_state.best_perf is None
+                    or throughput > self.exp_state.best_perf
+                ):
+                    self.exp_state.best_perf = throughput
+                    self.exp_state.best_config = dbms_config
+
+                if (
+                    self.exp_state.worst_perf is None
+                    or throughput < self.exp_state.worst_perf
+                ):
+                    self.exp_state.worst_perf = throughput
+                    self.exp_state.worst_config = dbms_config
+
+                return throughput, numeric_stats
+
+            elif self.target_metric == "latency":
+                latency = performance["Latency Distribution"][
+                    "95th Percentile Latency (microseconds)"
+                ]
+                self.logger.info(
+                    f"95th Percentile Latency (microseconds): {latency}"
+                )
+
+                if (
+                    self.exp_state.best_perf is None
+                    or latency < self.exp_state.best_perf
+                ):
+                    self.exp_state.best_perf = latency
+                    self.exp_state.best_config = dbms_config
+                if (
+                    self.exp_state.worst_perf is None
+                    or latency > self.exp_state.worst_perf
+                ):
+                    self.exp_state.worst_perf = latency
+                    self.exp_state.worst_config = dbms_config
+
+                return latency, numeric_stats
 
     def init_optimizer(self):
         if self.config["config_optimizer"]["optimizer"].startswith("bo"):
             self.logger.info("Initiating BO-based optimizer...")
 
             optimizer = get_bo_optimizer(
-                self.config, self.dbms_config_space, self.target_function
+                self.config,
+                self.dbms_config_space,
+                self.target_function,
+                get_used_budget=self.get_used_budget,
+                is_budget_exhausted=self.is_budget_exhausted,
             )
         elif self.config["config_optimizer"]["optimizer"].startswith("rl"):
             self.logger.info("Initiating RL-based optimizer...")
@@ -203,7 +699,7 @@ class TuningEngine:
 
         return optimizer
 
-    def run(self):
+    def evaluate_default_config(self):
         # Restart DBMS with default configuration
         beg_time = time.time()
         self.dbms_wrapper.reset_knobs_by_restarting_db()
@@ -212,13 +708,29 @@ class TuningEngine:
         self.workload_wrapper.run()
         performance = self.dbms_wrapper.get_benchbase_metrics()
 
+        # The DBMS statistics fingerprint the workload for warm-starting
+        numeric_stats, _ = self.dbms_wrapper.get_dbms_stats()
+
         end_time = time.time()
         self.evaluation_time += end_time - beg_time
+        self.trial_store.add_trial(
+            DEFAULT_CONFIG,
+            self.config["dbms_info"]["dbms_name"],
+            self.config["workload_info"]["workload"],
+            self.target_metric,
+            performance,
+            numeric_stats,
+            {"workload_time": end_time - beg_time},
+            predicted=self.predicted,
+        )
 
         optimization_time = end_time - self.start_time - self.evaluation_time
         self.logger.info(
             "TOTAL USED EVALUATION TIME: " + str(self.evaluation_time)
         )
+        self.logger.info(
+            "TOTAL USED RESTART TIME: " + str(self.restart_time)
+        )
         self.logger.info(
             "TOTAL USED OPTIMIZATION TIME: " + str(optimization_time)
         )
@@ -244,14 +756,98 @@ class TuningEngine:
                 f"Default 95th Percentile Latency (microseconds): {latency}"
             )
 
+        return numeric_stats
+
+    def warm_start(self, numeric_stats) -> None:
+        """Seed the optimizer with the trials of the past sessions whose
+        workload is the most similar to the current one.
+
+        Args:
+            numeric_stats (np.ndarray): DBMS statistics after running the
+                default configuration.
+        """
+
+        # SMAC
+        if hasattr(self.optimizer, "optimize"):
+            if self.adapter:
+                # Past configurations cannot be projected into the space
+                self.logger.info("Warm-starting does not support adapters.")
+                return
+
+            trials = self.warm_starter.select_trials(
+                numeric_stats, self.exp_state.default_perf
+            )
+            n_seeded = seed_smac_runhistory(
+                self.optimizer,
+                self.dbms_config_space,
+                trials,
+                self.target_metric,
+                int(self.config["knob_space"]["random_seed"]),
+            )
+        # RL-DDPG
+        else:
+            transitions = self.warm_starter.select_transitions(
+                numeric_stats, self.exp_state.default_perf
+            )
+            n_seeded = self.optimizer.warm_start(transitions)
+
+        self.logger.info(f"Warm-started from {n_seeded} past trials.")
+
+    def run(self):
+        for worker in self.workers:
+            if worker.dbms_wrapper.use_snapshot:
+                self.prepare_snapshot(worker)
+
+        # A resumed session has already evaluated the default configuration
+        if self.exp_state.default_perf is None:
+            numeric_stats = self.evaluate_default_config()
+            if self.warm_starter:
+                self.warm_start(numeric_stats)
+            self.save_checkpoint()
+        else:
+            self.logger.info(
+                "Skipping the evaluated default configuration: "
+                f"{self.exp_state.default_perf}"
+            )
+
         # SMAC
         if hasattr(self.optimizer, "optimize"):
-            best_dbms_config = self.optimizer.optimize()
+            if self.batch_proposer:
+                best_dbms_config = optimize_in_batches(
+                    self.optimizer,
+                    self.batch_proposer,
+                    self.evaluate_batch,
+                    self.get_n_remaining_trials(),
+                    int(self.config["knob_space"]["random_seed"]),
+                    is_budget_exhausted=self.is_budget_exhausted,
+                )
+            elif self.scheduler:
+                # SMAC resumes its run history from its output directory
+                best_dbms_config = optimize_in_parallel(
+                    self.optimizer,
+                    self.scheduler,
+                    self.get_n_remaining_trials(),
+                    is_budget_exhausted=self.is_budget_exhausted,
+                )
+            else:
+                best_dbms_config = self.optimizer.optimize()
         # RL-DDPG
         else:
             best_dbms_config = self.optimizer.run()
+            # The trained agent can be fine-tuned in later sessions
+            self.optimizer.model.save(
+                os.path.join(
+                    self.config["results"]["save_path"], AGENT_DIRNAME
+                )
+            )
+
+        if self.scheduler:
+            self.scheduler.shutdown()
+        self.save_checkpoint()
 
         # Complete tuning
+        if self.budget_exhausted:
+            self.logger.info("\nStopped DBMS configuration tuning on budget.")
         self.logger.info("\nCompleted DBMS configuration tuning.")
         self.logger.info(f"\nBest DBMS Configuration:\n{best_dbms_config}")
         self.logger.info(
@@ -0,0 +1,195 @@
+"""Parallel evaluation of DBMS configurations on a pool of DBMS instances.
+
+Every worker owns its own DBMS wrapper (a separate data directory and port)
+and workload wrapper, so trials running on different workers do not
+interfere with each other.
+"""
+
+import queue
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from cybernetics.utils.custom_logging import CUSTOM_LOGGING_INSTANCE
+
+
+# Settings of [dbms_info] that differ between the workers, given as
+#   comma-separated lists in the [parallel] section
+WORKER_DBMS_INFO_KEYS = ["db_cluster", "port", "db_log_filepath"]
+
+
+class TrialWorker:
+    def __init__(self, worker_id: int, dbms_wrapper, workload_wrapper):
+        self.worker_id = worker_id
+        self.dbms_wrapper = dbms_wrapper
+        self.workload_wrapper = workload_wrapper
+
+    def __repr__(self) -> str:
+        return f"worker {self.worker_id}"
+
+
+def get_worker_dbms_infos(config) -> list:
+    """Create the DBMS info of every worker from the [parallel] section of
+    the config, e.g.:
+
+        [parallel]
+        db_clusters=/data/pgsql/data1,/data/pgsql/data2
+        ports=5433,5434
+        db_log_filepaths=/data/pgsql/log1,/data/pgsql/log2
+
+    Returns:
+        (list): One DBMS info per worker, or an empty list if parallel
+            evaluation is not configured.
+    """
+
+    if "parallel" not in config:
+        return []
+
+    worker_values = {}
+    for key in WORKER_DBMS_INFO_KEYS:
+        values = config["parallel"][f"{key}s"].split(",")
+        worker_values[key] = [value.strip() for value in values]
+
+    n_workers = len(worker_values["db_cluster"])
+    if any(len(values) != n_workers for values in worker_values.values()):
+        raise ValueError(
+            "Every worker needs a db_cluster, port and db_log_filepath."
+        )
+
+    worker_dbms_infos = []
+    for i in range(n_workers):
+        dbms_info = dict(config["dbms_info"])
+        for key in WORKER_DBMS_INFO_KEYS:
+            dbms_info[key] = worker_values[key][i]
+        worker_dbms_infos.append(dbms_info)
+
+    return worker_dbms_infos
+
+
+class TrialScheduler:
+    """Evaluate DBMS configurations asynchronously, running every trial on
+    the next idle worker.
+    """
+
+    def __init__(self, workers: list, evaluate_function):
+        """
+        Args:
+            workers (list): Trial workers.
+            evaluate_function (callable): Called as
+                evaluate_function(worker, dbms_config, budget) to evaluate a
+                configuration on a worker.
+        """
+
+        assert len(workers) > 0, "The scheduler needs at least one worker."
+
+        self.workers = workers
+        self.evaluate_function = evaluate_function
+        self.logger = CUSTOM_LOGGING_INSTANCE.get_logger()
+
+        self.idle_workers = queue.Queue()
+        for worker in workers:
+            self.idle_workers.put(worker)
+        self.executor = ThreadPoolExecutor(
+            max_workers=len(workers), thread_name_prefix="trial_worker"
+        )
+
+    @property
+    def n_workers(self) -> int:
+        return len(self.workers)
+
+    def _evaluate(self, dbms_config, budget: float = None):
+        worker = self.idle_workers.get()
+        try:
+            self.logger.info(f"Evaluating a configuration on {worker}.")
+            return self.evaluate_function(worker, dbms_config, budget)
+        finally:
+            self.idle_workers.put(worker)
+
+    def submit(self, dbms_config, budget: float = None):
+        """Schedule the evaluation of a configuration.
+
+        Returns:
+            (Future): The result of the evaluate function.
+        """
+
+        return self.executor.submit(self._evaluate, dbms_config, budget)
+
+    def map(self, dbms_configs: list, budget: float = None) -> list:
+        """Evaluate a batch of configurations in parallel and return their
+        results in order, with None for the failed trials.
+        """
+
+        futures = [
+            self.submit(dbms_config, budget) for dbms_config in dbms_configs
+        ]
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as error:
+                # A failed trial must not discard the other trials of the
+                #   batch
+                self.logger.info(f"Trial failed: {error!r}")
+                results.append(None)
+
+        return results
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+def optimize_in_parallel(optimizer, scheduler: TrialScheduler,
+                         n_trials: int, is_budget_exhausted=None):
+    """Drive a SMAC optimizer through its ask/tell interface, keeping every
+    worker of the scheduler busy.
+
+    Args:
+        optimizer: SMAC facade.
+        scheduler (TrialScheduler): Scheduler whose evaluate function
+            returns the cost of a trial.
+        n_trials (int): Number of trials to evaluate.
+        is_budget_exhausted (callable): Returns whether the tuning budget
+            is exhausted, after which no new trials are submitted.
+
+    Returns:
+        (Configuration): The incumbent configuration.
+    """
+
+    from smac.runhistory.dataclasses import TrialValue
+    from smac.runhistory.enumerations import StatusType
+
+    logger = CUSTOM_LOGGING_INSTANCE.get_logger()
+
+    running_trials = {}
+    n_submitted = 0
+    while n_submitted < n_trials or running_trials:
+        if is_budget_exhausted and is_budget_exhausted():
+            # Let the running trials complete
+            n_trials = n_submitted
+
+        # Fill up the idle workers with new trials
+        while (
+            n_submitted < n_trials
+            and len(running_trials) < scheduler.n_workers
+        ):
+            trial_info = optimizer.ask()
+            future = scheduler.submit(trial_info.config, trial_info.budget)
+            running_trials[future] = trial_info
+            n_submitted += 1
+
+        done, _ = wait(running_trials, return_when=FIRST_COMPLETED)
+        for future in done:
+            trial_info = running_trials.pop(future)
+            try:
+                trial_value = TrialValue(cost=future.result())
+            except Exception as error:
+                # A failed trial must not abort the trials running on the
+                #   other workers
+                logger.info(f"Trial failed: {error!r}")
+                trial_value = TrialValue(
+                    cost=optimizer.scenario.crash_cost,
+                    status=StatusType.CRASHED,
+                )
+            optimizer.tell(trial_info, trial_value)
+
+    return optimizer.intensifier.get_incumbent()
@@ -0,0 +1,327 @@
+"""Warm-starting tuning sessions from the trials of past sessions.
+
+Every session stores the DBMS statistics after running its workload with
+the default configuration. These statistics fingerprint the workload, so the
+past sessions whose fingerprint is closest to the current one are the most
+relevant to warm-start from. The performance of past trials is normalized by
+the default performance of their session.
+"""
+
+import os
+
+import numpy as np
+
+from cybernetics.utils.custom_logging import CUSTOM_LOGGING_INSTANCE
+from cybernetics.utils.trial_store import (
+    DEFAULT_CONFIG,
+    TrialStore,
+    get_target_perf,
+)
+
+
+def get_fingerprint_distance(fingerprint, other) -> float:
+    """Cosine distance of two DBMS statistics fingerprints.
+
+    The statistics are cumulative counters spanning orders of magnitude, so
+    they are compared on a log scale.
+
+    Returns:
+        (float): The distance in [0, 2], or inf if they cannot be compared.
+    """
+
+    if fingerprint is None or other is None or len(fingerprint) != len(other):
+        return np.inf
+
+    x = np.log1p(np.maximum(np.asarray(fingerprint, dtype=float), 0))
+    y = np.log1p(np.maximum(np.asarray(other, dtype=float), 0))
+    norm = np.linalg.norm(x) * np.linalg.norm(y)
+    if norm == 0:
+        return np.inf
+
+    return float(1 - np.dot(x, y) / norm)
+
+
+class WarmStarter:
+    def __init__(
+        self,
+        trial_store_filepaths: list,
+        dbms_name: str,
+        target_metric: str,
+        n_trials: int = 10,
+        max_distance: float = None,
+    ):
+        """
+        Args:
+            trial_store_filepaths (list): Trial stores of past sessions.
+            dbms_name (str): Only trials of this DBMS are used.
+            target_metric (str): The tuned metric.
+            n_trials (int): Maximum number of past trials to warm-start from.
+            max_distance (float): Sessions whose fingerprint is further
+                away are ignored.
+        """
+
+        self.trial_store_filepaths = trial_store_filepaths
+        self.dbms_name = dbms_name
+        self.target_metric = target_metric
+        self.n_trials = n_trials
+        self.max_distance = max_distance
+        self.logger = CUSTOM_LOGGING_INSTANCE.get_logger()
+
+    def load_session(self, trial_store_filepath: str) -> dict:
+        """Load the trials of a past session.
+
+        Returns:
+            (dict): The trials, the fingerprint and the default performance
+                of the session, or None if it has no default trial.
+        """
+
+        # Opening a missing trial store would create an empty one
+        if not os.path.exists(trial_store_filepath):
+            raise FileNotFoundError(
+                f"No trial store at {trial_store_filepath}."
+            )
+
+        # Surrogate sessions only have predicted metrics
+        trial_store = TrialStore(trial_store_filepath)
+        trials = [
+            trial
+            for trial in trial_store.get_trials(
+                dbms_name=self.dbms_name, predicted=False
+            )
+            if trial["target_metric"] == self.target_metric
+            and not trial["early_stopped"]
+        ]
+        trial_store.close()
+
+        default_trials = [
+            trial for trial in trials if trial["dbms_config"] == DEFAULT_CONFIG
+        ]
+        if not default_trials:
+            self.logger.info(
+                f"Skipping {trial_store_filepath} without a default trial."
+            )
+            return None
+
+        default_trial = default_trials[-1]
+        default_perf = get_target_perf(
+            default_trial["performance"], self.target_metric
+        )
+        for trial in trials:
+            trial["normalized_perf"] = (
+                get_target_perf(trial["performance"], self.target_metric)
+                / default_perf
+            )
+
+        return {
+            "filepath": trial_store_filepath,
+            "fingerprint": default_trial["numeric_stats"],
+            "default_perf": default_perf,
+            "trials": [
+                trial for trial in trials
+                if trial["dbms_config"] != DEFAULT_CONFIG
+            ],
+        }
+
+    def get_relevant_sessions(self, fingerprint) -> list:
+        """Get the past sessions ordered by the distance of their
+        fingerprint to the given one."""
+
+        sessions = []
+        for trial_store_filepath in self.trial_store_filepaths:
+            if not os.path.exists(trial_store_filepath):
+                self.logger.info(f"No trial store at {trial_store_filepath}.")
+                continue
+
+            session = self.load_session(trial_store_filepath)
+            if session is None:
+                continue
+
+            session["distance"] = get_fingerprint_distance(
+                fingerprint, session["fingerprint"]
+            )
+            if session["distance"] == np.inf or (
+                self.max_distance is not None
+                and session["distance"] > self.max_distance
+            ):
+                continue
+
+            self.logger.info(
+                f"Warm-start candidate {trial_store_filepath} at distance "
+                f"{session['distance']:.4f}."
+            )
+            sessions.append(session)
+
+        return sorted(sessions, key=lambda session: session["distance"])
+
+    def select_trials(self, fingerprint, default_perf: float) -> list:
+        """Select the best trials of the most relevant past sessions.
+
+        Args:
+            fingerprint (np.ndarray): DBMS statistics of the current session
+                after running the default configuration.
+            default_perf (float): Default performance of the current
+                session, which scales the normalized past performance.
+
+        Returns:
+            (list): Trials with their scaled performance in "perf".
+        """
+
+        minimize = self.target_metric == "latency"
+        selected_trials = []
+        for session in self.get_relevant_sessions(fingerprint):
+            trials = sorted(
+                session["trials"],
+                key=lambda trial: trial["normalized_perf"],
+                reverse=not minimize,
+            )
+            for trial in trials[: self.n_trials - len(selected_trials)]:
+                trial["perf"] = trial["normalized_perf"] * default_perf
+                selected_trials.append(trial)
+
+            if len(selected_trials) >= self.n_trials:
+                break
+
+        return selected_trials
+
+    def select_transitions(self, fingerprint, default_perf: float) -> list:
+        """Select consecutive trials of the most relevant past sessions as
+        transitions for the replay memory of DDPG.
+
+        Returns:
+            (list): (state, dbms config, perf, prev perf, worst perf, next
+                state) with the performance scaled to the current session.
+        """
+
+        transitions = []
+        for session in self.get_relevant_sessions(fingerprint):
+            transitions += self.get_session_transitions(
+                session, default_perf, self.n_trials - len(transitions)
+            )
+            if len(transitions) >= self.n_trials:
+                break
+
+        return transitions
+
+    def get_session_transitions(self, session: dict, default_perf: float,
+                                n_transitions: int = None) -> list:
+        """Chain the consecutive trials of a past session into transitions.
+
+        Args:
+            session (dict): Session from load_session().
+            default_perf (float): Default performance the normalized
+                performance of the session is scaled by.
+            n_transitions (int): Maximum number of transitions.
+
+        Returns:
+            (list): (state, dbms config, perf, prev perf, worst perf, next
+                state), where the worst performance of the session so far
+                includes the trial, like online.
+        """
+
+        minimize = self.target_metric == "latency"
+        transitions = []
+        # The default trial starts every session
+        prev_numeric_stats = session["fingerprint"]
+        prev_perf = default_perf
+        worst_perf = None
+        for trial in session["trials"]:
+            if n_transitions is not None and len(transitions) >= n_transitions:
+                break
+            if trial["numeric_stats"] is None:
+                continue
+
+            perf = trial["normalized_perf"] * default_perf
+            if worst_perf is None:
+                worst_perf = perf
+            elif minimize:
+                worst_perf = max(worst_perf, perf)
+            else:
+                worst_perf = min(worst_perf, perf)
+            transitions.append((
+                prev_numeric_stats,
+                trial["dbms_config"],
+                perf,
+                prev_perf,
+                worst_perf,
+                trial["numeric_stats"],
+            ))
+            prev_numeric_stats = trial["numeric_stats"]
+            prev_perf = perf
+
+        return transitions
+
+
+def get_n_warm_start_trials(config) -> int:
+    """Maximum number of past trials to warm-start from, which are told to
+    the optimizer on top of the trials of the tuning budget."""
+
+    if "warm_start" not in config:
+        return 0
+
+    return int(config["warm_start"].get("n_trials", 10))
+
+
+def get_warm_starter(config):
+    """Create the warm starter in the [warm_start] section of the config, or
+    None if warm-starting is not configured, e.g.:
+
+        [warm_start]
+        trial_stores=/exps/tpcc/trials.sqlite,/exps/tpch/trials.sqlite
+        n_trials=10
+    """
+
+    if "warm_start" not in config:
+        return None
+
+    section = config["warm_start"]
+    trial_store_filepaths = [
+        filepath.strip() for filepath in section["trial_stores"].split(",")
+    ]
+    max_distance = section.get("max_distance")
+
+    return WarmStarter(
+        trial_store_filepaths,
+        config["dbms_info"]["dbms_name"],
+        config["config_optimizer"]["target_metric"],
+        n_trials=get_n_warm_start_trials(config),
+        max_distance=float(max_distance) if max_distance else None,
+    )
+
+
+def seed_smac_runhistory(optimizer, dbms_config_space, trials: list,
+                         target_metric: str, seed: int) -> int:
+    """Tell a SMAC optimizer the results of past trials.
+
+    Returns:
+        (int): Number of past trials in the configuration space.
+    """
+
+    from ConfigSpace import Configuration
+    from smac.runhistory.dataclasses import TrialInfo, TrialValue
+
+    n_seeded = 0
+    for trial in trials:
+        values = {
+            knob: value for knob, value in trial["dbms_config"].items()
+            if knob in dbms_config_space
+        }
+        try:
+            dbms_config = Configuration(dbms_config_space, values=values)
+        except (KeyError, TypeError, ValueError):
+            # The knob spaces of the sessions differ
+            continue
+
+        cost = trial["perf"]
+        if target_metric == "throughput":
+            cost = -cost
+        optimizer.tell(
+            TrialInfo(
+                config=dbms_config,
+                seed=seed,
+                budget=optimizer.scenario.max_budget,
+            ),
+            TrialValue(cost=cost),
+        )
+        n_seeded += 1
+
+    return n_seeded
@@ -0,0 +1,61 @@
+"""Crash-safe checkpoints of a tuning session."""
+
+import os
+import pickle
+import tempfile
+
+
+CHECKPOINT_FILENAME = "checkpoint.pkl"
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(state: dict, filepath: str) -> None:
+    """Atomically write a checkpoint, so a crash while writing never leaves
+    a truncated checkpoint behind.
+
+    Args:
+        state (dict): The picklable state to checkpoint.
+        filepath (str): Path to the checkpoint.
+    """
+
+    checkpoint_dir = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    fd, tmp_filepath = tempfile.mkstemp(dir=checkpoint_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(
+                {"version": CHECKPOINT_VERSION, "state": state},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Replacing a file is atomic on POSIX
+        os.replace(tmp_filepath, filepath)
+    except BaseException:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+        raise
+
+
+def load_checkpoint(filepath: str) -> dict:
+    """Load a checkpoint.
+
+    Returns:
+        (dict): The checkpointed state, or None if there is no checkpoint.
+    """
+
+    if not os.path.exists(filepath):
+        return None
+
+    with open(filepath, "rb") as f:
+        checkpoint = pickle.load(f)
+
+    if checkpoint["version"] != CHECKPOINT_VERSION:
+        raise ValueError(
+            f"Unsupported checkpoint version: {checkpoint['version']}"
+        )
+
+    return checkpoint["state"]
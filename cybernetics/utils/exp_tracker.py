@@ -5,11 +5,13 @@ This module is adapted from Llamatune's run-smac.py
 
 import os
 
-from cybernetics.utils.util import create_dir
+from cybernetics.utils.checkpoint import CHECKPOINT_FILENAME
 
 
 class ExperimentState:
-    def __init__(self, dbms_info: dict, workload_info: dict, target_metric: str, results_path: str):
+    def __init__(self, dbms_info: dict, workload_info: dict,
+                 target_metric: str, results_path: str,
+                 resume: bool = False):
         self.iter = 0
         self.default_perf = None
         self.best_perf = None
@@ -24,7 +26,16 @@ class ExperimentState:
         self._dbms_info = dbms_info
         self._workload_info = workload_info
 
-        create_dir(results_path, force=True)
+        self._results_path = results_path
+
+        # Never wipe the results of a previous session, which may be resumed
+        checkpoint_filepath = os.path.join(results_path, CHECKPOINT_FILENAME)
+        if not resume and os.path.exists(checkpoint_filepath):
+            raise ValueError(
+                f"Found a previous session in {results_path}. Resume it or "
+                "remove the directory."
+            )
+        os.makedirs(results_path, exist_ok=True)
 
         # if not os.path.exists(results_path):
         # create_dir(results_path, force=False)
@@ -49,6 +60,24 @@ class ExperimentState:
     def target_metric(self) -> str:
         return self._target_metric
 
+    def get_state(self) -> dict:
+        """Get the tracked results, e.g., for checkpointing."""
+
+        return {
+            "iter": self.iter,
+            "default_perf": self.default_perf,
+            "best_perf": self.best_perf,
+            "worst_perf": self.worst_perf,
+            "best_config": self.best_config,
+            "worst_config": getattr(self, "worst_config", None),
+        }
+
+    def set_state(self, state: dict) -> None:
+        """Restore the tracked results from get_state()."""
+
+        for key, value in state.items():
+            setattr(self, key, value)
+
     # def is_better_perf(self, perf, other):
     #     return (perf > other) if not self.minimize else (perf < other)
 
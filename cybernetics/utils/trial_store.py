@@ -0,0 +1,286 @@
+"""Persistent store of evaluated trials.
+
+Trials are kept in a SQLite database in the results directory, keyed by
+their canonicalized DBMS configuration so that re-proposed configurations
+can be looked up instead of re-evaluated.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+TRIAL_STORE_FILENAME = "trials.sqlite"
+
+# An empty configuration stands for the default configuration
+DEFAULT_CONFIG = {}
+
+CREATE_TRIALS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS trials (
+    trial_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    config_key TEXT NOT NULL,
+    dbms_config TEXT NOT NULL,
+    dbms_name TEXT NOT NULL,
+    workload TEXT NOT NULL,
+    target_metric TEXT NOT NULL,
+    budget REAL,
+    early_stopped INTEGER NOT NULL,
+    performance TEXT NOT NULL,
+    numeric_stats TEXT,
+    timings TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    run TEXT,
+    predicted INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# Columns added after the first version of the table, with their types
+ADDED_COLUMNS = {
+    # The workload run of the trial, i.e., its id and result files
+    "run": "TEXT",
+    # Whether a surrogate predicted the metrics instead of a measured run
+    "predicted": "INTEGER NOT NULL DEFAULT 0",
+}
+
+CREATE_CONFIG_KEY_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS trials_config_key
+ON trials (config_key, dbms_name, workload)
+"""
+
+
+def _to_builtin(value):
+    # Knob values may be numpy scalars, e.g., after unprojecting a point
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {k: _to_builtin(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+
+    return value
+
+
+def canonicalize_config(dbms_config) -> dict:
+    """Canonicalize a DBMS configuration, i.e., knob name -> built-in value
+    sorted by knob name.
+
+    Args:
+        dbms_config (dict or Configuration): The DBMS configuration.
+
+    Returns:
+        (dict): The canonical configuration.
+    """
+
+    return {
+        knob: _to_builtin(dbms_config[knob]) for knob in sorted(dbms_config)
+    }
+
+
+def get_target_perf(performance: dict, target_metric: str) -> float:
+    """Get the tuned metric from the workload metrics."""
+
+    if target_metric == "throughput":
+        return performance["Throughput (requests/second)"]
+    elif target_metric == "latency":
+        return performance["Latency Distribution"][
+            "95th Percentile Latency (microseconds)"
+        ]
+    else:
+        raise ValueError(f"Unsupported target metric: {target_metric}")
+
+
+def get_config_key(dbms_config) -> str:
+    """Hash the canonical form of a DBMS configuration."""
+
+    canonical_config = json.dumps(
+        canonicalize_config(dbms_config), separators=(",", ":")
+    )
+
+    return hashlib.sha1(canonical_config.encode()).hexdigest()
+
+
+class TrialStore:
+    def __init__(self, db_filepath: str) -> None:
+        self.db_filepath = db_filepath
+
+        # Trials may be written by several workers in parallel
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_filepath, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute(CREATE_TRIALS_TABLE_SQL)
+            self.conn.execute(CREATE_CONFIG_KEY_INDEX_SQL)
+            self._add_missing_columns()
+
+    def _add_missing_columns(self) -> None:
+        # Trial stores of past sessions may predate some columns
+        columns = {
+            row["name"]
+            for row in self.conn.execute("PRAGMA table_info(trials)")
+        }
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in columns:
+                self.conn.execute(
+                    f"ALTER TABLE trials ADD COLUMN {column} {column_type}"
+                )
+
+    def add_trial(
+        self,
+        dbms_config,
+        dbms_name: str,
+        workload: str,
+        target_metric: str,
+        performance: dict,
+        numeric_stats=None,
+        timings: dict = None,
+        budget: float = None,
+        run: dict = None,
+        predicted: bool = False,
+    ) -> int:
+        """Store an evaluated trial.
+
+        Args:
+            dbms_config (dict or Configuration): The DBMS configuration.
+            dbms_name (str): The DBMS, e.g., postgres.
+            workload (str): The workload, e.g., tpcc.
+            target_metric (str): The tuned metric.
+            performance (dict): The workload metrics, e.g., the BenchBase
+                summary.
+            numeric_stats (list): The DBMS statistics after the workload.
+            timings (dict): The timing breakdown of the trial.
+            budget (float): The budget of a multi-fidelity trial.
+            run (dict): The workload run, e.g., the BenchBase run id and
+                result files.
+            predicted (bool): Whether a surrogate predicted the metrics.
+
+        Returns:
+            (int): The id of the trial.
+        """
+
+        timings = timings or {}
+        row = (
+            get_config_key(dbms_config),
+            json.dumps(canonicalize_config(dbms_config)),
+            dbms_name,
+            workload,
+            target_metric,
+            budget,
+            int(bool(timings.get("early_stopped", False))),
+            json.dumps(_to_builtin(performance)),
+            (
+                json.dumps(_to_builtin(numeric_stats))
+                if numeric_stats is not None
+                else None
+            ),
+            json.dumps(_to_builtin(timings)),
+            time.time(),
+            json.dumps(_to_builtin(run)) if run is not None else None,
+            int(predicted),
+        )
+
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO trials (config_key, dbms_config, dbms_name, "
+                "workload, target_metric, budget, early_stopped, performance, "
+                "numeric_stats, timings, created_at, run, predicted) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+
+        return cursor.lastrowid
+
+    @staticmethod
+    def _parse_row(row) -> dict:
+        trial = dict(row)
+        for key in ["dbms_config", "performance", "numeric_stats", "timings",
+                    "run"]:
+            if trial[key] is not None:
+                trial[key] = json.loads(trial[key])
+        trial["early_stopped"] = bool(trial["early_stopped"])
+        trial["predicted"] = bool(trial["predicted"])
+        # Same type as returned by the DBMS wrapper
+        if trial["numeric_stats"] is not None:
+            trial["numeric_stats"] = np.array(trial["numeric_stats"])
+
+        return trial
+
+    def get_cached_trial(
+        self,
+        dbms_config,
+        dbms_name: str,
+        workload: str,
+        budget: float = None,
+        with_stats: bool = False,
+        predicted: bool = False,
+    ) -> dict:
+        """Look up the latest complete trial of the same canonical
+        configuration, workload and budget.
+
+        Args:
+            with_stats (bool): Only return trials with DBMS statistics.
+            predicted (bool): Look up predicted instead of measured trials.
+
+        Returns:
+            (dict): The stored trial, or None if there is none.
+        """
+
+        # Early-stopped trials only have extrapolated metrics
+        sql = (
+            "SELECT * FROM trials WHERE config_key = ? AND dbms_name = ? "
+            "AND workload = ? AND budget IS ? AND early_stopped = 0 "
+            "AND predicted = ?"
+        )
+        if with_stats:
+            sql += " AND numeric_stats IS NOT NULL"
+        sql += " ORDER BY trial_id DESC LIMIT 1"
+
+        with self.lock:
+            row = self.conn.execute(
+                sql,
+                (
+                    get_config_key(dbms_config),
+                    dbms_name,
+                    workload,
+                    budget,
+                    int(predicted),
+                ),
+            ).fetchone()
+
+        return self._parse_row(row) if row is not None else None
+
+    def get_trials(
+        self,
+        dbms_name: str = None,
+        workload: str = None,
+        predicted: bool = None,
+    ) -> list:
+        """Get all stored trials in insertion order, optionally of one DBMS
+        and workload, and only predicted or measured ones."""
+
+        sql = "SELECT * FROM trials WHERE 1 = 1"
+        params = []
+        if predicted is not None:
+            sql += " AND predicted = ?"
+            params.append(int(predicted))
+        if dbms_name is not None:
+            sql += " AND dbms_name = ?"
+            params.append(dbms_name)
+        if workload is not None:
+            sql += " AND workload = ?"
+            params.append(workload)
+        sql += " ORDER BY trial_id"
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+
+        return [self._parse_row(row) for row in rows]
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
@@ -47,6 +47,45 @@ def fix_global_random_state(seed: int):
     np.random.seed(seed)
 
 
+def get_global_random_state() -> dict:
+    """Get the state of the global random number generators, e.g., to
+    checkpoint a tuning session.
+
+    Returns:
+        (dict): The state of every random number generator.
+    """
+
+    random_state = {
+        "random": random.getstate(),
+        "numpy": np.random.get_state(),
+    }
+
+    try:
+        import torch
+
+        random_state["torch"] = torch.get_rng_state()
+    except ImportError:
+        pass
+
+    return random_state
+
+
+def set_global_random_state(random_state: dict):
+    """Restore the state of the global random number generators.
+
+    Args:
+        random_state (dict): The state from get_global_random_state().
+    """
+
+    random.setstate(random_state["random"])
+    np.random.set_state(random_state["numpy"])
+
+    if "torch" in random_state:
+        import torch
+
+        torch.set_rng_state(random_state["torch"])
+
+
 def parse_config(config_path: str) -> ConfigParser:
     """Parse a configuration file.
 
@@ -1,10 +1,49 @@
+import json
 import os
+import re
 import subprocess
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+from collections import deque
 
 from cybernetics.utils.custom_logging import CUSTOM_LOGGING_INSTANCE
 
 
 TIMEOUT = 36000  # 1 hour
+MONITOR_INTERVAL = 5000  # 5 seconds
+OUTPUT_TAIL_LINES = 100
+RUN_INDEX_FILENAME = "benchbase_runs.jsonl"
+
+# Result files written by BenchBase into the output directory of a run
+RESULT_FILE_SUFFIXES = {
+    "summary": ".summary.json",
+    "raw": ".raw.csv",
+    "results": ".results.csv",
+    "config": ".config.xml",
+}
+
+# Per-window metrics printed by BenchBase's interval monitor (-im)
+SAMPLE_PATTERNS = {
+    "throughput": re.compile(r"Throughput: ([\d.]+) txn/sec"),
+}
+
+
+def parse_sample(line: str) -> dict:
+    """Parse the per-window metrics in a line of BenchBase output.
+
+    Returns:
+        (dict): Metric name -> value, or None if the line has no metrics.
+    """
+
+    sample = {}
+    for metric, pattern in SAMPLE_PATTERNS.items():
+        match = pattern.search(line)
+        if match:
+            sample[metric] = float(match.group(1))
+
+    return sample or None
 
 
 class BenchBaseWrapper:
@@ -14,104 +53,335 @@ class BenchBaseWrapper:
         dbms_name: str,
         workload: str,
         results_save_dir: str = None,
+        monitor_interval: int = MONITOR_INTERVAL,
+        db_port: int = None,
     ) -> None:
         self.target_dir = target_dir
         self.dbms_name = dbms_name
         self.workload = workload
         self.results_save_dir = results_save_dir
+        self.monitor_interval = monitor_interval
+        # Port overriding the database URL of the workload config, e.g., for
+        #   one of several DBMS instances tuned in parallel
+        self.db_port = db_port
+        # Execution time (seconds) overriding the workload config, if any
+        self.duration = None
 
         self.first_run = True
         self.logger = CUSTOM_LOGGING_INSTANCE.get_logger()
 
-    def run(self) -> None:
+        # Every run writes into its own output directory and is recorded in
+        #   an on-disk index (run id -> result files), loaded on the first run
+        self.results_dir = results_save_dir or os.path.join(
+            target_dir, "results"
+        )
+        self.index_filepath = os.path.join(
+            self.results_dir, RUN_INDEX_FILENAME
+        )
+        self.run_index = None
+        self.run_id = None
+        self.run_results_dir = None
+        self.last_result_files = None
+
+        # Per-window samples and status of the latest run, kept even if the
+        #   run times out or crashes
+        self.samples = []
+        self.samples_filepath = None
+        self.returncode = None
+        self.timed_out = False
+
+    def set_duration(self, duration: int = None) -> None:
+        """Override the execution time of the workload, e.g., for short
+        low-fidelity runs. None restores the original workload config.
+
+        Args:
+            duration (int): Execution time in seconds of every work phase.
+        """
+
+        self.duration = duration
+
+    def get_data_identity(self) -> str:
+        """Identify the data loaded by the workload, i.e., the benchmark and
+        its scale factor."""
+
+        workload_config_path = os.path.join(
+            self.target_dir,
+            f"config/{self.dbms_name}/sample_{self.workload}_config.xml",
+        )
+        scale_factor = None
+        if os.path.exists(workload_config_path):
+            scale_factor = ET.parse(workload_config_path).getroot().findtext(
+                "scalefactor"
+            )
+
+        return (
+            f"{self.dbms_name}/{self.workload}/scalefactor={scale_factor}"
+        )
+
+    def _write_workload_config(
+        self, workload_config_path: str, execute: bool
+    ) -> str:
+        tree = ET.parse(os.path.join(self.target_dir, workload_config_path))
+        suffix = ""
+
+        if self.db_port is not None:
+            url_element = tree.getroot().find("url")
+            if url_element is None:
+                self.logger.info(
+                    "No database URL in the workload config to override."
+                )
+            else:
+                url_element.text = re.sub(
+                    r":\d+/", f":{self.db_port}/", url_element.text, count=1
+                )
+                suffix += f"_port{self.db_port}"
+
+        if execute and self.duration is not None:
+            time_elements = tree.getroot().findall("./works/work/time")
+            if not time_elements:
+                self.logger.info(
+                    "No execution time in the workload config to override."
+                )
+
+            for time_element in time_elements:
+                time_element.text = str(self.duration)
+            if time_elements:
+                suffix += f"_{self.duration}s"
+
+        if not suffix:
+            return workload_config_path
+
+        overridden_config_path = workload_config_path.replace(
+            ".xml", f"{suffix}.xml"
+        )
+        tree.write(os.path.join(self.target_dir, overridden_config_path))
+
+        return overridden_config_path
+
+    def _get_payload(self, create: bool, load: bool, execute: bool) -> list:
         workload_config_path = (
             f"./config/{self.dbms_name}/sample_{self.workload}_config.xml"
         )
+        if self.db_port is not None or (
+            execute and self.duration is not None
+        ):
+            workload_config_path = self._write_workload_config(
+                workload_config_path, execute
+            )
+
+        payload = [
+            "java",
+            "-jar",
+            "benchbase.jar",
+            "-b",
+            self.workload,
+            "-c",
+            workload_config_path,
+        ]
+
+        # Save the results of a run to its own directory
+        if execute and self.run_results_dir:
+            payload += ["-d", self.run_results_dir]
+        elif self.results_save_dir:
+            payload += ["-d", self.results_save_dir]
+
+        if execute and self.monitor_interval:
+            payload += ["-im", str(self.monitor_interval)]
+
+        payload += [
+            f"--create={str(create).lower()}",
+            f"--load={str(load).lower()}",
+            f"--execute={str(execute).lower()}",
+        ]
+
+        return payload
+
+    def load(self) -> bool:
+        """Create and load the database without running the workload."""
+
+        payload = self._get_payload(create=True, load=True, execute=False)
+        for _ in self.stream(payload):
+            pass
+
+        if self.returncode == 0:
+            self.first_run = False
+
+        return self.returncode == 0
 
+    def _get_run_payload(self) -> list:
         # Load data in the first run
         if self.first_run:
-            # Changing the current working directory may have a side effect
-            os.chdir(self.target_dir)
-
-            # Save the results to a specified directory
-            if self.results_save_dir:
-                payload = [
-                    "java",
-                    "-jar",
-                    "benchbase.jar",
-                    "-b",
-                    self.workload,
-                    "-c",
-                    workload_config_path,
-                    "-d",
-                    self.results_save_dir,
-                    "--create=true",
-                    "--load=true",
-                    "--execute=true",
-                ]
-            # Save the results to the BenchBase default directory
-            else:
-                payload = [
-                    "java",
-                    "-jar",
-                    "benchbase.jar",
-                    "-b",
-                    self.workload,
-                    "-c",
-                    workload_config_path,
-                    "--create=true",
-                    "--load=true",
-                    "--execute=true",
-                ]
-
+            payload = self._get_payload(create=True, load=True, execute=True)
             self.first_run = False
         # Skip loading data in the subsequent runs
         else:
-            if self.results_save_dir:
-                payload = [
-                    "java",
-                    "-jar",
-                    "benchbase.jar",
-                    "-b",
-                    self.workload,
-                    "-c",
-                    workload_config_path,
-                    "-d",
-                    self.results_save_dir,
-                    "--create=false",
-                    "--load=false",
-                    "--execute=true",
-                ]
-            else:
-                payload = [
-                    "java",
-                    "-jar",
-                    "benchbase.jar",
-                    "-b",
-                    self.workload,
-                    "-c",
-                    workload_config_path,
-                    "--create=false",
-                    "--load=false",
-                    "--execute=true",
-                ]
+            payload = self._get_payload(create=False, load=False, execute=True)
+
+        return payload
+
+    def _load_run_index(self) -> dict:
+        run_index = {}
+        if os.path.exists(self.index_filepath):
+            with open(self.index_filepath, "r") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    run_index[entry["run_id"]] = entry
+
+        return run_index
+
+    def _start_run(self) -> None:
+        if self.run_index is None:
+            self.run_index = self._load_run_index()
+
+        self.run_id = len(self.run_index) + 1
+        self.run_results_dir = os.path.join(
+            self.results_dir, f"run_{self.run_id}"
+        )
+        os.makedirs(self.run_results_dir, exist_ok=True)
+        self.samples_filepath = os.path.join(
+            self.run_results_dir, "cybernetics.samples.jsonl"
+        )
+
+    def _finish_run(self) -> None:
+        result_files = {key: None for key in RESULT_FILE_SUFFIXES}
+        for filename in os.listdir(self.run_results_dir):
+            for key, suffix in RESULT_FILE_SUFFIXES.items():
+                if filename.endswith(suffix):
+                    result_files[key] = os.path.join(
+                        self.run_results_dir, filename
+                    )
+        result_files["samples"] = self.samples_filepath
+
+        entry = {
+            "run_id": self.run_id,
+            "results_dir": self.run_results_dir,
+            "returncode": self.returncode,
+            "timed_out": self.timed_out,
+            **result_files,
+        }
+        self.run_index[self.run_id] = entry
+        self.last_result_files = result_files
+
+        with open(self.index_filepath, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def get_run(self, run_id: int) -> dict:
+        """Look up the result files of a run in the run index."""
+
+        if self.run_index is None:
+            self.run_index = self._load_run_index()
+
+        return self.run_index.get(run_id)
+
+    def get_last_run(self) -> dict:
+        """Look up the run id and result files of the latest run."""
+
+        if self.run_id is None:
+            return None
+
+        return self.get_run(self.run_id)
 
+    def iter_run(self):
+        """Run the workload and yield per-window samples as they arrive."""
+
+        self._start_run()
+        try:
+            yield from self.stream(
+                self._get_run_payload(), self.samples_filepath
+            )
+        finally:
+            # Also index runs that are stopped early or fail
+            self._finish_run()
+
+    def run(self, callback=None) -> bool:
+        """Run the workload.
+
+        Args:
+            callback (callable): Called with every per-window sample as soon
+                as it is parsed.
+
+        Returns:
+            (bool): Whether the workload finished successfully.
+        """
+
+        for sample in self.iter_run():
+            if callback:
+                callback(sample)
+
+        return self.returncode == 0
+
+    def stream(self, payload: list, samples_filepath: str = None):
+        """Run BenchBase and consume its output line by line with bounded
+        memory, yielding per-window samples as they arrive.
+
+        Args:
+            payload (list): The command to run.
+            samples_filepath (str): Optional file to which samples are
+                appended as soon as they are parsed.
+        """
+
+        self.samples = []
+        self.returncode = None
+        self.timed_out = False
+        output_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+
+        samples_file = None
+        if samples_filepath:
+            samples_file = open(samples_filepath, "w")
         workload_process = subprocess.Popen(
             payload,
-            stderr=subprocess.PIPE,
+            # Workers running in parallel must not change the process-wide
+            #   working directory
+            cwd=self.target_dir,
+            stderr=subprocess.STDOUT,
             stdout=subprocess.PIPE,
             close_fds=True,
+            text=True,
+            bufsize=1,
         )
 
+        def kill_on_timeout():
+            self.timed_out = True
+            workload_process.kill()
+
+        timer = threading.Timer(TIMEOUT, kill_on_timeout)
+        timer.start()
+        beg_time = time.time()
+
         try:
-            # communicate() will block the program until the subprocess finishes
-            stdout, stderr = workload_process.communicate(timeout=TIMEOUT)
+            for line in workload_process.stdout:
+                line = line.rstrip("\n")
+                output_tail.append(line)
+                self.logger.info(f"BenchBase: {line}")
 
-            if workload_process.returncode == 0:
-                self.logger.info("Finish running workload.")
-                self.logger.info(f"Subprocess output: \n{stdout.decode()}")
-            else:
-                self.logger.info("Error when running workload.")
-                self.logger.info(f"Subprocess output: \n{stderr.decode()}")
-        except subprocess.TimeoutExpired:
+                sample = parse_sample(line)
+                if sample is None:
+                    continue
+
+                sample["time"] = time.time() - beg_time
+                self.samples.append(sample)
+                if samples_file:
+                    samples_file.write(json.dumps(sample) + "\n")
+                    samples_file.flush()
+
+                yield sample
+        finally:
+            # Also reached if the consumer stops iterating early
+            timer.cancel()
+            if workload_process.poll() is None:
+                workload_process.kill()
+            workload_process.stdout.close()
+            self.returncode = workload_process.wait()
+
+            if samples_file:
+                samples_file.close()
+
+        if self.timed_out:
             self.logger.info("Timeout when running workload.")
+        elif self.returncode == 0:
+            self.logger.info("Finish running workload.")
+        else:
+            self.logger.info("Error when running workload.")
+            self.logger.info(
+                "Subprocess output (tail): \n" + "\n".join(output_tail)
+            )
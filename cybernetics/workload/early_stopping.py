@@ -0,0 +1,113 @@
+"""Policies for stopping workload runs that clearly cannot beat the
+incumbent configuration, based on the per-window samples streamed by the
+workload wrapper.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class EarlyStoppingPolicy(ABC):
+    def __init__(self, metric: str = "throughput"):
+        # Only throughput is reported per window by BenchBase
+        self.metric = metric
+
+    @abstractmethod
+    def should_stop(self, samples: list, incumbent: float) -> bool:
+        """Decide whether a running trial cannot beat the incumbent.
+
+        Args:
+            samples (list): Per-window samples observed so far.
+            incumbent (float): Performance of the incumbent configuration.
+
+        Returns:
+            (bool): Whether to stop the trial.
+        """
+        pass
+
+    @abstractmethod
+    def estimate(self, samples: list) -> float:
+        """Extrapolate the performance of a stopped trial from its samples."""
+        pass
+
+
+class ConfidenceBoundEarlyStopping(EarlyStoppingPolicy):
+    """Stop a trial once the upper confidence bound of its mean throughput
+    falls below the incumbent.
+    """
+
+    def __init__(
+        self,
+        warmup_time: float = 30,
+        min_samples: int = 3,
+        z: float = 2.0,
+        tolerance: float = 0,
+        metric: str = "throughput",
+    ):
+        """
+        Args:
+            warmup_time (float): Samples in the first seconds of a run are
+                ignored.
+            min_samples (int): Minimum number of samples after the warmup
+                before a trial can be stopped.
+            z (float): Width of the confidence bound in standard errors.
+            tolerance (float): Only stop if the bound is more than this
+                fraction below the incumbent.
+        """
+
+        super().__init__(metric)
+        self.warmup_time = warmup_time
+        self.min_samples = min_samples
+        self.z = z
+        self.tolerance = tolerance
+
+    def _get_values(self, samples: list) -> np.ndarray:
+        return np.array([
+            sample[self.metric] for sample in samples
+            if sample["time"] >= self.warmup_time and self.metric in sample
+        ])
+
+    def should_stop(self, samples: list, incumbent: float) -> bool:
+        values = self._get_values(samples)
+        if incumbent is None or len(values) < max(self.min_samples, 2):
+            return False
+
+        std_err = values.std(ddof=1) / np.sqrt(len(values))
+        upper_bound = values.mean() + self.z * std_err
+
+        return upper_bound < incumbent * (1 - self.tolerance)
+
+    def estimate(self, samples: list) -> float:
+        values = self._get_values(samples)
+        if len(values) == 0:
+            values = np.array([
+                sample[self.metric] for sample in samples
+                if self.metric in sample
+            ])
+
+        return float(values.mean()) if len(values) > 0 else 0.0
+
+
+def get_early_stopping_policy(config):
+    """Create the early stopping policy in the [early_stopping] section of
+    the config, or None if early stopping is not configured.
+    """
+
+    if "early_stopping" not in config:
+        return None
+
+    section = config["early_stopping"]
+    policy = section.get("policy", "confidence_bound")
+
+    if policy == "confidence_bound":
+        return ConfidenceBoundEarlyStopping(
+            warmup_time=float(section.get("warmup_time", 30)),
+            min_samples=int(section.get("min_samples", 3)),
+            z=float(section.get("z", 2.0)),
+            tolerance=float(section.get("tolerance", 0)),
+        )
+    elif policy == "none":
+        return None
+    else:
+        raise ValueError(f"Early stopping policy {policy} not supported.")
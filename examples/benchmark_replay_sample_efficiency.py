@@ -0,0 +1,108 @@
+"""Compare the sample efficiency of DDPG with uniform replay, prioritized
+replay without importance-sampling weights and prioritized replay with
+importance-sampling weights.
+
+The synthetic environment mimics configuration tuning: a state stands for
+the DBMS statistics, an action for a configuration in [0, 1], and the reward
+is highest when the action matches an unknown optimal configuration of the
+state. Every variant gets the same number of (expensive) samples, and the
+reward of its policy without exploration noise is reported.
+"""
+
+import argparse
+
+import numpy as np
+import torch
+
+from cybernetics.tuning.ddpg.model import DDPG
+from cybernetics.utils.util import fix_global_random_state
+
+
+REPLAY_VARIANTS = {
+    "uniform": {"alpha": 0, "use_is_weights": False},
+    "per": {"alpha": 0.6, "use_is_weights": False},
+    "per_is": {"alpha": 0.6, "use_is_weights": True},
+}
+
+
+class SyntheticTuningEnv:
+    def __init__(self, n_states: int, n_actions: int, seed: int):
+        rng = np.random.RandomState(seed)
+        self.n_states = n_states
+        self.weights = rng.normal(size=(n_states, n_actions))
+        self.rng = rng
+
+    def get_optimal_action(self, states):
+        return 1 / (1 + np.exp(-states @ self.weights))
+
+    def sample_states(self, n: int = None):
+        size = (n, self.n_states) if n else self.n_states
+        return self.rng.uniform(-1, 1, size=size).astype(np.float32)
+
+    def get_reward(self, state, action) -> float:
+        return -float(np.sum((action - self.get_optimal_action(state)) ** 2))
+
+
+def evaluate_policy(model, env, states) -> float:
+    # Scored in eval mode, so evaluating neither adds dropout noise nor
+    #   updates the batch norm statistics of the trained actor
+    actions = model.predict_action(states)
+
+    return float(np.mean([
+        env.get_reward(state, action) for state, action in zip(states,
+                                                               actions)
+    ]))
+
+
+def run_variant(variant: str, n_samples: int, n_epochs: int, seed: int,
+                n_states: int = 8, n_actions: int = 4) -> list:
+    """Train DDPG on the synthetic environment.
+
+    Returns:
+        (list): Reward of the policy after every sample.
+    """
+
+    fix_global_random_state(seed)
+    torch.manual_seed(seed)
+    env = SyntheticTuningEnv(n_states, n_actions, seed)
+    eval_states = env.sample_states(256)
+    model = DDPG(n_states, n_actions, batch_size=16,
+                 **REPLAY_VARIANTS[variant])
+
+    rewards = []
+    state = env.sample_states()
+    for _ in range(n_samples):
+        action = model.choose_action(state)
+        reward = env.get_reward(state, action)
+        next_state = env.sample_states()
+        model.add_sample(state, action, reward, next_state)
+        state = next_state
+
+        if len(model.replay_memory) >= model.batch_size:
+            for _ in range(n_epochs):
+                model.update()
+        rewards.append(evaluate_policy(model, env, eval_states))
+
+    return rewards
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n_samples", type=int, default=200)
+    parser.add_argument("--n_epochs", type=int, default=2)
+    parser.add_argument("--n_seeds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'replay':<10}{'final reward':>16}{'mean reward':>16}")
+    for variant in REPLAY_VARIANTS:
+        curves = np.array([
+            run_variant(variant, args.n_samples, args.n_epochs, seed)
+            for seed in range(args.n_seeds)
+        ])
+        final_rewards = curves[:, -1]
+        # The mean reward over all samples is the area under the curve
+        print(
+            f"{variant:<10}"
+            f"{final_rewards.mean():>10.4f} ± {final_rewards.std():.3f}"
+            f"{curves.mean():>16.4f}"
+        )
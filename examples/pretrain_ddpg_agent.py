@@ -0,0 +1,89 @@
+"""Pre-train the DDPG agent of a tuning config on the trials of past
+sessions, without evaluating any configuration.
+
+The saved agent is fine-tuned online by setting
+pretrained_agent=<output_dir> in the [config_optimizer] section.
+"""
+
+import argparse
+import os
+
+from cybernetics.knobs.generate_space import KnobSpaceGenerator
+from cybernetics.tuning.ddpg.agent_snapshot import AGENT_DIRNAME
+from cybernetics.tuning.ddpg.offline_training import (
+    load_offline_transitions,
+    pretrain_agent,
+)
+from cybernetics.utils.util import fix_global_random_state, parse_config
+
+
+if __name__ == "__main__":
+    # Parsing command line arguments
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--config_path",
+        type=str,
+        required=True,
+        help="Path to the configuration file",
+    )
+    parser.add_argument(
+        "--trial_stores",
+        type=str,
+        required=True,
+        help="Comma-separated trial stores of past sessions",
+    )
+    parser.add_argument(
+        "--n_updates",
+        type=int,
+        default=10000,
+        help="Number of DDPG updates",
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default=None,
+        help="Directory of the pre-trained agent, by default in the save "
+        "path of the config",
+    )
+
+    args = parser.parse_args()
+
+    # Parse configuration
+    config = parse_config(args.config_path)
+
+    # Set global random state
+    fix_global_random_state(int(config["knob_space"]["random_seed"]))
+
+    # Init DBMS config space
+    dbms_config_space_generator = KnobSpaceGenerator(
+        config["knob_space"]["knob_spec"],
+        int(config["knob_space"]["random_seed"]),
+    )
+    dbms_config_space = dbms_config_space_generator.generate_input_space(
+        ignored_knobs=[]
+    )
+
+    # DDPG Model
+    if config["config_optimizer"]["optimizer"].startswith("liquid"):
+        from cybernetics.tuning.ddpg.liquid_model import DDPG
+    else:
+        from cybernetics.tuning.ddpg.model import DDPG
+
+    n_states = int(config["dbms_info"]["n_numeric_stats"])
+    model = DDPG(n_states, len(dbms_config_space), model_name="ddpg_model")
+
+    transitions = load_offline_transitions(
+        [filepath.strip() for filepath in args.trial_stores.split(",")],
+        config["dbms_info"]["dbms_name"],
+        config["config_optimizer"]["target_metric"],
+        dbms_config_space,
+        n_states,
+    )
+    pretrain_agent(model, transitions, args.n_updates)
+
+    output_dir = args.output_dir or os.path.join(
+        config["results"]["save_path"], AGENT_DIRNAME
+    )
+    model.save(output_dir)
+    print(f"Saved the pre-trained agent to {output_dir}")
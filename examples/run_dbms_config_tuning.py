@@ -1,6 +1,8 @@
 import argparse
+import os
 
 from cybernetics.tuning.engine import TuningEngine
+from cybernetics.tuning.scheduler import TrialWorker, get_worker_dbms_infos
 from cybernetics.knobs.generate_space import KnobSpaceGenerator
 from cybernetics.utils.util import (
     fix_global_random_state,
@@ -20,6 +22,11 @@ if __name__ == "__main__":
         required=True,
         help="Path to the configuration file",
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume the tuning session from its last checkpoint",
+    )
 
     args = parser.parse_args()
 
@@ -29,8 +36,27 @@ if __name__ == "__main__":
     # Set global random state
     fix_global_random_state(int(config["knob_space"]["random_seed"]))
 
+    # Init DBMS config space
+    dbms_config_space_generator = KnobSpaceGenerator(
+        config["knob_space"]["knob_spec"],
+        int(config["knob_space"]["random_seed"]),
+    )
+    dbms_config_space = dbms_config_space_generator.generate_input_space(
+        ignored_knobs=[]
+    )
+
     # Create DBMS executor
-    if config["dbms_info"]["dbms_name"] == "postgres":
+    workers = []
+    if "surrogate" in config:
+        # Predict the performance with a surrogate fitted on past trials
+        #   instead of running the workload on a DBMS
+        from cybernetics.dbms_interface.surrogate import (
+            get_surrogate_evaluator,
+        )
+
+        postgres_wrapper = get_surrogate_evaluator(config, dbms_config_space)
+        workload_wrapper = postgres_wrapper
+    elif config["dbms_info"]["dbms_name"] == "postgres":
         from cybernetics.dbms_interface.postgres import PostgresWrapper
 
         postgres_user, postgres_password = get_postgres_user_and_password()
@@ -55,17 +81,39 @@ if __name__ == "__main__":
             config["results"]["save_path"],
         )
 
-    # Init DBMS config space
-    dbms_config_space_generator = KnobSpaceGenerator(
-        config["knob_space"]["knob_spec"],
-        int(config["knob_space"]["random_seed"]),
-    )
-    dbms_config_space = dbms_config_space_generator.generate_input_space(
-        ignored_knobs=[]
-    )
+        # Create a DBMS and workload wrapper per DBMS instance to evaluate
+        #   trials in parallel
+        for i, dbms_info in enumerate(get_worker_dbms_infos(config)):
+            worker_save_path = os.path.join(
+                config["results"]["save_path"], f"worker_{i}"
+            )
+            worker_workload_wrapper = BenchBaseWrapper(
+                target_dir=benchbase_postgres_target_dir,
+                dbms_name=dbms_info["dbms_name"],
+                workload=config["workload_info"]["workload"],
+                results_save_dir=worker_save_path,
+                db_port=int(dbms_info["port"]),
+            )
+            worker_postgres_wrapper = PostgresWrapper(
+                dbms_info, worker_workload_wrapper, worker_save_path
+            )
+            worker = TrialWorker(
+                i, worker_postgres_wrapper, worker_workload_wrapper
+            )
+            workers.append(worker)
+
+        # The default configuration is evaluated on the first worker
+        if workers:
+            postgres_wrapper = workers[0].dbms_wrapper
+            workload_wrapper = workers[0].workload_wrapper
 
     # Init tuning engine
     tuning_engine = TuningEngine(
-        config, postgres_wrapper, dbms_config_space, workload_wrapper
+        config,
+        postgres_wrapper,
+        dbms_config_space,
+        workload_wrapper,
+        workers=workers,
+        resume=args.resume,
     )
     tuning_engine.run()
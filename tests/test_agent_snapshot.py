@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from cybernetics.tuning.ddpg.agent_snapshot import METADATA_FILENAME
+from cybernetics.tuning.ddpg.liquid_model import DDPG as LiquidDDPG
+from cybernetics.tuning.ddpg.model import DDPG
+
+
+def train_model(model, n_samples: int = 32, n_updates: int = 3):
+    model.add_samples(
+        np.random.rand(n_samples, model.n_states),
+        np.random.rand(n_samples, model.n_actions),
+        np.random.rand(n_samples),
+        np.random.rand(n_samples, model.n_states),
+    )
+    for _ in range(n_updates):
+        model.update()
+    model.noise.noise()
+
+
+@pytest.mark.parametrize("model_class", [DDPG, LiquidDDPG])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_saving_and_loading_agent(tmp_path, model_class, mmap):
+    torch.manual_seed(0)
+    np.random.seed(0)
+    model = model_class(25, 10, batch_size=8)
+    train_model(model)
+    model.save(str(tmp_path))
+
+    other_model = model_class(25, 10, batch_size=8)
+    metadata = other_model.load(str(tmp_path), mmap=mmap)
+    assert metadata["replay_memory"]["num_entries"] == 32
+
+    for name in ["actor", "target_actor", "critic", "target_critic"]:
+        params = getattr(model, name).state_dict()
+        other_params = getattr(other_model, name).state_dict()
+        assert all(torch.equal(params[k], other_params[k]) for k in params)
+    assert other_model.actor_optimizer.state_dict()["state"]
+    assert np.array_equal(other_model.noise.current_value,
+                          model.noise.current_value)
+
+    memory = model.replay_memory
+    other_memory = other_model.replay_memory
+    assert len(other_memory) == len(memory)
+    assert other_memory.write == memory.write
+    assert np.array_equal(other_memory.states[:32], memory.states[:32])
+    if memory.hiddens is not None:
+        assert np.array_equal(other_memory.hiddens[:32], memory.hiddens[:32])
+    assert np.isclose(other_memory.tree.total(), memory.tree.total())
+    # The replay arrays are only read until the first transition is added
+    other_model.update()
+    assert isinstance(other_memory.states, np.memmap) == mmap
+
+    # The loaded agent can be fine-tuned
+    train_model(other_model)
+    assert len(other_model.replay_memory) == 64
+    assert not isinstance(other_memory.states, np.memmap)
+    assert len(other_memory.states) == other_memory.capacity
+    assert np.array_equal(other_memory.states[:32], memory.states[:32])
+
+
+def test_loading_mismatching_agent(tmp_path):
+    model = DDPG(25, 10)
+    model.save(str(tmp_path))
+
+    with pytest.raises(ValueError):
+        DDPG(25, 12).load(str(tmp_path))
+
+    # A snapshot is incomplete without its metadata
+    os.remove(os.path.join(tmp_path, METADATA_FILENAME))
+    with pytest.raises(ValueError):
+        DDPG(25, 10).load(str(tmp_path))
@@ -0,0 +1,148 @@
+import os
+
+import numpy as np
+import pytest
+
+from ConfigSpace import (
+    Categorical,
+    ConfigurationSpace,
+    Float,
+    Integer,
+)
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.gaussian_process import GaussianProcessRegressor
+
+from cybernetics.tuning.batch_bo import (
+    MAX_CONSTANT_LIAR_BATCH_SIZE,
+    BatchProposer,
+    get_batch_proposer,
+)
+from cybernetics.utils.util import get_proj_dir, parse_config
+
+
+class RandomForestModel:
+    """The model interface of SMAC, which only predicts marginals."""
+
+    def __init__(self):
+        self.n_trainings = 0
+
+    def train(self, X, Y):
+        self.regressor = RandomForestRegressor(n_estimators=10,
+                                               random_state=0)
+        self.regressor.fit(X, Y.ravel())
+        self.n_trainings += 1
+
+    def predict_marginalized(self, X):
+        y = np.array([tree.predict(X) for tree in self.regressor.estimators_])
+        return y.mean(axis=0)[:, None], y.var(axis=0)[:, None]
+
+
+class GaussianProcessModel(RandomForestModel):
+    """The model interface of SMAC, which samples cost functions."""
+
+    def train(self, X, Y):
+        self.regressor = GaussianProcessRegressor(normalize_y=True)
+        self.regressor.fit(X, Y.ravel())
+        self.n_trainings += 1
+
+    def predict_marginalized(self, X):
+        mean, std = self.regressor.predict(X, return_std=True)
+        return mean[:, None], std[:, None] ** 2
+
+    def sample_functions(self, X, n_funcs=1):
+        return self.regressor.sample_y(X, n_samples=n_funcs, random_state=0)
+
+
+def get_observed_trials(n_trials: int):
+    dbms_config_space = ConfigurationSpace(seed=0)
+    dbms_config_space.add_hyperparameters([
+        Float("random_page_cost", (0.0, 1.0)),
+        Integer("shared_buffers", (1, 100)),
+        Categorical("wal_compression", ["on", "off"]),
+    ])
+
+    dbms_configs = list(dbms_config_space.sample_configuration(n_trials))
+    costs = [
+        (dbms_config["random_page_cost"] - 0.3) ** 2
+        + (dbms_config["shared_buffers"] / 100 - 0.5) ** 2
+        for dbms_config in dbms_configs
+    ]
+
+    return dbms_config_space, dbms_configs, costs
+
+
+@pytest.mark.parametrize("strategy", ["thompson", "constant_liar"])
+@pytest.mark.parametrize("model_class",
+                         [RandomForestModel, GaussianProcessModel])
+def test_proposing_a_batch_of_new_configs(strategy, model_class):
+    dbms_config_space, dbms_configs, costs = get_observed_trials(12)
+    proposer = BatchProposer(
+        dbms_config_space, 4, strategy=strategy, n_candidates=200
+    )
+    model = model_class()
+    random_state = dbms_config_space.random.get_state()
+
+    batch = proposer.propose(model, dbms_configs, costs)
+    assert len(batch) == 4
+    # The batch is diverse and does not repeat evaluated configurations
+    assert len(set(batch)) == 4
+    assert not set(batch) & set(dbms_configs)
+    assert all(
+        dbms_config.config_space is dbms_config_space
+        for dbms_config in batch
+    )
+    # Thompson sampling fits the surrogate once per batch
+    assert model.n_trainings == (1 if strategy == "thompson" else 4)
+
+    assert len(proposer.propose(model, dbms_configs, costs, batch_size=2)) == 2
+
+    # The space shared with SMAC is not reseeded
+    assert all(
+        np.array_equal(a, b)
+        for a, b in zip(random_state, dbms_config_space.random.get_state())
+    )
+
+
+def test_proposing_with_the_smac_model():
+    pytest.importorskip("smac")
+    from smac.model.random_forest import RandomForest
+
+    dbms_config_space, dbms_configs, costs = get_observed_trials(12)
+    proposer = BatchProposer(dbms_config_space, 4, n_candidates=200)
+
+    batch = proposer.propose(
+        RandomForest(dbms_config_space, seed=0), dbms_configs, costs
+    )
+    assert len(set(batch)) == 4
+    assert not set(batch) & set(dbms_configs)
+
+
+def test_get_batch_proposer():
+    proj_dir = get_proj_dir(__file__, file_level=2)
+    config = parse_config(
+        os.path.join(
+            proj_dir,
+            "cybernetics/configs/benchbase/tpcc/postgres_bo_rf_parallel.ini",
+        )
+    )
+    dbms_config_space, _, _ = get_observed_trials(2)
+
+    proposer = get_batch_proposer(config, dbms_config_space)
+    assert proposer.batch_size == 4
+    assert proposer.strategy == "thompson"
+
+    config["config_optimizer"]["batch_size"] = "1"
+    assert get_batch_proposer(config, dbms_config_space) is None
+
+    config["config_optimizer"]["batch_size"] = "4"
+    config["config_optimizer"]["batch_strategy"] = "kriging_believer"
+    with pytest.raises(ValueError):
+        get_batch_proposer(config, dbms_config_space)
+
+    # Constant liar refits the surrogate for every proposal
+    config["config_optimizer"]["batch_strategy"] = "constant_liar"
+    config["config_optimizer"]["batch_size"] = str(
+        MAX_CONSTANT_LIAR_BATCH_SIZE + 1
+    )
+    with pytest.raises(ValueError):
+        get_batch_proposer(config, dbms_config_space)
@@ -0,0 +1,108 @@
+from cybernetics.dbms_interface.dbms_client import DBClient, DBClientPool
+from cybernetics.dbms_interface.postgres import PostgresWrapper
+
+
+PG_SETTINGS = [
+    {"name": "shared_buffers", "setting": "16384", "unit": "8kB",
+     "vartype": "integer", "context": "postmaster"},
+    {"name": "work_mem", "setting": "4096", "unit": "kB",
+     "vartype": "integer", "context": "user"},
+    {"name": "random_page_cost", "setting": "4", "unit": None,
+     "vartype": "real", "context": "user"},
+    {"name": "huge_pages", "setting": "try", "unit": None,
+     "vartype": "enum", "context": "postmaster"},
+]
+
+
+class FakePostgresClient(DBClient):
+    def __init__(self):
+        super().__init__()
+        self.settings = {row["name"]: dict(row) for row in PG_SETTINGS}
+        self.pending = {}
+        self.executed = []
+
+    def connect_db(self):
+        pass
+
+    def close_connection(self):
+        pass
+
+    def is_alive(self) -> bool:
+        return True
+
+    def execute_and_fetch_results(self, sql, json=True):
+        return list(self.settings.values())
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+        if sql.startswith("ALTER SYSTEM SET "):
+            k, v = sql[len("ALTER SYSTEM SET "):-1].split("=")
+            self.pending[k] = v.strip("'")
+        elif sql == "SELECT pg_reload_conf();":
+            for k, v in self.pending.items():
+                self.settings[k]["setting"] = v
+            self.pending = {}
+
+        return True
+
+
+def get_postgres_wrapper(fake_client):
+    dbms_info = {
+        "host": "localhost",
+        "port": 5432,
+        "user": "postgres",
+        "password": "12345",
+        "db_cluster": "/data/pgsql/data",
+        "db_log_filepath": "/data/pgsql/log",
+        "db_name": "benchbase_tpcc",
+    }
+    postgres_wrapper = PostgresWrapper(dbms_info, None, None)
+    postgres_wrapper.client_pool = DBClientPool(lambda: fake_client)
+    postgres_wrapper._restart_postgres = lambda: True
+
+    return postgres_wrapper
+
+
+def test_batched_knob_application():
+    fake_client = FakePostgresClient()
+    postgres_wrapper = get_postgres_wrapper(fake_client)
+
+    report = postgres_wrapper.set_knob_values({
+        "shared_buffers": 16384,
+        "work_mem": 8192,
+        "random_page_cost": 4.0,
+        "huge_pages": "off",
+        "not_a_knob": 1,
+    })
+
+    assert set(report["changed"]) == {"work_mem", "huge_pages"}
+    assert report["changed"]["huge_pages"]["context"] == "postmaster"
+    assert set(report["unchanged"]) == {"shared_buffers", "random_page_cost"}
+    assert set(report["failed"]) == {"not_a_knob"}
+
+    # Only the changed knobs are written
+    assert fake_client.executed == [
+        "ALTER SYSTEM SET work_mem=8192;",
+        "ALTER SYSTEM SET huge_pages='off';",
+    ]
+
+
+def test_reload_without_postmaster_knob_change():
+    fake_client = FakePostgresClient()
+    postgres_wrapper = get_postgres_wrapper(fake_client)
+
+    # Only user-context knobs change, so a reload is enough
+    assert postgres_wrapper.apply_knobs({"work_mem": 8192})
+    assert postgres_wrapper.last_apply_report["action"] == "reload"
+    assert fake_client.settings["work_mem"]["setting"] == "8192"
+
+    # Nothing changes
+    assert postgres_wrapper.apply_knobs({"work_mem": 8192})
+    assert postgres_wrapper.last_apply_report["action"] == "none"
+
+    # A postmaster-context knob changes
+    assert postgres_wrapper.apply_knobs(
+        {"work_mem": 4096, "shared_buffers": 32768}
+    )
+    assert postgres_wrapper.last_apply_report["action"] == "restart"
@@ -0,0 +1,195 @@
+import json
+import os
+import sys
+from contextlib import closing
+
+from cybernetics.workload.benchbase import BenchBaseWrapper, parse_sample
+
+
+FAKE_BENCHBASE = """
+import sys
+from contextlib import closing
+for tps in [100.0, 120.5, 95.25]:
+    print(f"[INFO ] ThreadBench - Throughput: {tps} txn/sec", flush=True)
+print("[INFO ] DBWorkload - Rate limited reqs/s: ...", flush=True)
+sys.exit(int(sys.argv[1]))
+"""
+
+
+def test_parse_sample():
+    assert parse_sample("Throughput: 12.5 txn/sec") == {"throughput": 12.5}
+    assert parse_sample("Creating 10 virtual terminals...") is None
+
+
+def test_streaming_benchbase_output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    workload_wrapper = BenchBaseWrapper(
+        target_dir=str(tmp_path),
+        dbms_name="postgres",
+        workload="tpcc",
+        results_save_dir=str(tmp_path),
+    )
+
+    payload = [sys.executable, "-c", FAKE_BENCHBASE, "0"]
+    throughputs = [
+        sample["throughput"] for sample in workload_wrapper.stream(payload)
+    ]
+    assert throughputs == [100.0, 120.5, 95.25]
+    assert workload_wrapper.returncode == 0
+
+    # Partial results survive a crash
+    payload = [sys.executable, "-c", FAKE_BENCHBASE, "1"]
+    samples_filepath = str(tmp_path / "samples.jsonl")
+    for _ in workload_wrapper.stream(payload, samples_filepath):
+        pass
+    assert workload_wrapper.returncode == 1
+    assert len(workload_wrapper.samples) == 3
+
+    with open(samples_filepath, "r") as f:
+        samples = [json.loads(line) for line in f]
+    assert samples == workload_wrapper.samples
+
+
+def test_overriding_workload_duration(tmp_path):
+    config_dir = tmp_path / "config" / "postgres"
+    config_dir.mkdir(parents=True)
+    (config_dir / "sample_tpcc_config.xml").write_text(
+        "<parameters><works><work><time>1800</time><rate>unlimited</rate>"
+        "</work></works></parameters>"
+    )
+
+    workload_wrapper = BenchBaseWrapper(
+        target_dir=str(tmp_path), dbms_name="postgres", workload="tpcc"
+    )
+    workload_wrapper.set_duration(60)
+    payload = workload_wrapper._get_payload(
+        create=False, load=False, execute=True
+    )
+
+    workload_config_path = payload[payload.index("-c") + 1]
+    expected_path = "./config/postgres/sample_tpcc_config_60s.xml"
+    assert workload_config_path == expected_path
+    assert "<time>60</time>" in (tmp_path / workload_config_path).read_text()
+
+
+def test_indexing_benchbase_runs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    workload_wrapper = BenchBaseWrapper(
+        target_dir=str(tmp_path),
+        dbms_name="postgres",
+        workload="tpcc",
+        results_save_dir=str(tmp_path / "results"),
+    )
+
+    # Write a summary into the output directory of the run like BenchBase
+    fake_benchbase = (
+        "import json, os, sys; "
+        "path = os.path.join(sys.argv[1], 'tpcc_0.summary.json'); "
+        "json.dump({'Throughput (requests/second)': 1.0}, open(path, 'w'))"
+    )
+    monkeypatch.setattr(
+        workload_wrapper,
+        "_get_payload",
+        lambda create, load, execute: [
+            sys.executable, "-c", fake_benchbase,
+            workload_wrapper.run_results_dir,
+        ],
+    )
+
+    assert workload_wrapper.run()
+    assert workload_wrapper.run()
+    assert workload_wrapper.run_id == 2
+
+    assert workload_wrapper.get_last_run()["run_id"] == 2
+    first_run = workload_wrapper.get_run(1)
+    assert first_run["summary"].startswith(first_run["results_dir"])
+    assert workload_wrapper.last_result_files["summary"] == os.path.join(
+        str(tmp_path / "results"), "run_2", "tpcc_0.summary.json"
+    )
+
+    # The index survives a new wrapper
+    workload_wrapper = BenchBaseWrapper(
+        target_dir=str(tmp_path),
+        dbms_name="postgres",
+        workload="tpcc",
+        results_save_dir=str(tmp_path / "results"),
+    )
+    assert workload_wrapper.get_run(2)["summary"] is not None
+
+
+def test_overriding_database_port(tmp_path):
+    config_dir = tmp_path / "config" / "postgres"
+    config_dir.mkdir(parents=True)
+    (config_dir / "sample_tpcc_config.xml").write_text(
+        "<parameters>"
+        "<url>jdbc:postgresql://localhost:5432/benchbase?sslmode=disable</url>"
+        "<works><work><time>1800</time></work></works></parameters>"
+    )
+
+    workload_wrapper = BenchBaseWrapper(
+        target_dir=str(tmp_path),
+        dbms_name="postgres",
+        workload="tpcc",
+        db_port=5433,
+    )
+
+    # The port is also overridden when loading the database
+    payload = workload_wrapper._get_payload(
+        create=True, load=True, execute=False
+    )
+    workload_config_path = payload[payload.index("-c") + 1]
+    assert workload_config_path.endswith("_port5433.xml")
+    assert "localhost:5433/benchbase" in (
+        tmp_path / workload_config_path
+    ).read_text()
+
+
+def test_identifying_loaded_data(tmp_path):
+    config_dir = tmp_path / "config" / "postgres"
+    config_dir.mkdir(parents=True)
+    config_filepath = config_dir / "sample_tpcc_config.xml"
+    config_filepath.write_text(
+        "<parameters><scalefactor>10</scalefactor></parameters>"
+    )
+
+    workload_wrapper = BenchBaseWrapper(
+        target_dir=str(tmp_path), dbms_name="postgres", workload="tpcc"
+    )
+    identity = workload_wrapper.get_data_identity()
+    assert identity == "postgres/tpcc/scalefactor=10"
+
+    # Another scale loads other data
+    config_filepath.write_text(
+        "<parameters><scalefactor>100</scalefactor></parameters>"
+    )
+    assert workload_wrapper.get_data_identity() != identity
+
+
+def test_closing_stream_kills_workload(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    workload_wrapper = BenchBaseWrapper(
+        target_dir=str(tmp_path),
+        dbms_name="postgres",
+        workload="tpcc",
+        results_save_dir=str(tmp_path / "results"),
+    )
+    long_benchbase = (
+        "import time\n"
+        "while True:\n"
+        "    print('Throughput: 100.0 txn/sec', flush=True)\n"
+        "    time.sleep(0.1)\n"
+    )
+    monkeypatch.setattr(
+        workload_wrapper,
+        "_get_payload",
+        lambda create, load, execute: [sys.executable, "-c", long_benchbase],
+    )
+
+    # Like an early-stopped trial
+    with closing(workload_wrapper.iter_run()) as stream:
+        for _ in stream:
+            break
+
+    # The workload process exited without waiting for garbage collection
+    assert workload_wrapper.returncode is not None
+    assert len(workload_wrapper.samples) == 1
@@ -0,0 +1,145 @@
+import os
+import random
+
+import numpy as np
+import pytest
+import torch
+
+from cybernetics.tuning.ddpg.model import DDPG
+from cybernetics.utils.checkpoint import (
+    CHECKPOINT_FILENAME,
+    load_checkpoint,
+    save_checkpoint,
+)
+from cybernetics.utils.exp_tracker import ExperimentState
+from cybernetics.utils.util import (
+    get_global_random_state,
+    set_global_random_state,
+)
+
+
+def test_saving_and_loading_checkpoint(tmp_path):
+    filepath = str(tmp_path / CHECKPOINT_FILENAME)
+    assert load_checkpoint(filepath) is None
+
+    save_checkpoint({"n_completed_trials": 1}, filepath)
+    save_checkpoint({"n_completed_trials": 2}, filepath)
+    assert load_checkpoint(filepath) == {"n_completed_trials": 2}
+
+    # No temporary files are left behind
+    assert os.listdir(tmp_path) == [CHECKPOINT_FILENAME]
+
+
+def test_restoring_global_random_state():
+    random_state = get_global_random_state()
+    values = [random.random(), np.random.rand(), torch.rand(1).item()]
+
+    set_global_random_state(random_state)
+    assert values == [random.random(), np.random.rand(), torch.rand(1).item()]
+
+
+def test_resuming_experiment_state(tmp_path):
+    exp_state = ExperimentState({}, {}, "throughput", str(tmp_path))
+    exp_state.default_perf = 100.0
+    exp_state.best_perf = 120.0
+    save_checkpoint(
+        {"exp_state": exp_state.get_state()},
+        str(tmp_path / CHECKPOINT_FILENAME),
+    )
+
+    # Previous results are never wiped without resuming
+    with pytest.raises(ValueError):
+        ExperimentState({}, {}, "throughput", str(tmp_path))
+
+    exp_state = ExperimentState(
+        {}, {}, "throughput", str(tmp_path), resume=True
+    )
+    state = load_checkpoint(str(tmp_path / CHECKPOINT_FILENAME))
+    exp_state.set_state(state["exp_state"])
+    assert exp_state.best_perf == 120.0
+
+
+def test_restoring_ddpg_state():
+    model = DDPG(n_states=4, n_actions=2, batch_size=2)
+    for _ in range(4):
+        model.add_sample(np.random.rand(4), np.random.rand(2), 1.0,
+                         np.random.rand(4))
+    model.update()
+    model.noise.noise()
+
+    other_model = DDPG(n_states=4, n_actions=2, batch_size=2)
+    other_model.set_state(model.get_state())
+
+    assert len(other_model.replay_memory) == 4
+    assert np.array_equal(
+        other_model.noise.current_value, model.noise.current_value
+    )
+    for param, other_param in zip(
+        model.target_actor.parameters(), other_model.target_actor.parameters()
+    ):
+        assert torch.equal(param, other_param)
+
+
+class FakeInitialDesign:
+    def __init__(self, dbms_config_space, n_configs):
+        self._configspace = dbms_config_space
+        self.n_configs = n_configs
+
+    def select_configurations(self):
+        return list(self._configspace.sample_configuration(self.n_configs))
+
+
+def test_resuming_ddpg_initial_design(tmp_path):
+    pytest.importorskip("smac")
+    from ConfigSpace import ConfigurationSpace
+    from ConfigSpace.hyperparameters import UniformFloatHyperparameter
+
+    from cybernetics.tuning.dbms_config_optimizer import DDPGOptimizer
+
+    dbms_config_space = ConfigurationSpace(seed=0)
+    dbms_config_space.add_hyperparameter(
+        UniformFloatHyperparameter("random_page_cost", 1.0, 4.0)
+    )
+    exp_state = ExperimentState({}, {}, "throughput", str(tmp_path))
+    exp_state.default_perf = 100.0
+
+    evaluated = []
+    crashing = [True]
+
+    def target_function(dbms_config):
+        if crashing[0] and len(evaluated) == 2:
+            # Unlike a failed trial, an interrupt stops the session
+            raise KeyboardInterrupt
+        evaluated.append(dbms_config)
+        return 100.0 + len(evaluated), np.random.rand(4)
+
+    def get_optimizer():
+        optimizer = DDPGOptimizer(
+            DDPG(n_states=4, n_actions=1, batch_size=2),
+            target_function,
+            FakeInitialDesign(dbms_config_space, 4),
+            10,
+            1,
+            exp_state,
+            False,
+        )
+        optimizer.checkpoint_callback = lambda: checkpoints.append(
+            optimizer.get_state()
+        )
+        return optimizer
+
+    checkpoints = []
+    optimizer = get_optimizer()
+    with pytest.raises(KeyboardInterrupt):
+        optimizer.run_initial_design()
+    # Every evaluated configuration was checkpointed
+    assert len(checkpoints) == 2
+
+    # Only the remaining configurations are evaluated after resuming
+    crashing[0] = False
+    optimizer = get_optimizer()
+    optimizer.set_state(checkpoints[-1])
+    optimizer.run_initial_design()
+    assert evaluated == checkpoints[-1]["initial_design_state"]["dbms_configs"]
+    assert optimizer.search_state["iter"] == 4
+    assert optimizer.initial_design_state is None
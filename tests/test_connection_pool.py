@@ -0,0 +1,51 @@
+from cybernetics.dbms_interface.dbms_client import DBClient, DBClientPool
+
+
+class FakeClient(DBClient):
+    def __init__(self):
+        super().__init__()
+        self.alive = True
+        self.closed = False
+
+    def connect_db(self):
+        pass
+
+    def close_connection(self):
+        self.closed = True
+
+    def is_alive(self) -> bool:
+        return self.alive and not self.closed
+
+    def execute_and_fetch_results(self, sql, json=True):
+        return []
+
+    def execute(self, sql):
+        return True
+
+
+def test_connection_pool():
+    pool = DBClientPool(FakeClient)
+
+    with pool.connection() as first_client:
+        pass
+    with pool.connection() as second_client:
+        pass
+
+    # The second call reuses the live connection
+    assert first_client is second_client
+    stats = pool.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["connects"] == 1
+
+    # A connection killed by e.g. a restart is detected and rebuilt
+    second_client.alive = False
+    with pool.connection() as third_client:
+        pass
+
+    assert third_client is not second_client
+    assert second_client.closed
+    stats = pool.get_stats()
+    assert stats["stale"] == 1 and stats["connects"] == 2
+
+    pool.invalidate()
+    assert third_client.closed
@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+import torch
+
+from cybernetics.tuning.ddpg.liquid_model import DDPG as LiquidDDPG
+from cybernetics.tuning.ddpg.model import DDPG
+
+
+def fill_replay_memory(model, n_samples: int):
+    for _ in range(n_samples):
+        model.add_sample(
+            np.random.rand(model.n_states),
+            np.random.rand(model.n_actions),
+            np.random.rand(),
+            np.random.rand(model.n_states),
+        )
+
+
+@pytest.mark.parametrize("model_class", [DDPG, LiquidDDPG])
+def test_updating_model_from_replay_memory(model_class):
+    torch.manual_seed(0)
+    np.random.seed(0)
+    model = model_class(25, 10, batch_size=8)
+    fill_replay_memory(model, 16)
+
+    _, states, next_states, actions, rewards, is_weights = \
+        model._sample_batch()
+    batch_states = model.fromnumpy(states)
+    # The batch is wrapped without copying and without gradients
+    assert batch_states.dtype == torch.float32
+    assert not batch_states.requires_grad
+    assert np.shares_memory(batch_states.numpy(), states)
+
+    actor_params = [param.clone() for param in model.actor.parameters()]
+    critic_loss, _ = model.update()
+    model.update()
+    assert torch.isfinite(critic_loss)
+    assert any(
+        not torch.equal(param, other)
+        for param, other in zip(actor_params, model.actor.parameters())
+    )
+
+    assert model.n_updates == 2
+    assert model.update_time > 0
+
+
+@pytest.mark.parametrize("model_class", [DDPG, LiquidDDPG])
+def test_adding_samples_in_batch(model_class):
+    torch.manual_seed(0)
+    model = model_class(25, 10)
+    states = np.random.rand(16, 25)
+    actions = np.random.rand(16, 10)
+    rewards = np.random.rand(16)
+    next_states = np.random.rand(16, 25)
+
+    other_model = model_class(25, 10)
+    other_model.set_state(model.get_state())
+
+    model.add_samples(states, actions, rewards, next_states)
+    for transition in zip(states, actions, rewards, next_states):
+        other_model.add_sample(*transition)
+
+    # Both have the same transitions with the same priorities
+    assert len(model.replay_memory) == len(other_model.replay_memory) == 16
+    assert np.allclose(model.replay_memory.states[:16], states)
+    assert np.allclose(
+        model.replay_memory.tree.get_priorities(16),
+        other_model.replay_memory.tree.get_priorities(16),
+        atol=1e-5,
+    )
+
+
+@pytest.mark.parametrize("script", [False, True])
+def test_choosing_action_with_frozen_actor(script):
+    torch.manual_seed(0)
+    model = DDPG(25, 10, batch_size=8)
+    state = np.random.rand(25)
+
+    action = model.predict_action(state)
+    assert action.dtype == np.float32
+    assert action.shape == (10,)
+    # The actor is left in training mode
+    assert model.actor.training
+
+    model.freeze_actor(script=script)
+    assert np.allclose(model.predict_action(state), action, atol=1e-6)
+    # One action per state, e.g., per cluster
+    actions = model.predict_action(np.tile(state, (4, 1)))
+    assert actions.shape == (4, 10)
+    assert np.allclose(actions, action, atol=1e-6)
+
+    noisy_action = model.choose_action(state)
+    assert np.all((noisy_action >= 0) & (noisy_action <= 1))
+
+    # Training drops the stale snapshot
+    fill_replay_memory(model, 8)
+    model.update()
+    assert model.inference_actor is None
+
+
+def test_choosing_action_with_liquid_actor():
+    torch.manual_seed(0)
+    model = LiquidDDPG(25, 10)
+    state = np.random.rand(25)
+
+    action, hidden = model.choose_action(state, None)
+    assert action.dtype == np.float32
+    assert action.shape == (10,)
+    _, hidden = model.choose_action(state, hidden)
+    assert hidden is not None
+
+    model.freeze_actor()
+    assert model.predict_action(state, None)[0].shape == (10,)
+    with pytest.raises(ValueError, match="TorchScript"):
+        model.freeze_actor(script=True)
+
+
+def test_running_liquid_actor_on_state_sequences():
+    torch.manual_seed(0)
+    actor = LiquidDDPG(25, 10).actor.eval()
+    states = torch.rand(2, 3, 25)
+    hiddens = torch.rand(2, 25)
+
+    with torch.no_grad():
+        actions, _ = actor.forward_sequences(states, hiddens,
+                                             torch.tensor([0, 2]))
+
+        # The same as feeding the states one by one from the hidden state
+        # of the first step
+        hidden = hiddens[:1]
+        for t in range(3):
+            action, hidden = actor(states[:1, t], hidden)
+        assert torch.allclose(actions[0], action[0], atol=1e-6)
+
+        action, _ = actor(states[1:, 2], hiddens[1:])
+        assert torch.allclose(actions[1], action[0], atol=1e-6)
+
+
+def test_training_liquid_actor_with_stored_hidden_states():
+    torch.manual_seed(0)
+    np.random.seed(0)
+    model = LiquidDDPG(25, 10, batch_size=8, seq_len=4)
+
+    state = np.random.rand(25)
+    hidden = None
+    for _ in range(16):
+        action, next_hidden = model.choose_action(state, hidden)
+        next_state = np.random.rand(25)
+        model.add_sample(state, action, np.random.rand(), next_state, hidden)
+        state, hidden = next_state, next_hidden
+
+    # The first state was seen with the initial hidden state
+    memory = model.replay_memory
+    assert not memory.hiddens[0].any()
+    assert memory.hiddens[1:16].any(axis=1).all()
+    _, first_steps, _ = memory.get_sequences(np.arange(16), model.seq_len)
+    assert first_steps.tolist() == [3, 2, 1] + [0] * 13
+
+    loss, policy_loss = model.update()
+    assert torch.isfinite(loss) and torch.isfinite(policy_loss)
@@ -0,0 +1,32 @@
+from configparser import ConfigParser
+
+from cybernetics.workload.early_stopping import (
+    ConfidenceBoundEarlyStopping,
+    get_early_stopping_policy,
+)
+
+
+def test_confidence_bound_early_stopping():
+    policy = ConfidenceBoundEarlyStopping(warmup_time=10, min_samples=3, z=2)
+
+    # Warmup samples are ignored
+    samples = [{"time": 5, "throughput": 10.0}]
+    assert not policy.should_stop(samples, incumbent=1000)
+
+    samples += [
+        {"time": 15, "throughput": 100.0},
+        {"time": 20, "throughput": 110.0},
+        {"time": 25, "throughput": 105.0},
+    ]
+    assert policy.should_stop(samples, incumbent=1000)
+    assert not policy.should_stop(samples, incumbent=110)
+    assert policy.estimate(samples) == 105.0
+
+
+def test_get_early_stopping_policy():
+    config = ConfigParser()
+    assert get_early_stopping_policy(config) is None
+
+    config.read_dict({"early_stopping": {"warmup_time": "60", "z": "3"}})
+    policy = get_early_stopping_policy(config)
+    assert policy.warmup_time == 60 and policy.z == 3
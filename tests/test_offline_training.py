@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+import torch
+
+from ConfigSpace import ConfigurationSpace
+from ConfigSpace.hyperparameters import UniformIntegerHyperparameter
+
+from cybernetics.tuning.ddpg.liquid_model import DDPG as LiquidDDPG
+from cybernetics.tuning.ddpg.model import DDPG
+from cybernetics.tuning.ddpg.offline_training import (
+    get_transition_arrays,
+    load_offline_transitions,
+    pretrain_agent,
+)
+from cybernetics.tuning.ddpg.reward import get_ddpg_reward
+from cybernetics.utils.trial_store import DEFAULT_CONFIG, TrialStore
+
+
+def add_session(filepath, default_perf, perfs, n_states=4,
+                with_default_stats=True):
+    trial_store = TrialStore(filepath)
+    trial_store.add_trial(
+        DEFAULT_CONFIG,
+        "postgres",
+        "tpcc",
+        "throughput",
+        {"Throughput (requests/second)": default_perf},
+        numeric_stats=(
+            np.arange(n_states, dtype=float) if with_default_stats else None
+        ),
+    )
+    for i, perf in enumerate(perfs):
+        trial_store.add_trial(
+            {"work_mem": 1024 * (i + 1)},
+            "postgres",
+            "tpcc",
+            "throughput",
+            {"Throughput (requests/second)": perf},
+            numeric_stats=np.arange(n_states, dtype=float) * (i + 2),
+        )
+    trial_store.close()
+
+
+def get_dbms_config_space():
+    dbms_config_space = ConfigurationSpace(seed=0)
+    dbms_config_space.add_hyperparameter(
+        UniformIntegerHyperparameter("work_mem", 64, 65536, default_value=4096)
+    )
+    return dbms_config_space
+
+
+def test_loading_offline_transitions(tmp_path):
+    filepath = str(tmp_path / "trials.sqlite")
+    add_session(filepath, 100.0, [120.0, 150.0])
+    other_filepath = str(tmp_path / "other.sqlite")
+    add_session(other_filepath, 10.0, [20.0])
+    # States of another size are skipped
+    mismatched_filepath = str(tmp_path / "mismatched.sqlite")
+    add_session(mismatched_filepath, 10.0, [20.0], n_states=3)
+
+    states, actions, rewards, next_states = load_offline_transitions(
+        [filepath, other_filepath, mismatched_filepath],
+        "postgres",
+        "throughput",
+        get_dbms_config_space(),
+        4,
+    )
+    assert states.shape == next_states.shape == (3, 4)
+    assert actions.shape == (3, 1)
+
+    # The trials of a session are chained from its default trial
+    assert np.array_equal(states[0], np.arange(4))
+    assert np.array_equal(states[1], next_states[0])
+    assert np.array_equal(states[2], np.arange(4))
+
+    # The rewards are relative to the default performance of the session,
+    # and the worst trial so far gets no reward like online
+    np.testing.assert_allclose(rewards, [
+        get_ddpg_reward(120.0, 100.0, 100.0, 120.0),
+        get_ddpg_reward(150.0, 120.0, 100.0, 120.0),
+        get_ddpg_reward(20.0, 10.0, 10.0, 20.0),
+    ])
+    assert rewards[0] == 0 and rewards[1] > 0
+
+
+def test_loading_transitions_from_missing_trial_store(tmp_path):
+    filepath = str(tmp_path / "trails.sqlite")
+    with pytest.raises(FileNotFoundError, match="trails.sqlite"):
+        load_offline_transitions(
+            [filepath], "postgres", "throughput", get_dbms_config_space(), 4
+        )
+    # No empty trial store is created at the mistyped path
+    assert not (tmp_path / "trails.sqlite").exists()
+
+
+def test_skipping_transitions_without_states(tmp_path):
+    dbms_config_space = get_dbms_config_space()
+    transitions = [
+        (None, {"work_mem": 1024}, 150.0, 100.0, 150.0, np.ones(4)),
+        (np.ones(4), {"work_mem": 2048}, 120.0, 150.0, 120.0, None),
+        (np.ones(4), {"work_mem": 4096}, 130.0, 120.0, 120.0, np.ones(4)),
+    ]
+    states, actions, rewards, next_states = get_transition_arrays(
+        transitions,
+        dbms_config_space,
+        4,
+        lambda perf, prev_perf, worst_perf: 1.0,
+    )
+    assert len(states) == len(actions) == len(rewards) == len(next_states)
+    assert len(states) == 1
+
+    # The default trial of the session did not record DBMS statistics
+    filepath = str(tmp_path / "trials.sqlite")
+    add_session(filepath, 100.0, [150.0, 120.0], with_default_stats=False)
+    states, _, _, next_states = load_offline_transitions(
+        [filepath], "postgres", "throughput", dbms_config_space, 4
+    )
+    # Only the transition between the two tuned trials has states
+    assert states.shape == (1, 4)
+    assert next_states.shape == (1, 4)
+
+
+@pytest.mark.parametrize("model_class", [DDPG, LiquidDDPG])
+def test_pretraining_agent(model_class):
+    torch.manual_seed(0)
+    np.random.seed(0)
+    n_samples = 64
+    model = model_class(25, 2, batch_size=16)
+    transitions = (
+        np.random.rand(n_samples, 25),
+        np.random.rand(n_samples, 2),
+        np.random.rand(n_samples),
+        np.random.rand(n_samples, 25),
+    )
+
+    losses = pretrain_agent(model, transitions, 20, log_interval=10)
+    assert len(losses) == 20
+    assert len(model.replay_memory) == n_samples
+    assert model.n_updates == 20
+
+
+def test_pretraining_agent_without_enough_transitions():
+    model = DDPG(4, 2, batch_size=16)
+    transitions = (np.zeros((4, 4)), np.zeros((4, 2)), np.zeros(4),
+                   np.zeros((4, 4)))
+
+    with pytest.raises(ValueError):
+        pretrain_agent(model, transitions, 10)
@@ -0,0 +1,95 @@
+from cybernetics.dbms_interface.dbms_client import DBClient, DBClientPool
+from cybernetics.dbms_interface.postgres import (
+    RESTART_TIMEOUT,
+    RESTART_TIMEOUT_CHECKPOINT_FACTOR,
+    PostgresWrapper,
+    get_restart_timeout,
+)
+
+
+class FakePostgresClient(DBClient):
+    def __init__(self, n_stale_reads: int):
+        super().__init__()
+        self.buffers_checkpoint = 100
+        # Reads until the statistics include the checkpoint
+        self.n_stale_reads = n_stale_reads
+        self.executed = []
+
+    def connect_db(self):
+        pass
+
+    def close_connection(self):
+        pass
+
+    def is_alive(self) -> bool:
+        return True
+
+    def execute_and_fetch_results(self, sql, json=True):
+        if "CHECKPOINT;" in self.executed:
+            if self.n_stale_reads > 0:
+                self.n_stale_reads -= 1
+            else:
+                return [{"buffers_checkpoint": self.buffers_checkpoint + 50}]
+
+        return [{"buffers_checkpoint": self.buffers_checkpoint}]
+
+    def execute(self, sql):
+        self.executed.append(sql)
+        return True
+
+
+def get_postgres_wrapper(fake_client):
+    dbms_info = {
+        "host": "localhost",
+        "port": 5432,
+        "user": "postgres",
+        "password": "12345",
+        "db_cluster": "/data/pgsql/data",
+        "db_log_filepath": "/data/pgsql/log",
+        "db_name": "benchbase_tpcc",
+    }
+    postgres_wrapper = PostgresWrapper(dbms_info, None, None)
+    postgres_wrapper.client_pool = DBClientPool(lambda: fake_client)
+
+    return postgres_wrapper
+
+
+def test_restart_timeout():
+    # A failed checkpoint tells nothing about the I/O
+    assert get_restart_timeout(
+        {"success": False, "checkpoint_time": 1000, "dirty_buffers": 0}
+    ) == RESTART_TIMEOUT
+
+    # Fast checkpoints keep the default timeout, whatever they flushed
+    assert get_restart_timeout(
+        {"success": True, "checkpoint_time": 1, "dirty_buffers": 10**6}
+    ) == RESTART_TIMEOUT
+    assert get_restart_timeout(
+        {"success": True, "checkpoint_time": 0, "dirty_buffers": 0}
+    ) == RESTART_TIMEOUT
+
+    # Slow checkpoints mean slow I/O
+    assert get_restart_timeout(
+        {"success": True, "checkpoint_time": 100, "dirty_buffers": 10}
+    ) == RESTART_TIMEOUT_CHECKPOINT_FACTOR * 100
+
+
+def test_checkpoint_waits_for_statistics():
+    fake_client = FakePostgresClient(n_stale_reads=2)
+    postgres_wrapper = get_postgres_wrapper(fake_client)
+
+    checkpoint_stats = postgres_wrapper.checkpoint()
+    assert checkpoint_stats["success"]
+    assert checkpoint_stats["dirty_buffers"] == 50
+    # The statistics snapshot is cleared before every read
+    assert fake_client.executed.count("SELECT pg_stat_clear_snapshot();") == 3
+
+
+def test_checkpoint_without_dirty_buffers(monkeypatch):
+    monkeypatch.setattr(
+        "cybernetics.dbms_interface.postgres.CHECKPOINT_STATS_TIMEOUT", 0.2
+    )
+    fake_client = FakePostgresClient(n_stale_reads=10**6)
+    postgres_wrapper = get_postgres_wrapper(fake_client)
+
+    assert postgres_wrapper.checkpoint()["dirty_buffers"] == 0
@@ -0,0 +1,141 @@
+import numpy as np
+
+from cybernetics.tuning.ddpg.prioritized_replay_memory import (
+    PrioritizedReplayMemory,
+    SumTree,
+)
+
+
+def test_sum_tree_batched_updates():
+    tree = SumTree(5)
+    tree.update(np.arange(5), np.array([1.0, 2.0, 3.0, 4.0, 5.0]))
+    assert tree.total() == 15
+
+    # Scalar and batched updates, with a repeated index
+    tree.update(0, 6.0)
+    tree.update(np.array([1, 1, 4]), np.array([0.0, 0.0, 1.0]))
+    assert tree.total() == 6 + 3 + 4 + 1
+    assert tree.get_priorities(5).tolist() == [6.0, 0.0, 3.0, 4.0, 1.0]
+
+
+def test_sum_tree_retrieves_cumulative_ranges():
+    tree = SumTree(4)
+    tree.update(np.arange(4), np.array([1.0, 0.0, 2.0, 3.0]))
+
+    idxs, priorities = tree.get([0.5, 1.0, 1.5, 3.5, 6.0])
+    assert idxs.tolist() == [0, 0, 2, 3, 3]
+    assert priorities.tolist() == [1.0, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_sampling_transitions():
+    np.random.seed(0)
+    memory = PrioritizedReplayMemory(capacity=4, n_states=2, n_actions=3)
+    for i in range(6):
+        memory.add(i, (np.full(2, i), np.full(3, i), i, np.full(2, i + 1)))
+
+    # The oldest transitions were overwritten
+    assert len(memory) == 4
+    assert sorted(memory.rewards.tolist()) == [2, 3, 4, 5]
+
+    (states, actions, rewards, next_states), idxs, _ = memory.sample(8)
+    assert states.shape == (8, 2) and states.dtype == np.float32
+    assert actions.shape == (8, 3)
+    assert np.all(next_states[:, 0] == states[:, 0] + 1)
+    assert np.all(rewards == memory.rewards[idxs])
+
+    # Only the sampled transition gets a high priority
+    memory.update(idxs, np.zeros(8))
+    memory.update(idxs[:1], np.array([100.0]))
+    _, idxs, _ = memory.sample(8)
+    assert np.mean(idxs == idxs[0]) > 0.5
+
+
+def test_importance_sampling_weights():
+    np.random.seed(0)
+    memory = PrioritizedReplayMemory(capacity=4, n_states=1, n_actions=1)
+    for error in [0.0, 0.0, 0.0, 10.0]:
+        memory.add(error, (np.zeros(1), np.zeros(1), 0, np.zeros(1)))
+
+    _, idxs, is_weights = memory.sample(16)
+    # Frequently sampled transitions are down-weighted
+    assert is_weights.max() == 1
+    assert np.all(is_weights[idxs == 3] < is_weights[idxs != 3].min())
+
+    # Beta is annealed towards 1
+    beta = memory.beta
+    memory.sample(16)
+    assert memory.beta > beta
+
+    # Uniform sampling does not need any correction
+    memory = PrioritizedReplayMemory(capacity=4, n_states=1, n_actions=1,
+                                     alpha=0)
+    for error in [0.0, 10.0]:
+        memory.add(error, (np.zeros(1), np.zeros(1), 0, np.zeros(1)))
+    _, _, is_weights = memory.sample(8)
+    assert np.allclose(is_weights, 1)
+
+
+def test_saving_and_restoring_memory():
+    memory = PrioritizedReplayMemory(capacity=8)
+    for i in range(3):
+        memory.add(i, (np.full(2, i), np.full(3, i), i, np.full(2, i)))
+
+    other_memory = PrioritizedReplayMemory(capacity=8)
+    other_memory.set(memory.get())
+    assert len(other_memory) == 3
+    assert other_memory.write == 3
+    assert np.isclose(other_memory.tree.total(), memory.tree.total())
+    assert np.all(other_memory.states[:3] == memory.states[:3])
+
+
+def test_adding_transitions_in_batch():
+    memory = PrioritizedReplayMemory(capacity=4)
+    memory.add(1, (np.zeros(2), np.zeros(1), 0, np.zeros(2)))
+
+    rewards = np.arange(1, 6)
+    memory.add_batch(
+        rewards,
+        (np.ones((5, 2)), np.ones((5, 1)), rewards, np.ones((5, 2))),
+    )
+
+    # Six transitions were added to a memory of four
+    assert len(memory) == 4
+    assert memory.write == 2
+    assert sorted(memory.rewards.tolist()) == [2, 3, 4, 5]
+    assert np.isclose(
+        memory.tree.total(), np.sum(memory._get_priority(rewards[1:]))
+    )
+
+
+def test_getting_state_sequences():
+    memory = PrioritizedReplayMemory(capacity=8, n_states=1, n_actions=1,
+                                     n_hidden=2)
+    # Two chained sessions of three transitions: 0 -> 1 -> 2 -> 3 and
+    # 10 -> 11 -> 12 -> 13
+    for start in [0, 10]:
+        states = np.arange(start, start + 4, dtype=float)[:, None]
+        memory.add_batch(
+            np.zeros(3),
+            (states[:-1], np.zeros((3, 1)), np.zeros(3), states[1:]),
+            hiddens=np.repeat(states[:-1], 2, axis=1),
+        )
+
+    states, first_steps, hiddens = memory.get_sequences(
+        np.array([1, 4, 5]), seq_len=4
+    )
+    assert states.shape == (3, 4, 1)
+    assert states[:, -1, 0].tolist() == [1, 11, 12]
+    # Sequences start at the first transition of their session, or at the
+    # oldest transition of the memory
+    assert first_steps.tolist() == [2, 2, 1]
+    assert hiddens.tolist() == [[0, 0], [10, 10], [10, 10]]
+
+    # Sequences do not wrap around to the newest transitions
+    memory.add_batch(
+        np.zeros(3),
+        (np.full((3, 1), 13.0), np.zeros((3, 1)), np.zeros(3),
+         np.full((3, 1), 1.0)),
+    )
+    _, first_steps, hiddens = memory.get_sequences(np.array([2]), seq_len=4)
+    assert first_steps.tolist() == [2]
+    assert hiddens.tolist() == [[1, 1]]
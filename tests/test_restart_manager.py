@@ -0,0 +1,63 @@
+import logging
+import os
+import subprocess
+import time
+
+from cybernetics.dbms_interface.restart_manager import PostgresRestartManager
+
+
+def test_waiting_until_postgres_is_ready():
+    n_probes = []
+
+    def connect_probe():
+        n_probes.append(1)
+        return len(n_probes) >= 3  # ready after finishing recovery
+
+    restart_manager = PostgresRestartManager(
+        "/data/pgsql/data",
+        "/data/pgsql/log",
+        "localhost",
+        5432,
+        logging.getLogger(__name__),
+        connect_probe=connect_probe,
+        timeout=5,
+    )
+    restart_manager.pg_isready_path = None  # use the connection probe
+
+    assert restart_manager.wait_until_ready()
+    assert len(n_probes) == 3
+
+    restart_manager.connect_probe = lambda: False
+    restart_manager.timeout = 0.2
+    assert not restart_manager.wait_until_ready()
+
+
+def test_detecting_exited_postmaster(tmp_path):
+    restart_manager = PostgresRestartManager(
+        str(tmp_path),
+        str(tmp_path / "log"),
+        "localhost",
+        5432,
+        logging.getLogger(__name__),
+        connect_probe=lambda: False,
+        timeout=30,
+    )
+    restart_manager.pg_isready_path = None  # use the connection probe
+
+    # The postmaster did not write its pid file yet
+    assert restart_manager.is_postmaster_running(time.time())
+    assert not restart_manager.is_postmaster_running(time.time() - 60)
+
+    pid_filepath = tmp_path / "postmaster.pid"
+    pid_filepath.write_text(f"{os.getpid()}\n{tmp_path}\n")
+    assert restart_manager.is_postmaster_running(time.time())
+
+    # The postmaster exited, e.g., because of an invalid configuration
+    p = subprocess.Popen(["true"])
+    p.wait()
+    pid_filepath.write_text(f"{p.pid}\n{tmp_path}\n")
+    assert not restart_manager.is_postmaster_running(time.time())
+
+    beg_time = time.time()
+    assert not restart_manager.wait_until_ready(start_time=beg_time)
+    assert time.time() - beg_time < 1
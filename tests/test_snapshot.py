@@ -0,0 +1,62 @@
+from cybernetics.dbms_interface.snapshot import PostgresSnapshotManager
+
+
+class FakePostgresClient:
+    def __init__(self, executed: list, snapshots: dict = None):
+        self.executed = executed
+        # Snapshot name -> comment
+        self.snapshots = snapshots if snapshots is not None else {}
+
+    def close_connection(self):
+        pass
+
+    def execute_and_fetch_results(self, sql, json=True):
+        return [
+            (comment,) for name, comment in self.snapshots.items()
+            if f"'{name}'" in sql
+        ]
+
+    def execute(self, sql):
+        self.executed.append(sql)
+        return True
+
+
+def test_snapshot_capture_and_restore():
+    executed = []
+    snapshot_manager = PostgresSnapshotManager(
+        "benchbase_tpcc", lambda: FakePostgresClient(executed)
+    )
+    assert not snapshot_manager.has_snapshot()
+
+    assert snapshot_manager.capture()
+    assert executed[-2:] == [
+        "DROP DATABASE IF EXISTS benchbase_tpcc_snapshot;",
+        "CREATE DATABASE benchbase_tpcc_snapshot TEMPLATE benchbase_tpcc;",
+    ]
+
+    assert snapshot_manager.restore()
+    assert executed[-2:] == [
+        "DROP DATABASE IF EXISTS benchbase_tpcc;",
+        "CREATE DATABASE benchbase_tpcc TEMPLATE benchbase_tpcc_snapshot;",
+    ]
+    assert snapshot_manager.last_restore_time is not None
+
+
+def test_recapturing_snapshot_of_other_data():
+    executed = []
+    snapshots = {}
+    snapshot_manager = PostgresSnapshotManager(
+        "benchbase_tpcc", lambda: FakePostgresClient(executed, snapshots)
+    )
+
+    assert snapshot_manager.capture("postgres/tpcc/scalefactor=10")
+    assert executed[-1] == (
+        "COMMENT ON DATABASE benchbase_tpcc_snapshot IS "
+        "'postgres/tpcc/scalefactor=10';"
+    )
+
+    snapshots["benchbase_tpcc_snapshot"] = "postgres/tpcc/scalefactor=10"
+    assert snapshot_manager.has_snapshot()
+    assert snapshot_manager.has_snapshot("postgres/tpcc/scalefactor=10")
+    # A snapshot of another scale is stale
+    assert not snapshot_manager.has_snapshot("postgres/tpcc/scalefactor=100")
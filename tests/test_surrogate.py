@@ -0,0 +1,169 @@
+import os
+
+import ConfigSpace.hyperparameters as CSH
+import numpy as np
+import pytest
+
+from ConfigSpace import ConfigurationSpace
+
+from cybernetics.dbms_interface.surrogate import (
+    SurrogateEvaluator,
+    SurrogateModel,
+    get_surrogate_evaluator,
+)
+from cybernetics.tuning.warm_start import WarmStarter
+from cybernetics.utils.trial_store import (
+    DEFAULT_CONFIG,
+    TRIAL_STORE_FILENAME,
+    TrialStore,
+)
+from cybernetics.utils.util import get_proj_dir, parse_config
+
+
+def get_dbms_config_space():
+    dbms_config_space = ConfigurationSpace(seed=0)
+    dbms_config_space.add_hyperparameters([
+        CSH.UniformIntegerHyperparameter(
+            "shared_buffers", 16, 4096, default_value=16
+        ),
+        CSH.CategoricalHyperparameter(
+            "synchronous_commit", ["on", "off"], default_value="on"
+        ),
+    ])
+
+    return dbms_config_space
+
+
+def add_measured_trials(trial_store):
+    rng = np.random.default_rng(0)
+    for shared_buffers in rng.integers(16, 4096, size=50):
+        throughput = 100.0 + shared_buffers / 10
+        dbms_config = {
+            "shared_buffers": int(shared_buffers),
+            "synchronous_commit": "on",
+        }
+        trial_store.add_trial(
+            dbms_config,
+            "postgres",
+            "tpcc",
+            "throughput",
+            {"Throughput (requests/second)": throughput},
+            numeric_stats=np.array([throughput * 100, 5.0]),
+        )
+
+
+def test_surrogate_evaluator(tmp_path):
+    trial_store = TrialStore(str(tmp_path / "trials.sqlite"))
+    add_measured_trials(trial_store)
+
+    surrogate_model = SurrogateModel(
+        get_dbms_config_space(), "throughput"
+    ).fit(trial_store.get_trials())
+    surrogate_evaluator = SurrogateEvaluator(surrogate_model)
+
+    # The default configuration has the smallest buffer
+    assert surrogate_evaluator.reset_knobs_by_restarting_db()
+    assert surrogate_evaluator.run()
+    default_throughput = surrogate_evaluator.get_benchbase_metrics()[
+        "Throughput (requests/second)"
+    ]
+    assert surrogate_evaluator.dbms_config == DEFAULT_CONFIG
+
+    assert surrogate_evaluator.apply_knobs(
+        {"shared_buffers": 4000, "synchronous_commit": "on"}
+    )
+    assert list(surrogate_evaluator.iter_run()) == []
+    throughput = surrogate_evaluator.get_benchbase_metrics()[
+        "Throughput (requests/second)"
+    ]
+    assert throughput > default_throughput
+
+    numeric_stats, _ = surrogate_evaluator.get_dbms_stats()
+    assert numeric_stats.shape == (2,)
+    assert np.isclose(numeric_stats[1], 5.0)
+
+
+def test_rejecting_unsupported_optimizers(tmp_path):
+    filepath = str(tmp_path / "trials.sqlite")
+    trial_store = TrialStore(filepath)
+    trial_store.add_trial(
+        {"shared_buffers": 1024, "synchronous_commit": "on"},
+        "postgres",
+        "tpcc",
+        "throughput",
+        {"Throughput (requests/second)": 100.0},
+    )
+    trial_store.close()
+
+    proj_dir = get_proj_dir(__file__, file_level=2)
+    config = parse_config(
+        os.path.join(
+            proj_dir,
+            "cybernetics/configs/benchbase/tpcc/postgres_bo_rf_surrogate.ini",
+        )
+    )
+    config["surrogate"]["trial_stores"] = filepath
+    assert get_surrogate_evaluator(config, get_dbms_config_space())
+
+    # The surrogate does not predict shorter workload runs
+    config["config_optimizer"]["optimizer"] = "bo-mf"
+    with pytest.raises(ValueError, match="multi-fidelity"):
+        get_surrogate_evaluator(config, get_dbms_config_space())
+
+    # DDPG needs the DBMS statistics, which the trials do not have
+    for optimizer in ["rl-ddpg", "liquid-ddpg"]:
+        config["config_optimizer"]["optimizer"] = optimizer
+        with pytest.raises(ValueError, match="DBMS statistics"):
+            get_surrogate_evaluator(config, get_dbms_config_space())
+
+
+def test_tuning_with_surrogate(tmp_path):
+    pytest.importorskip("smac")
+    from cybernetics.tuning.engine import TuningEngine
+
+    past_filepath = str(tmp_path / "past.sqlite")
+    trial_store = TrialStore(past_filepath)
+    trial_store.add_trial(
+        DEFAULT_CONFIG,
+        "postgres",
+        "tpcc",
+        "throughput",
+        {"Throughput (requests/second)": 100.0},
+        numeric_stats=np.array([10000.0, 5.0]),
+    )
+    add_measured_trials(trial_store)
+    trial_store.close()
+
+    proj_dir = get_proj_dir(__file__, file_level=2)
+    config = parse_config(
+        os.path.join(
+            proj_dir,
+            "cybernetics/configs/benchbase/tpcc/postgres_bo_rf_surrogate.ini",
+        )
+    )
+    config["config_optimizer"]["n_trials"] = "5"
+    config["surrogate"]["trial_stores"] = past_filepath
+    config["results"]["save_path"] = str(tmp_path / "surrogate_session")
+    os.makedirs(config["results"]["save_path"])
+
+    dbms_config_space = get_dbms_config_space()
+    surrogate_evaluator = get_surrogate_evaluator(config, dbms_config_space)
+    engine = TuningEngine(
+        config, surrogate_evaluator, dbms_config_space, surrogate_evaluator
+    )
+    assert engine.run()
+
+    session_filepath = os.path.join(
+        config["results"]["save_path"], TRIAL_STORE_FILENAME
+    )
+    trial_store = TrialStore(session_filepath)
+    trials = trial_store.get_trials()
+    trial_store.close()
+    assert trials
+    assert all(trial["predicted"] for trial in trials)
+
+    # Predicted trials are neither warm-started from nor fitted on
+    warm_starter = WarmStarter([session_filepath], "postgres", "throughput")
+    assert warm_starter.load_session(session_filepath) is None
+    with pytest.raises(ValueError):
+        SurrogateModel(dbms_config_space, "throughput").fit(trials)
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+
+import pytest
+
+from cybernetics.tuning.scheduler import (
+    TrialScheduler,
+    TrialWorker,
+    get_worker_dbms_infos,
+)
+from cybernetics.utils.util import get_proj_dir, parse_config
+
+
+def test_get_worker_dbms_infos():
+    proj_dir = get_proj_dir(__file__, file_level=2)
+    config = parse_config(
+        os.path.join(
+            proj_dir,
+            "cybernetics/configs/benchbase/tpcc/postgres_bo_rf_parallel.ini",
+        )
+    )
+
+    worker_dbms_infos = get_worker_dbms_infos(config)
+    assert len(worker_dbms_infos) == 4
+    assert worker_dbms_infos[1]["port"] == "5434"
+    assert worker_dbms_infos[1]["db_cluster"] == "/data/pgsql/data2"
+    assert worker_dbms_infos[1]["db_name"] == config["dbms_info"]["db_name"]
+
+
+def test_scheduling_trials_on_workers():
+    workers = [TrialWorker(i, None, None) for i in range(3)]
+    busy_workers = set()
+    lock = threading.Lock()
+    overlapped = []
+
+    def evaluate_function(worker, dbms_config, budget):
+        with lock:
+            # A worker never runs two trials at once
+            assert worker.worker_id not in busy_workers
+            busy_workers.add(worker.worker_id)
+            overlapped.append(len(busy_workers) > 1)
+
+        time.sleep(0.05)
+        with lock:
+            busy_workers.remove(worker.worker_id)
+
+        return dbms_config * 2
+
+    scheduler = TrialScheduler(workers, evaluate_function)
+    assert scheduler.map(list(range(9))) == [i * 2 for i in range(9)]
+    assert any(overlapped)
+    scheduler.shutdown()
+
+
+def test_mapping_a_batch_with_failing_trials():
+    def evaluate_function(worker, dbms_config, budget):
+        if dbms_config == 1:
+            raise RuntimeError("The workload crashed.")
+        return dbms_config * 2
+
+    workers = [TrialWorker(i, None, None) for i in range(2)]
+    scheduler = TrialScheduler(workers, evaluate_function)
+    # The other trials of the batch are kept
+    assert scheduler.map([0, 1, 2]) == [0, None, 4]
+    scheduler.shutdown()
+
+
+class FakeOptimizer:
+    def __init__(self):
+        from types import SimpleNamespace
+
+        self.scenario = SimpleNamespace(crash_cost=float("inf"))
+        self.intensifier = SimpleNamespace(get_incumbent=lambda: None)
+        self.n_asked = 0
+        self.told = []
+
+    def ask(self):
+        from smac.runhistory.dataclasses import TrialInfo
+
+        self.n_asked += 1
+        return TrialInfo(config=self.n_asked, budget=None)
+
+    def tell(self, trial_info, trial_value):
+        self.told.append((trial_info.config, trial_value))
+
+
+def test_optimizing_in_parallel_with_failing_trials():
+    pytest.importorskip("smac")
+    from smac.runhistory.enumerations import StatusType
+
+    from cybernetics.tuning.scheduler import optimize_in_parallel
+
+    def evaluate_function(worker, dbms_config, budget):
+        if dbms_config == 2:
+            raise RuntimeError("The DBMS crashed.")
+        time.sleep(0.01)
+        return -dbms_config
+
+    workers = [TrialWorker(i, None, None) for i in range(2)]
+    scheduler = TrialScheduler(workers, evaluate_function)
+    optimizer = FakeOptimizer()
+    optimize_in_parallel(optimizer, scheduler, 5)
+    scheduler.shutdown()
+
+    # Every trial is told, the failed one as crashed with the worst cost
+    told = dict(optimizer.told)
+    assert sorted(told) == [1, 2, 3, 4, 5]
+    assert told[2].status == StatusType.CRASHED
+    assert told[2].cost == float("inf")
+    assert told[5].cost == -5
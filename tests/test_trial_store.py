@@ -0,0 +1,138 @@
+import sqlite3
+
+import numpy as np
+
+from cybernetics.utils.trial_store import (
+    CREATE_TRIALS_TABLE_SQL,
+    TrialStore,
+    canonicalize_config,
+    get_config_key,
+)
+
+
+def test_canonicalizing_config():
+    dbms_config = {"work_mem": np.int64(4096), "fsync": "on"}
+    assert canonicalize_config(dbms_config) == {
+        "fsync": "on",
+        "work_mem": 4096,
+    }
+    assert get_config_key(dbms_config) == get_config_key(
+        {"fsync": "on", "work_mem": 4096}
+    )
+
+
+def test_caching_trials(tmp_path):
+    trial_store = TrialStore(str(tmp_path / "trials.sqlite"))
+    dbms_config = {"shared_buffers": 1024, "work_mem": 4096}
+    assert (
+        trial_store.get_cached_trial(dbms_config, "postgres", "tpcc") is None
+    )
+
+    trial_id = trial_store.add_trial(
+        dbms_config,
+        "postgres",
+        "tpcc",
+        "throughput",
+        {"Throughput (requests/second)": 100.0},
+        numeric_stats=np.array([1.0, 2.0]),
+        timings={"apply_time": 1.0, "workload_time": 60.0},
+    )
+    # Extrapolated results of early-stopped trials are never reused
+    trial_store.add_trial(
+        dbms_config,
+        "postgres",
+        "tpcc",
+        "throughput",
+        {"Throughput (requests/second)": 10.0},
+        timings={"early_stopped": True},
+    )
+
+    trial = trial_store.get_cached_trial(
+        {"work_mem": 4096, "shared_buffers": 1024}, "postgres", "tpcc"
+    )
+    assert trial["trial_id"] == trial_id
+    assert trial["performance"]["Throughput (requests/second)"] == 100.0
+    assert np.array_equal(trial["numeric_stats"], [1.0, 2.0])
+
+    # Other workloads and budgets are not reused
+    assert trial_store.get_cached_trial(dbms_config, "postgres", "tpch") is None
+    assert (
+        trial_store.get_cached_trial(dbms_config, "postgres", "tpcc", 60)
+        is None
+    )
+
+    trial_store.close()
+    trial_store = TrialStore(str(tmp_path / "trials.sqlite"))
+    assert len(trial_store.get_trials(workload="tpcc")) == 2
+
+
+def test_storing_workload_run(tmp_path):
+    db_filepath = str(tmp_path / "trials.sqlite")
+    # A trial store of a past session without the added columns
+    conn = sqlite3.connect(db_filepath)
+    conn.execute(
+        CREATE_TRIALS_TABLE_SQL.replace(",\n    run TEXT", "").replace(
+            ",\n    predicted INTEGER NOT NULL DEFAULT 0", ""
+        )
+    )
+    conn.commit()
+    conn.close()
+
+    trial_store = TrialStore(db_filepath)
+    run = {
+        "run_id": 3,
+        "results_dir": "/results/run_3",
+        "summary": "/results/run_3/tpcc.summary.json",
+    }
+    trial_store.add_trial(
+        {"work_mem": 4096},
+        "postgres",
+        "tpcc",
+        "throughput",
+        {"Throughput (requests/second)": 100.0},
+        run=run,
+    )
+    trial_store.add_trial(
+        {"work_mem": 8192},
+        "postgres",
+        "tpcc",
+        "throughput",
+        {"Throughput (requests/second)": 100.0},
+    )
+
+    trials = trial_store.get_trials()
+    assert trials[0]["run"] == run
+    assert trials[1]["run"] is None
+    assert not trials[0]["predicted"]
+
+
+def test_storing_predicted_trials(tmp_path):
+    trial_store = TrialStore(str(tmp_path / "trials.sqlite"))
+    for throughput, predicted in [(100.0, False), (200.0, True)]:
+        trial_store.add_trial(
+            {"work_mem": 4096},
+            "postgres",
+            "tpcc",
+            "throughput",
+            {"Throughput (requests/second)": throughput},
+            predicted=predicted,
+        )
+
+    # Predicted and measured trials are never mixed up
+    measured_trial = trial_store.get_cached_trial(
+        {"work_mem": 4096}, "postgres", "tpcc"
+    )
+    assert measured_trial["performance"] == {
+        "Throughput (requests/second)": 100.0
+    }
+    assert not measured_trial["predicted"]
+
+    predicted_trial = trial_store.get_cached_trial(
+        {"work_mem": 4096}, "postgres", "tpcc", predicted=True
+    )
+    assert predicted_trial["predicted"]
+
+    assert len(trial_store.get_trials()) == 2
+    assert [
+        trial["trial_id"] for trial in trial_store.get_trials(predicted=False)
+    ] == [measured_trial["trial_id"]]
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from cybernetics.tuning.budget import TuningBudget, get_tuning_budget
+from cybernetics.utils.util import get_proj_dir, parse_config
+
+
+def test_used_budget_is_the_most_used_one():
+    budget = TuningBudget(
+        n_trials=10, max_wall_time=100, max_evaluation_time=50
+    )
+
+    assert budget.get_used_fraction(0, 0, 0) == 0
+    assert budget.get_used_fraction(2, 10, 5) == pytest.approx(0.2)
+    assert budget.get_used_fraction(2, 60, 5) == pytest.approx(0.6)
+    assert budget.get_used_fraction(2, 10, 40) == pytest.approx(0.8)
+    assert not budget.is_exhausted(9, 99, 49)
+
+    # Any exhausted budget stops tuning
+    assert budget.is_exhausted(10, 0, 0)
+    assert budget.is_exhausted(0, 100, 0)
+    assert budget.is_exhausted(0, 0, 60)
+    assert budget.get_used_fraction(0, 0, 60) == 1
+
+
+def test_trial_budget_without_time_limits():
+    budget = TuningBudget(n_trials=4)
+
+    assert budget.get_used_fraction(1, 1e9, 1e9) == pytest.approx(0.25)
+    assert budget.is_exhausted(4, 0, 0)
+
+
+def test_get_tuning_budget():
+    proj_dir = get_proj_dir(__file__, file_level=2)
+    config = parse_config(
+        os.path.join(
+            proj_dir, "cybernetics/configs/benchbase/tpcc/postgres_bo_rf.ini"
+        )
+    )
+    budget = get_tuning_budget(config)
+    assert budget.n_trials == 100
+    assert budget.max_wall_time is None
+    assert budget.max_evaluation_time is None
+
+    config["config_optimizer"]["max_wall_time"] = "3600"
+    config["config_optimizer"]["max_evaluation_time"] = "1800"
+    budget = get_tuning_budget(config)
+    assert budget.max_wall_time == 3600
+    assert budget.max_evaluation_time == 1800
+
+    # DDPG gives the number of trials as n_total_configs
+    config["config_optimizer"].pop("n_trials")
+    config["config_optimizer"]["n_total_configs"] = "50"
+    assert get_tuning_budget(config).n_trials == 50
@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+import pytest
+
+from ConfigSpace import ConfigurationSpace, UniformIntegerHyperparameter
+
+from cybernetics.tuning.budget import get_tuning_budget
+from cybernetics.tuning.warm_start import (
+    WarmStarter,
+    get_fingerprint_distance,
+    get_n_warm_start_trials,
+)
+from cybernetics.utils.trial_store import DEFAULT_CONFIG, TrialStore
+from cybernetics.utils.util import get_proj_dir, parse_config
+
+
+def add_session(filepath, fingerprint, default_perf, perfs):
+    trial_store = TrialStore(filepath)
+    trial_store.add_trial(
+        DEFAULT_CONFIG,
+        "postgres",
+        "tpcc",
+        "throughput",
+        {"Throughput (requests/second)": default_perf},
+        numeric_stats=np.array(fingerprint),
+    )
+    for i, perf in enumerate(perfs):
+        trial_store.add_trial(
+            {"work_mem": 1024 * (i + 1)},
+            "postgres",
+            "tpcc",
+            "throughput",
+            {"Throughput (requests/second)": perf},
+            numeric_stats=np.array(fingerprint) * (i + 2),
+        )
+    trial_store.close()
+
+
+def test_fingerprint_distance():
+    assert get_fingerprint_distance([10, 100], [10, 100]) < 1e-9
+    assert get_fingerprint_distance([10, 100], [100, 10]) > 0
+    assert get_fingerprint_distance([10, 100], [10]) == np.inf
+
+
+def test_selecting_relevant_trials(tmp_path):
+    similar_filepath = str(tmp_path / "similar.sqlite")
+    add_session(similar_filepath, [1000, 10], 100.0, [150.0, 50.0, 120.0])
+    other_filepath = str(tmp_path / "other.sqlite")
+    add_session(other_filepath, [10, 1000], 10.0, [30.0])
+
+    warm_starter = WarmStarter(
+        [other_filepath, similar_filepath, str(tmp_path / "missing.sqlite")],
+        "postgres",
+        "throughput",
+        n_trials=3,
+    )
+
+    # The best trials of the most similar session come first, scaled by the
+    # default performance of the current session
+    trials = warm_starter.select_trials(np.array([900, 12]), 200.0)
+    assert [trial["perf"] for trial in trials] == [300.0, 240.0, 100.0]
+
+    warm_starter.n_trials = 10
+    trials = warm_starter.select_trials(np.array([900, 12]), 200.0)
+    assert trials[-1]["perf"] == 600.0
+
+    # Sessions which are too different are ignored
+    warm_starter.max_distance = 0.01
+    trials = warm_starter.select_trials(np.array([900, 12]), 200.0)
+    assert len(trials) == 3
+
+    transitions = warm_starter.select_transitions(np.array([900, 12]), 200.0)
+    state, dbms_config, perf, prev_perf, worst_perf, next_state = (
+        transitions[0]
+    )
+    assert list(state) == [1000, 10] and list(next_state) == [2000, 20]
+    assert dbms_config == {"work_mem": 1024}
+    assert (perf, prev_perf, worst_perf) == (300.0, 200.0, 300.0)
+    # The worst performance of the session so far
+    assert [transition[4] for transition in transitions[1:3]] == [
+        100.0, 100.0
+    ]
+
+
+def test_leaving_room_for_warm_start_trials(tmp_path):
+    pytest.importorskip("smac")
+    from cybernetics.tuning.dbms_config_optimizer import get_bo_optimizer
+
+    proj_dir = get_proj_dir(__file__, file_level=2)
+    config = parse_config(
+        os.path.join(
+            proj_dir, "cybernetics/configs/benchbase/tpcc/postgres_bo_rf.ini"
+        )
+    )
+    config["results"]["save_path"] = str(tmp_path)
+    assert get_n_warm_start_trials(config) == 0
+
+    config["warm_start"] = {
+        "trial_stores": str(tmp_path / "trials.sqlite"),
+        "n_trials": "5",
+    }
+    assert get_n_warm_start_trials(config) == 5
+
+    dbms_config_space = ConfigurationSpace(seed=0)
+    dbms_config_space.add_hyperparameter(
+        UniformIntegerHyperparameter("work_mem", 64, 65536)
+    )
+    optimizer = get_bo_optimizer(
+        config, dbms_config_space, lambda dbms_config, seed: 0
+    )
+
+    # Seeded trials do not take the place of evaluated ones
+    assert optimizer.scenario.n_trials == (
+        get_tuning_budget(config).n_trials + 5
+    )